@@ -0,0 +1,74 @@
+''' Benchmark de los intervalos de confianza de ROC-AUC/APS (utils/model_comparison.py).
+
+Sobre N filas sintéticas con 3 modelos (probabilidades float32, con empates) compara:
+- loop: una réplica a la vez con índices remuestreados y roc_auc_score/average_precision_score de scikit-learn
+  (se miden --loop-replicates réplicas y se extrapola a --n-boot);
+- vectorizado: bootstrap_metrics con 1 proceso y con --workers procesos;
+- DeLong: delong_auc (sin remuestreo).
+También verifica que las réplicas vectorizadas coincidan con scikit-learn usando los conteos como pesos.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bootstrap_auc --rows 1000000 --n-boot 1000 --workers 4 '''
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, roc_auc_score
+from utils.model_comparison import bootstrap_block, bootstrap_metrics, delong_auc, sort_scores
+
+def make_scores(n_rows, n_models=3, seed=54321):
+    ''' Objetivo con 27% de positivos y probabilidades de modelos con distinta separación. '''
+    rng = np.random.default_rng(seed)
+    target = rng.random(n_rows) < 0.27
+    probas = np.vstack([1 / (1 + np.exp(-(shift * target + rng.normal(size=n_rows) - 1)))
+                        for shift in np.linspace(2.0, 1.5, n_models)]).astype(np.float32)
+    return target, probas.astype(np.float64)
+
+def loop_bootstrap(target, probas, n_replicates, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n_replicates):
+        idx = rng.integers(0, len(target), len(target))
+        for proba in probas:
+            roc_auc_score(target[idx], proba[idx])
+            average_precision_score(target[idx], proba[idx])
+
+def max_diff_sklearn(target, probas, n_replicates=3):
+    ''' Diferencia máxima entre las réplicas vectorizadas y scikit-learn con los mismos conteos como pesos. '''
+    seed = np.random.SeedSequence(1)
+    result = bootstrap_block(sort_scores(target, probas), len(target), n_replicates, seed)
+    draws = np.random.default_rng(seed).integers(0, len(target), size=(n_replicates, len(target)))
+    diff = 0.0
+    for replicate, row in enumerate(draws):
+        counts = np.bincount(row, minlength=len(target))
+        for idx, proba in enumerate(probas):
+            diff = max(diff, abs(result['roc_auc'][replicate, idx] - roc_auc_score(target, proba, sample_weight=counts)),
+                       abs(result['aps'][replicate, idx] - average_precision_score(target, proba, sample_weight=counts)))
+    return diff
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--n-boot', type=int, default=1000)
+    parser.add_argument('--loop-replicates', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    target, probas = make_scores(args.rows)
+    loop_s = timed(loop_bootstrap, target, probas, args.loop_replicates) * args.n_boot / args.loop_replicates
+    results = [{'method': 'loop (sklearn, extrapolado)', 'workers': 1, 'total_s': loop_s}]
+    worker_counts = [1] if args.workers == 1 else [1, args.workers]
+    for n_workers in worker_counts:
+        results.append({'method': 'vectorizado', 'workers': n_workers,
+                        'total_s': timed(bootstrap_metrics, target, probas, args.n_boot, n_workers=n_workers)})
+    results.append({'method': 'delong', 'workers': 1, 'total_s': timed(delong_auc, target, probas)})
+
+    report = pd.DataFrame(results)
+    report['speedup'] = loop_s / report['total_s']
+    print(f'{args.rows} filas, {len(probas)} modelos, {args.n_boot} réplicas')
+    print(report.round(3).to_string(index=False))
+    print(f'Diferencia máxima contra scikit-learn con pesos: {max_diff_sklearn(target, probas):.2e}')
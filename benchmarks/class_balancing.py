@@ -0,0 +1,75 @@
+''' Benchmark del balanceo de clases: sobremuestreo (RandomOverSampler) contra pesos en los modelos.
+
+Para una comparación justa se aparta primero un 20% de los clientes como conjunto de evaluación;
+con el sobremuestreo, el conjunto de prueba de preparing_data contiene filas duplicadas del entrenamiento.
+Cada modo se ejecuta en un proceso nuevo para medir su memoria máxima (RSS).
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.class_balancing '''
+import argparse
+import multiprocessing
+import resource
+import time
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.utils.class_weight import compute_sample_weight
+
+def run_mode(balance, files_path, libraries):
+    ''' Prepara los datos y ajusta los modelos con un modo de balanceo. Se ejecuta en un proceso aparte. '''
+    from preprocessing.preparing import preparing_data
+    from preprocessing.preprocessing import preprocessing_data_cached
+    from models.tuning import fit_early_stopped
+    from models import c00_catboost, l00_lightgbm, x00_xgboost
+    best_params = {'catboost': c00_catboost.BEST_PARAMS, 'lightgbm': l00_lightgbm.BEST_PARAMS,
+                   'xgboost': x00_xgboost.BEST_PARAMS}
+
+    df_telecom_clean = preprocessing_data_cached(files_path)
+    df_train, df_holdout = train_test_split(df_telecom_clean, test_size=0.2, stratify=df_telecom_clean['is_active'],
+                                            random_state=12345)
+
+    start = time.perf_counter()
+    _, _, features_train, _, target_train, _, transformer = preparing_data(
+        df_train, return_transformer=True, balance=balance, boruta_params={'cache_dir': None}
+    )
+    results = [{'balance': balance, 'stage': 'preparing_data (incluye Boruta)', 'rows': len(features_train),
+                'fit_s': time.perf_counter() - start, 'roc_auc_holdout': np.nan}]
+
+    features_holdout = transformer.transform(df_holdout.drop(columns='is_active'))
+    target_holdout = df_holdout['is_active'].to_numpy()
+    sample_weight = compute_sample_weight('balanced', target_train) if balance == 'weights' else None
+
+    start = time.perf_counter()
+    model = LogisticRegression(class_weight='balanced' if balance == 'weights' else None)
+    model.fit(features_train.to_numpy(dtype=float), target_train)
+    results.append({'balance': balance, 'stage': 'logistic_regression', 'rows': len(features_train),
+                    'fit_s': time.perf_counter() - start,
+                    'roc_auc_holdout': roc_auc_score(target_holdout, model.predict_proba(features_holdout)[:, 1])})
+
+    for library in libraries:
+        params = dict(best_params[library], verbose=0) if library == 'catboost' else best_params[library]
+        start = time.perf_counter()
+        model = fit_early_stopped(library, params, features_train.to_numpy(dtype=float), target_train,
+                                  sample_weight=sample_weight, groups=target_train.index.to_numpy())
+        results.append({'balance': balance, 'stage': library, 'rows': len(features_train),
+                        'fit_s': time.perf_counter() - start,
+                        'roc_auc_holdout': roc_auc_score(target_holdout, model.predict_proba(features_holdout)[:, 1])})
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for result in results:
+        result['peak_rss_mb'] = peak_rss_mb
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files-path', default='./files/datasets/input/')
+    parser.add_argument('--libraries', nargs='+', default=['catboost', 'lightgbm', 'xgboost'])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for balance in ('oversample', 'weights'):
+        with context.Pool(1) as pool:
+            results.extend(pool.apply(run_mode, (balance, args.files_path, args.libraries)))
+    print(pd.DataFrame(results).round(4).to_string(index=False))
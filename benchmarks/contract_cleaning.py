@@ -0,0 +1,82 @@
+''' Benchmark de contract_cleaning: compara la versión vectorizada con el cálculo fila por fila
+(bool_user_active, real_end_date, calculate_active_days) sobre datos sintéticos.
+La equivalencia de ambas versiones se verifica en tests/test_contract_cleaning.py.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.contract_cleaning --rows 10000 1000000 10000000 '''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.functions import (bool_user_active, calculate_active_days, calculate_active_days_vectorized,
+                             real_end_date, real_end_date_vectorized)
+
+def synthetic_contract(n_rows, seed=54321):
+    ''' Genera un dataframe con el formato de contract.csv (columnas en snake_case).
+    Se omite customer_id porque no interviene en los cálculos medidos. '''
+    rng = np.random.default_rng(seed)
+    begin_dates = pd.date_range('2013-10-01', '2020-02-01', freq='MS').strftime('%Y-%m-%d').to_numpy()
+    end_dates = np.array(['No', '2019-10-01 00:00:00', '2019-11-01 00:00:00',
+                          '2019-12-01 00:00:00', '2020-01-01 00:00:00'])
+    monthly_charges = rng.uniform(18, 119, n_rows).round(2)
+    total_charges = (monthly_charges * rng.integers(1, 72, n_rows)).round(2).astype(str)
+    total_charges[rng.random(n_rows) < 0.0015] = ' '
+    return pd.DataFrame({
+        'begin_date': rng.choice(begin_dates, n_rows),
+        'end_date': rng.choice(end_dates, n_rows, p=[0.73, 0.07, 0.07, 0.07, 0.06]),
+        'type': rng.choice(['Month-to-month', 'One year', 'Two year'], n_rows, p=[0.55, 0.21, 0.24]),
+        'paperless_billing': rng.choice(['Yes', 'No'], n_rows, p=[0.59, 0.41]),
+        'payment_method': rng.choice(['Electronic check', 'Mailed check', 'Bank transfer (automatic)',
+                                      'Credit card (automatic)'], n_rows),
+        'monthly_charges': monthly_charges,
+        'total_charges': total_charges,
+    })
+
+def prepare_dates(df_contract):
+    ''' Pasos previos comunes a ambas versiones: conversión de fechas. '''
+    df_contract['end_date'] = pd.to_datetime(df_contract['end_date'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    df_contract['begin_date'] = pd.to_datetime(df_contract['begin_date'], errors='coerce')
+    return df_contract
+
+def rowwise_columns(df_contract):
+    ''' Cálculo original con apply(axis=1). '''
+    df = df_contract.copy()
+    df['is_active'] = df.apply(bool_user_active, axis=1)
+    df['end_date_with_contract'] = df.apply(real_end_date, axis=1)
+    df['active_days'] = df.apply(calculate_active_days, axis=1)
+    return df[['is_active', 'end_date_with_contract', 'active_days']]
+
+def vectorized_columns(df_contract):
+    ''' Cálculo vectorizado usado por contract_cleaning. '''
+    df = df_contract.copy()
+    df['is_active'] = df['end_date'].isna()
+    df['end_date_with_contract'] = real_end_date_vectorized(df)
+    df['active_days'] = calculate_active_days_vectorized(df)
+    return df[['is_active', 'end_date_with_contract', 'active_days']]
+
+def run_benchmark(rows, rowwise_limit=100000):
+    results = []
+    for n_rows in rows:
+        df_contract = prepare_dates(synthetic_contract(n_rows))
+        start = time.perf_counter()
+        vectorized_columns(df_contract)
+        vectorized_time = time.perf_counter() - start
+
+        # La versión fila por fila solo se mide en tamaños pequeños (es varios órdenes de magnitud más lenta)
+        rowwise_time = np.nan
+        if n_rows <= rowwise_limit:
+            start = time.perf_counter()
+            rowwise_columns(df_contract)
+            rowwise_time = time.perf_counter() - start
+
+        results.append({'rows': n_rows, 'rowwise_s': rowwise_time, 'vectorized_s': vectorized_time,
+                        'speedup': rowwise_time / vectorized_time})
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--rowwise-limit', type=int, default=100000,
+                        help='Tamaño máximo en el que se mide la versión fila por fila')
+    args = parser.parse_args()
+
+    print(run_benchmark(args.rows, args.rowwise_limit).to_string(index=False))
@@ -0,0 +1,76 @@
+''' Benchmark del monitoreo de deriva y calidad de datos (utils/monitoring.py).
+
+Con las tablas sintéticas de benchmarks/synthetic.py se ajusta el perfil de entrenamiento sobre --train
+clientes y se mide, por lotes de --batch-size clientes nuevos:
+- preprocessing_data: limpieza y unión de las 4 tablas (el trabajo que ya hace la puntuación);
+- quality_counts: contadores de calidad sobre las tablas crudas;
+- observe: histogramas del lote, reporte de deriva contra el entrenamiento y acumulado.
+Se reporta el tiempo por millón de filas y el costo del monitoreo respecto a preprocessing_data.
+Después se inyectan cambios conocidos en las tablas crudas de un lote (cargos mensuales +30%, nulos en el
+tipo de contrato, un método de pago nuevo), que pasan por quality_counts y preprocessing_data como en la
+re-puntuación, y se muestra qué detecta el monitor.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.drift_monitor --train 200000 --rows 1000000 --batch-size 100000 '''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_interconnect
+from preprocessing.preprocessing import preprocessing_data
+from utils.monitoring import DriftMonitor, FeatureProfile, quality_counts
+
+def batches(tables, batch_size):
+    ''' Parte las 4 tablas crudas en lotes de clientes (por customerID del contrato). '''
+    df_contract, df_internet, df_personal, df_phone = tables
+    for start in range(0, len(df_contract), batch_size):
+        contract = df_contract.iloc[start:start + batch_size].copy()
+        ids = contract['customerID']
+        yield (contract, *(df[df['customerID'].isin(ids)].copy() for df in (df_internet, df_personal, df_phone)))
+
+def shifted(batch, rng):
+    ''' Tablas crudas de un lote con cambios conocidos para verificar la detección. '''
+    df_contract = batch[0].copy()
+    df_contract['MonthlyCharges'] = df_contract['MonthlyCharges'] * 1.3
+    df_contract['Type'] = df_contract['Type'].mask(rng.random(len(df_contract)) < 0.05)
+    df_contract['PaymentMethod'] = df_contract['PaymentMethod'].mask(rng.random(len(df_contract)) < 0.1, 'Crypto')
+    return (df_contract, *(df.copy() for df in batch[1:]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', type=int, default=200000)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    training = preprocessing_data(*generate_interconnect(args.train, seed=1), keep_customer_id=True)
+    profile = FeatureProfile.fit(training)
+    monitor = DriftMonitor(profile, verbose=False)
+
+    tables = generate_interconnect(args.rows, seed=2)
+    times = {'preprocessing_data': 0.0, 'quality_counts': 0.0, 'observe': 0.0}
+    for batch in batches(tables, args.batch_size):
+        start = time.perf_counter()
+        counters = quality_counts(*batch)
+        times['quality_counts'] += time.perf_counter() - start
+        start = time.perf_counter()
+        df_clean = preprocessing_data(*batch, keep_customer_id=True)
+        times['preprocessing_data'] += time.perf_counter() - start
+        start = time.perf_counter()
+        monitor.observe(df_clean, counters)
+        times['observe'] += time.perf_counter() - start
+        last_batch = batch
+
+    report = pd.DataFrame({'stage': list(times), 'total_s': list(times.values())})
+    report['s_per_million'] = report['total_s'] * 1e6 / args.rows
+    report['vs_preprocessing'] = report['total_s'] / times['preprocessing_data']
+    print(f'{args.rows} clientes en lotes de {args.batch_size}, perfil de {args.train} clientes')
+    print(report.round(4).to_string(index=False))
+    summary = monitor.summary()
+    print(f"Sin cambios: PSI máximo {monitor.report()['psi'].max():.4f}, alertas {summary['psi'] or '-'}")
+
+    raw = shifted(last_batch, np.random.default_rng(3))
+    drift_monitor = DriftMonitor(profile, verbose=False)
+    drift = drift_monitor.observe(preprocessing_data(*raw, keep_customer_id=True), quality_counts(*raw))
+    print('Lote con cambios inyectados:')
+    print(drift.loc[['monthly_charges', 'type', 'payment_method'], ['psi', 'ks', 'null_rate_train', 'null_rate']].round(4).to_string())
+    print(f"Categorías nuevas: {drift_monitor.summary()['new_categories']}")
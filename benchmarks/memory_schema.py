@@ -0,0 +1,46 @@
+''' Reporte de memoria por etapa con los tipos de datos inferidos por pandas (antes)
+y con el esquema compacto CSV_DTYPES/TELECOM_SCHEMA (después).
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.memory_schema '''
+import argparse
+import pandas as pd
+from preprocessing.preprocessing import preprocessing_data
+from utils.functions import (CSV_DTYPES, TELECOM_SCHEMA, apply_categories, apply_schema, camelcase_to_snakecase, contract_cleaning,
+                             internet_cleaning, memory_report, personal_cleaning, phone_cleaning, read_csv_files, split_target_features)
+
+def stage_frames(files_path, dtypes, schema):
+    ''' Ejecuta las etapas de lectura, limpieza, merge y preparación y regresa los dataframes de cada una. '''
+    stages = {}
+    datasets = read_csv_files(files_path, dtypes=dtypes)
+    stages['read_csv_files'] = list(datasets)
+
+    # Limpieza por tabla (sobre copias, preprocessing_data modifica los nombres de las columnas)
+    cleaned = [df.copy() for df in datasets]
+    if schema is not None:
+        cleaned = [apply_categories(source, df) for source, df in zip(('contract', 'internet', 'personal', 'phone'), cleaned)]
+    for df in cleaned:
+        camelcase_to_snakecase(df)
+    cleaned = [cleaning(df) for cleaning, df in zip((contract_cleaning, internet_cleaning, personal_cleaning, phone_cleaning), cleaned)]
+    if schema is not None:
+        cleaned = [apply_schema(df, schema) for df in cleaned]
+    stages['cleaning (4 tablas)'] = cleaned
+
+    df_telecom_clean = preprocessing_data(*datasets, schema=schema)
+    stages['preprocessing_data'] = df_telecom_clean
+
+    features, target = split_target_features(df_telecom_clean, 'is_active')
+    stages['split_target_features'] = [features, target.to_frame()]
+    features_encoded = pd.get_dummies(features, columns=['payment_method'])
+    stages['get_dummies'] = features_encoded
+    return stages
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files-path', default='./files/datasets/input/')
+    args = parser.parse_args()
+
+    before = memory_report(stage_frames(args.files_path, dtypes=None, schema=None))
+    after = memory_report(stage_frames(args.files_path, dtypes=CSV_DTYPES, schema=TELECOM_SCHEMA))
+    report = pd.DataFrame({'rows': before['rows'], 'bytes_before': before['bytes'], 'bytes_after': after['bytes']})
+    report['reduction'] = (report['bytes_before'] / report['bytes_after']).round(2)
+    print(report.to_string())
@@ -0,0 +1,69 @@
+''' Benchmark de la escritura de predicciones (utils/prediction_writer.py).
+
+Se puntúan N clientes sintéticos por lotes con un LightGBM y se escriben customer_id y probabilidad:
+- to_csv: cada lote se escribe con DataFrame.to_csv en modo append en el mismo hilo (versión anterior);
+- writer: PredictionWriter en CSV, CSV con gzip y Parquet, escribiendo en un hilo en segundo plano.
+Se reporta el tiempo total, el tiempo que el hilo que puntúa pasó esperando a la escritura (escribir con
+to_csv o dejar el lote en la cola), las filas por segundo y el tamaño del archivo.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.prediction_writer --rows 2000000 --batch-size 100000 '''
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.training_backends import make_data
+from utils.prediction_writer import PredictionWriter
+
+def train_model(n_rows=20000):
+    import lightgbm as lgb
+    features, target = make_data(n_rows, seed=1)
+    return lgb.LGBMClassifier(n_estimators=100, num_leaves=24, verbose=-1).fit(features, target)
+
+def run(mode, model, features, customer_ids, batch_size, output_dir):
+    output_path = os.path.join(output_dir, 'predicts.' + ('csv' if mode == 'to_csv' else mode))
+    wait_s = 0.0
+    start = time.perf_counter()
+    if mode == 'to_csv':
+        tmp_path = output_path + '.tmp'
+        for batch_start in range(0, len(features), batch_size):
+            probas = model.predict_proba(features[batch_start:batch_start + batch_size])[:, 1]
+            write_start = time.perf_counter()
+            predictions = pd.DataFrame({'customer_id': customer_ids[batch_start:batch_start + batch_size],
+                                        'churn_proba': probas})
+            predictions.to_csv(tmp_path, mode='w' if batch_start == 0 else 'a', header=batch_start == 0, index=False)
+            wait_s += time.perf_counter() - write_start
+        os.replace(tmp_path, output_path)
+    else:
+        with PredictionWriter(output_path, 'lightgbm', 'benchmark') as writer:
+            for batch_start in range(0, len(features), batch_size):
+                probas = model.predict_proba(features[batch_start:batch_start + batch_size])[:, 1]
+                write_start = time.perf_counter()
+                writer.write(customer_ids[batch_start:batch_start + batch_size], probas)
+                wait_s += time.perf_counter() - write_start
+            close_start = time.perf_counter()
+        # Espera final hasta que el hilo termina de escribir y se publica el archivo
+        wait_s += time.perf_counter() - close_start
+    total_s = time.perf_counter() - start
+    return {'mode': mode, 'total_s': total_s, 'write_wait_s': wait_s, 'rows_per_sec': len(features) / total_s,
+            'file_mb': os.path.getsize(output_path) / 2**20}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--modes', nargs='+', choices=['to_csv', 'csv', 'csv.gz', 'parquet'],
+                        default=['to_csv', 'csv', 'csv.gz', 'parquet'])
+    args = parser.parse_args()
+
+    model = train_model()
+    features, _ = make_data(args.rows)
+    # Identificadores con el formato de los originales (por ejemplo 7590-VHVEG)
+    rng = np.random.default_rng(54321)
+    letters = rng.integers(65, 91, size=(args.rows, 5), dtype=np.uint8).view('S5').ravel().astype(str)
+    customer_ids = np.char.add(np.char.add(np.char.zfill(np.arange(args.rows).astype(str), 4), '-'), letters)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        report = pd.DataFrame([run(mode, model, features, customer_ids, args.batch_size, output_dir) for mode in args.modes])
+    print(report.round(3).to_string(index=False))
@@ -0,0 +1,78 @@
+''' Benchmark de los backends de preprocesamiento sobre datos sintéticos (benchmarks/synthetic.py).
+
+- merge: merges how='outer' encadenados (versión original de merge_datasets) contra align_by_key
+  (customer_id factorizado una vez y columnas reubicadas por clave entera); se verifica que den lo mismo
+  y se reporta el tiempo y el aumento del RSS máximo de cada uno, en procesos separados.
+- backends: read_csv_files + preprocessing_data (memoria), preprocessing_data_parallel (una tabla por
+  proceso) y preprocessing_data_out_of_core (particiones en disco limpiadas en paralelo).
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.preprocessing_backends --customers 100000 1000000 --workers 4 '''
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from benchmarks.scaling import synthetic_dataset
+from preprocessing.preprocessing import (clean_table, preprocessing_data, preprocessing_data_out_of_core,
+                                         preprocessing_data_parallel)
+from utils.functions import align_by_key, read_csv_files
+from utils.profiling import RunProfiler
+
+def chained_merge(tables, on='customer_id'):
+    ''' Versión original: un pd.merge por tabla, cada uno copia el dataframe unido. '''
+    df_merged = tables[0]
+    for df in tables[1:]:
+        df_merged = pd.merge(df_merged, df, on=on, how='outer')
+    return df_merged
+
+def measure_merge(files_path, method):
+    ''' Limpia las 4 tablas y mide la unión con RunProfiler (tiempo y aumento del RSS máximo).
+    Se ejecuta en un proceso nuevo para que la memoria liberada por otras pruebas no afecte la medición. '''
+    cleaned = dict(zip(['contract', 'internet', 'personal', 'phone'], read_csv_files(files_path)))
+    cleaned = {source: clean_table(source, df) for source, df in cleaned.items()}
+    tables = [cleaned['contract'], cleaned['personal'], cleaned['internet'], cleaned['phone']]
+    with RunProfiler(sample_interval=0.002) as profiler:
+        with profiler.stage(method):
+            df_merged = (chained_merge if method == 'chained' else align_by_key)(tables)
+    record = profiler.stages[0]
+    return df_merged, record['wall_s'], (record['peak_rss_bytes'] - record['rss_start_bytes']) / 2**20
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--data-dir', default='./files/datasets/synthetic/')
+    args = parser.parse_args()
+
+    merge_results, backend_results = [], []
+    for n_customers in args.customers:
+        files_path = synthetic_dataset(args.data_dir, n_customers)
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            merged_chained, chained_s, chained_mb = executor.submit(measure_merge, files_path, 'chained').result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            merged_aligned, aligned_s, aligned_mb = executor.submit(measure_merge, files_path, 'aligned').result()
+        pd.testing.assert_frame_equal(merged_aligned, merged_chained)
+        merge_results.append({'customers': n_customers, 'chained_s': chained_s, 'aligned_s': aligned_s,
+                              'speedup': chained_s / aligned_s, 'chained_rss_mb': chained_mb, 'aligned_rss_mb': aligned_mb})
+        del merged_chained, merged_aligned
+
+        _, memory_s = timed(lambda: preprocessing_data(*read_csv_files(files_path)))
+        _, parallel_s = timed(preprocessing_data_parallel, files_path, args.workers)
+        with tempfile.TemporaryDirectory() as output_dir:
+            _, out_of_core_s = timed(preprocessing_data_out_of_core, files_path, output_dir, args.partitions, args.workers)
+        backend_results.append({'customers': n_customers, 'workers': args.workers, 'memory_s': memory_s,
+                                'parallel_s': parallel_s, 'out_of_core_s': out_of_core_s})
+
+    print('merge_datasets (tablas ya limpias):')
+    print(pd.DataFrame(merge_results).round(3).to_string(index=False))
+    print('Backends (lectura + limpieza + unión):')
+    print(pd.DataFrame(backend_results).round(3).to_string(index=False))
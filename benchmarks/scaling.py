@@ -0,0 +1,133 @@
+''' Benchmark de escalabilidad del pipeline con datos sintéticos (benchmarks/synthetic.py).
+
+Para cada número de clientes se generan las 4 tablas (se reutilizan si ya existen) y, en un proceso nuevo,
+se ejecutan read_csv_files, preprocessing_data, preparing_data (con Boruta) y los modelos indicados bajo
+un RunProfiler. Por etapa se reporta tiempo de reloj, tiempo de CPU, memoria máxima (RSS) y clientes
+por segundo. Si una escala falla (por ejemplo por falta de memoria) se registra el error y se sigue con
+la siguiente, de modo que el límite queda visible en el reporte.
+
+Los resultados se guardan en JSON junto con la revisión de git; --compare muestra la razón de tiempos
+contra el reporte de otra revisión.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.scaling --customers 1000 100000 1000000 --models logistic_regression lightgbm
+    python -m benchmarks.scaling --customers 1000 100000 --compare ./files/reports/scaling_<revision>.json '''
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from benchmarks.synthetic import write_interconnect
+
+RECORD_FIELDS = ('stage', 'parent', 'wall_s', 'cpu_s', 'peak_rss_bytes', 'rows', 'cols')
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def synthetic_dataset(data_dir, n_customers, seed=54321):
+    ''' Ruta de las tablas sintéticas de n_customers clientes; se generan si no existen. '''
+    files_path = os.path.join(data_dir, f'{n_customers}_{seed}') + os.sep
+    if not os.path.exists(os.path.join(files_path, 'phone.csv')):
+        start = time.perf_counter()
+        write_interconnect(files_path, n_customers, seed)
+        print(f'{n_customers} clientes generados en {time.perf_counter() - start:.1f}s')
+    return files_path
+
+def run_scale(files_path, models, balance, boruta_params):
+    ''' Ejecuta las etapas del pipeline sobre un conjunto sintético. Se ejecuta en un proceso aparte. '''
+    import importlib
+    from excecution.zoo import MODEL_ZOO
+    from preprocessing.preparing import preparing_data
+    from preprocessing.preprocessing import preprocessing_data
+    from utils.functions import read_csv_files
+    from utils.profiling import RunProfiler
+
+    with RunProfiler() as profiler, tempfile.TemporaryDirectory() as workdir:
+        datasets = read_csv_files(files_path)
+        df_telecom_clean = preprocessing_data(*datasets)
+        del datasets
+        _, _, features_train, features_test, target_train, target_test = preparing_data(
+            df_telecom_clean, balance=balance, boruta_params=boruta_params
+        )
+        del df_telecom_clean
+
+        # Los modelos escriben sus predicciones en ./files/datasets/output/: se ejecutan en una carpeta temporal
+        os.makedirs(os.path.join(workdir, 'files', 'datasets', 'output'))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for name in models:
+                model_info = MODEL_ZOO[name]
+                model_function = getattr(importlib.import_module(model_info['module']), model_info['function'])
+                with profiler.stage(name, rows=len(features_train), cols=features_train.shape[1]):
+                    model_function(features_train, target_train, features_test, target_test, show_metrics=False,
+                                   registry_dir=os.path.join(workdir, 'models'), balanced=balance == 'weights')
+        finally:
+            os.chdir(cwd)
+    return [{field: record.get(field) for field in RECORD_FIELDS} for record in profiler.stages]
+
+def run_benchmark(customers, models, data_dir, balance='oversample', boruta_params=None, seed=54321):
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for n_customers in customers:
+        files_path = os.path.abspath(synthetic_dataset(data_dir, n_customers, seed)) + os.sep
+        # Un proceso nuevo por escala: la memoria máxima no se mezcla entre escalas y un fallo no detiene el resto
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                records = executor.submit(run_scale, files_path, models, balance, boruta_params).result()
+            except Exception as error:
+                print(f'{n_customers} clientes: falló ({type(error).__name__}: {error})')
+                results.append({'customers': n_customers, 'stage': 'error', 'error': f'{type(error).__name__}: {error}'})
+                continue
+        for record in records:
+            results.append(dict(record, customers=n_customers,
+                                peak_rss_mb=record['peak_rss_bytes'] / 2**20,
+                                customers_per_s=n_customers / record['wall_s'] if record['wall_s'] else None))
+    return pd.DataFrame(results)
+
+def compare(report, previous_path):
+    ''' Razón de tiempos de reloj por escala y etapa contra un reporte anterior (> 1 es más lento ahora). '''
+    with open(previous_path) as f:
+        previous = json.load(f)
+    merged = report.merge(pd.DataFrame(previous['results']), on=['customers', 'stage'], suffixes=('', '_previous'))
+    merged['wall_ratio'] = merged['wall_s'] / merged['wall_s_previous']
+    merged['peak_rss_ratio'] = merged['peak_rss_mb'] / merged['peak_rss_mb_previous']
+    print(f"Comparación contra la revisión {previous['revision']}:")
+    print(merged[['customers', 'stage', 'wall_s_previous', 'wall_s', 'wall_ratio', 'peak_rss_ratio']].round(3)
+          .to_string(index=False))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--models', nargs='*', default=['dummy', 'logistic_regression', 'lightgbm'])
+    parser.add_argument('--balance', choices=['oversample', 'weights'], default='oversample')
+    parser.add_argument('--boruta-max-rows', type=int, default=100000,
+                        help='Submuestra de Boruta (None en preparing_data usaría todas las filas)')
+    parser.add_argument('--data-dir', default='./files/datasets/synthetic/')
+    parser.add_argument('--seed', type=int, default=54321)
+    parser.add_argument('--output', default=None, help='Reporte JSON (por defecto ./files/reports/scaling_<revision>.json)')
+    parser.add_argument('--compare', default=None, help='Reporte JSON de otra revisión')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    report = run_benchmark(args.customers, args.models, args.data_dir, args.balance,
+                           {'max_rows': args.boruta_max_rows, 'cache_dir': None}, args.seed)
+    columns = [column for column in ('customers', 'stage', 'parent', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'cols',
+                                     'customers_per_s', 'error') if column in report.columns]
+    print(report[columns].round(3).to_string(index=False))
+
+    output = args.output or os.path.join('./files/reports/', f'scaling_{revision}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'revision': revision, 'customers': args.customers, 'models': args.models,
+                   'results': report.to_dict(orient='records')}, f, indent=2, default=str)
+    print(f'Reporte: {output}')
+    if args.compare:
+        compare(report, args.compare)
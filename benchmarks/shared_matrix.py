@@ -0,0 +1,71 @@
+''' Benchmark de la entrega de los datos a los procesos de los modelos (excecution/zoo.py).
+
+Compara dos formas de pasar features_train/features_test a N procesos:
+- pickle: los dataframes float64 se serializan y cada proceso recibe su propia copia (versión anterior);
+- memmap: se escriben una vez con write_feature_matrix y cada proceso abre la matriz float32 mapeada en memoria.
+Por proceso se mide el tiempo hasta tener los datos y la memoria propia (USS, páginas que no comparte con
+otros procesos) y proporcional (PSS) después de recorrer toda la matriz, como haría un ajuste.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.shared_matrix --rows 1000000 --cols 20 --workers 4 '''
+import argparse
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import psutil
+from utils.feature_matrix import load_feature_matrix, write_feature_matrix
+
+def touch(features_train, features_test, start):
+    ''' Recorre las matrices (como lo haría un ajuste) y regresa el tiempo de entrega y la memoria del proceso. '''
+    ready_s = time.perf_counter() - start
+    total = float(features_train.values.sum()) + float(features_test.values.sum())
+    memory = psutil.Process().memory_full_info()
+    return {'ready_s': ready_s, 'uss_mb': memory.uss / 2**20, 'pss_mb': memory.pss / 2**20, 'checksum': total}
+
+def worker_pickle(data, start):
+    features_train, _, features_test, _ = data
+    return touch(features_train, features_test, start)
+
+def worker_memmap(matrix_dir, start):
+    matrix = load_feature_matrix(matrix_dir)
+    return touch(matrix['features_train'], matrix['features_test'], start)
+
+def run(mode, data, n_workers):
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # Iniciar los procesos antes de medir
+        list(executor.map(int, range(n_workers)))
+        start = time.perf_counter()
+        worker = worker_pickle if mode == 'pickle' else worker_memmap
+        results = list(executor.map(worker, [data] * n_workers, [start] * n_workers))
+        total_s = time.perf_counter() - start
+    return {'mode': mode, 'workers': n_workers, 'total_s': total_s,
+            'ready_s': max(result['ready_s'] for result in results),
+            'uss_mb_per_worker': np.mean([result['uss_mb'] for result in results]),
+            'pss_mb_total': sum(result['pss_mb'] for result in results)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(54321)
+    columns = [f'x{idx}' for idx in range(args.cols)]
+    n_test = args.rows // 4
+    features_train = pd.DataFrame(rng.random((args.rows, args.cols)), columns=columns)
+    features_test = pd.DataFrame(rng.random((n_test, args.cols)), columns=columns)
+    target_train = pd.Series(rng.random(args.rows) < 0.3, name='is_active')
+    target_test = pd.Series(rng.random(n_test) < 0.3, name='is_active')
+    data = (features_train, target_train, features_test, target_test)
+
+    results = [run('pickle', data, args.workers)]
+    with tempfile.TemporaryDirectory() as matrix_dir:
+        start = time.perf_counter()
+        write_feature_matrix(matrix_dir, *data)
+        write_s = time.perf_counter() - start
+        results.append(dict(run('memmap', matrix_dir, args.workers), write_s=write_s))
+
+    print(f'{args.rows} filas x {args.cols} columnas ({features_train.memory_usage().sum() / 2**20:.0f} MB en float64)')
+    print(pd.DataFrame(results).round(3).to_string(index=False))
@@ -0,0 +1,62 @@
+''' Tiempo de arranque de cada subcomando de excecution/pipeline.py.
+
+Para cada etapa se importan, en un intérprete nuevo con `python -X importtime`, los módulos que esa etapa
+carga, y se reporta el tiempo de importación acumulado y el tiempo total del proceso. La fila
+'eager (antes)' importa todas las librerías que el pipeline cargaba al inicio antes de las importaciones
+diferidas, que es lo que pagaba cualquier ejecución.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.startup_time --repeats 5 '''
+import argparse
+import subprocess
+import sys
+import time
+import pandas as pd
+
+STAGES = {
+    'eager (antes)': ['pandas', 'sklearn.ensemble', 'sklearn.model_selection', 'sklearn.preprocessing', 'boruta',
+                      'imblearn.over_sampling', 'catboost', 'lightgbm', 'xgboost', 'matplotlib.pyplot',
+                      'pyarrow.feather', 'excecution.zoo'],
+    '--help': ['excecution.pipeline'],
+    'preprocess': ['excecution.pipeline', 'preprocessing.preprocessing', 'pyarrow.feather'],
+    'select-features': ['excecution.pipeline', 'preprocessing.preparing', 'pyarrow.feather', 'imblearn.over_sampling',
+                        'boruta', 'sklearn.ensemble'],
+    'train logistic_regression': ['excecution.pipeline', 'models.m00_logistic_regresion'],
+    'train catboost': ['excecution.pipeline', 'models.c00_catboost', 'models.tuning', 'catboost'],
+    'predict': ['excecution.pipeline', 'excecution.inference'],
+}
+
+def parse_importtime(stderr):
+    ''' Suma el tiempo acumulado (microsegundos) de las importaciones de primer nivel de la salida de -X importtime. '''
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Las importaciones anidadas tienen sangría adicional de 2 espacios por nivel
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+    return total
+
+def measure(modules, repeats):
+    ''' Mejor tiempo de importación y de proceso (en segundos) de varias ejecuciones. '''
+    code = 'import ' + ', '.join(modules)
+    import_times, process_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        import_times.append(parse_importtime(result.stderr) / 1e6)
+    return min(import_times), min(process_times)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for stage, modules in STAGES.items():
+        import_s, process_s = measure(modules, args.repeats)
+        results.append({'stage': stage, 'import_s': import_s, 'process_s': process_s})
+    report = pd.DataFrame(results)
+    report['speedup'] = report.loc[0, 'process_s'] / report['process_s']
+    print(report.round(3).to_string(index=False))
@@ -0,0 +1,168 @@
+''' Generador sintético de las tablas de Interconnect (contract, internet, personal y phone).
+
+Las proporciones se tomaron de los archivos de files/datasets/input/: tipo de contrato, método de pago,
+servicios de internet y telefonía (clientes sin internet o sin teléfono no aparecen en esas tablas),
+cancelación por tipo de contrato (más alta en el primer año y con fibra óptica), cargos mensuales según los servicios
+contratados y TotalCharges vacío para los clientes que iniciaron el último mes.
+Las tablas se escriben por bloques, por lo que la memoria no depende del número de clientes.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.synthetic --customers 1000000 --output-dir ./files/datasets/synthetic/1000000/ '''
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Fechas de inicio posibles (mensuales) y fechas de cancelación observadas
+BEGIN_DATES = pd.date_range('2013-10-01', '2020-02-01', freq='MS')
+END_DATES = pd.to_datetime(['2019-10-01', '2019-11-01', '2019-12-01', '2020-01-01'])
+MAX_TENURE = 72
+# Proporción de clientes que iniciaron el último mes (sin TotalCharges)
+NEW_CUSTOMER_RATE = 0.0016
+
+CONTRACT_TYPES = ['Month-to-month', 'One year', 'Two year']
+CONTRACT_P = [0.550, 0.209, 0.241]
+# Antigüedad en meses por tipo de contrato (distribución beta escalada a MAX_TENURE)
+TENURE_BETA = {'Month-to-month': (0.8, 2.2), 'One year': (1.6, 1.15), 'Two year': (2.2, 0.6)}
+# Tasa de cancelación por tipo de contrato
+CHURN_RATE = {'Month-to-month': 0.427, 'One year': 0.113, 'Two year': 0.028}
+# Peso relativo de cancelación según el servicio de internet (fibra, DSL, sin internet) y la antigüedad
+CHURN_WEIGHT_INTERNET = {'fiber': 2.2, 'dsl': 1.0, 'none': 0.4}
+CHURN_WEIGHT_FIRST_YEAR = 2.0
+PAYMENT_METHODS = ['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)']
+PAYMENT_P = [0.336, 0.229, 0.219, 0.216]
+
+# Servicios: el 78.3% de los clientes tiene internet y los que no tienen internet siempre tienen teléfono
+INTERNET_RATE = 0.783
+PHONE_RATE_WITH_INTERNET = 0.876
+FIBER_RATE = 0.561
+INTERNET_SERVICES = {'OnlineSecurity': 0.366, 'OnlineBackup': 0.440, 'DeviceProtection': 0.439,
+                     'TechSupport': 0.370, 'StreamingTV': 0.491, 'StreamingMovies': 0.495}
+MULTIPLE_LINES_RATE = 0.467
+
+def customer_ids(start, n_rows):
+    ''' Identificadores únicos con el formato de los archivos originales (por ejemplo 7590-VHVEG).
+    El índice se permuta con una multiplicación modular para que no queden ordenados. '''
+    modulus = 10000 * 26 ** 5
+    index = (np.arange(start, start + n_rows, dtype=np.int64) * 2654435761) % modulus
+    digits = (index % 10000).astype(str)
+    letters = index // 10000
+    chars = []
+    for _ in range(5):
+        chars.append(np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))[letters % 26])
+        letters //= 26
+    suffix = np.char.add(np.char.add(np.char.add(np.char.add(chars[0], chars[1]), chars[2]), chars[3]), chars[4])
+    return np.char.add(np.char.add(np.char.zfill(digits, 4), '-'), suffix)
+
+def yes_no(mask):
+    return np.where(mask, 'Yes', 'No')
+
+def generate_chunk(start, n_rows, rng):
+    ''' Genera n_rows clientes (a partir del índice start) y regresa los 4 dataframes con las columnas originales. '''
+    ids = customer_ids(start, n_rows)
+
+    # Contrato y antigüedad
+    contract_type = rng.choice(CONTRACT_TYPES, n_rows, p=CONTRACT_P)
+    tenure = np.zeros(n_rows, dtype=np.int64)
+    for name, (a, b) in TENURE_BETA.items():
+        mask = contract_type == name
+        tenure[mask] = 1 + np.rint(rng.beta(a, b, mask.sum()) * (MAX_TENURE - 1)).astype(np.int64)
+    tenure[rng.random(n_rows) < NEW_CUSTOMER_RATE] = 0
+    begin_index = len(BEGIN_DATES) - 1 - tenure
+    begin_dates = BEGIN_DATES[begin_index]
+
+    # Servicios
+    has_internet = rng.random(n_rows) < INTERNET_RATE
+    has_phone = ~has_internet | (rng.random(n_rows) < PHONE_RATE_WITH_INTERNET)
+    fiber = rng.random(n_rows) < FIBER_RATE
+    services = {name: rng.random(n_rows) < rate for name, rate in INTERNET_SERVICES.items()}
+    n_services = np.sum(list(services.values()), axis=0)
+    multiple_lines = rng.random(n_rows) < MULTIPLE_LINES_RATE
+
+    # Cargos mensuales según los servicios contratados
+    monthly = (20.0 * has_phone + 5.0 * (has_phone & multiple_lines)
+               + has_internet * (np.where(fiber, 50.0, 25.0) + 6.0 * n_services)
+               + rng.normal(0, 2.0, n_rows))
+    monthly = np.clip(monthly, 18.25, 118.75).round(2)
+
+    # Cancelación: la tasa de cada tipo de contrato se reparte entre los clientes que pueden cancelar
+    # (iniciaron antes de la última fecha de cancelación) según el internet y la antigüedad
+    eligible = begin_dates < END_DATES[-1]
+    internet_kind = np.where(has_internet, np.where(fiber, 'fiber', 'dsl'), 'none')
+    churn_weight = (pd.Series(internet_kind).map(CHURN_WEIGHT_INTERNET).to_numpy()
+                    * np.where(tenure <= 12, CHURN_WEIGHT_FIRST_YEAR, 1.0) * eligible)
+    churn_p = np.zeros(n_rows)
+    for name, rate in CHURN_RATE.items():
+        mask = contract_type == name
+        if churn_weight[mask].sum() > 0:
+            churn_p[mask] = np.clip(rate * churn_weight[mask] / churn_weight[mask].mean(), 0, 1)
+    churned = rng.random(n_rows) < churn_p
+    # Fecha de cancelación uniforme entre las posteriores a la fecha de inicio
+    first_end = np.searchsorted(END_DATES.to_numpy(), begin_dates.to_numpy(), side='right')
+    end_choice = np.minimum(first_end + (rng.random(n_rows) * (len(END_DATES) - first_end)).astype(np.int64),
+                            len(END_DATES) - 1)
+    end_dates = END_DATES[end_choice]
+    months_billed = np.where(churned, (end_dates.year - begin_dates.year) * 12 + end_dates.month - begin_dates.month,
+                             tenure)
+
+    total_charges = (monthly * months_billed * rng.uniform(0.95, 1.05, n_rows)).round(2).astype(str)
+    # Los clientes que iniciaron el último mes todavía no tienen cargos acumulados
+    total_charges[months_billed == 0] = ' '
+
+    df_contract = pd.DataFrame({
+        'customerID': ids,
+        'BeginDate': begin_dates.strftime('%Y-%m-%d'),
+        'EndDate': np.where(churned, end_dates.strftime('%Y-%m-%d %H:%M:%S'), 'No'),
+        'Type': contract_type,
+        'PaperlessBilling': yes_no(rng.random(n_rows) < 0.592),
+        'PaymentMethod': rng.choice(PAYMENT_METHODS, n_rows, p=PAYMENT_P),
+        'MonthlyCharges': monthly,
+        'TotalCharges': total_charges,
+    })
+    df_internet = pd.DataFrame({'customerID': ids, 'InternetService': np.where(fiber, 'Fiber optic', 'DSL'),
+                                **{name: yes_no(values) for name, values in services.items()}})[has_internet]
+    df_personal = pd.DataFrame({
+        'customerID': ids,
+        'gender': np.where(rng.random(n_rows) < 0.505, 'Male', 'Female'),
+        'SeniorCitizen': (rng.random(n_rows) < 0.162).astype(np.int8),
+        'Partner': yes_no(rng.random(n_rows) < 0.483),
+        'Dependents': yes_no(rng.random(n_rows) < 0.300),
+    })
+    df_phone = pd.DataFrame({'customerID': ids, 'MultipleLines': yes_no(multiple_lines)})[has_phone]
+    return df_contract, df_internet, df_personal, df_phone
+
+def generate_interconnect(n_customers, seed=54321, chunk_size=1000000):
+    ''' Genera las 4 tablas en memoria. Para escalas grandes usar write_interconnect. '''
+    chunks = list(iter_chunks(n_customers, seed, chunk_size))
+    return tuple(pd.concat(tables, ignore_index=True) for tables in zip(*chunks))
+
+def iter_chunks(n_customers, seed=54321, chunk_size=1000000):
+    ''' Genera los clientes por bloques. Cada bloque tiene su propia semilla derivada de seed,
+    así que el resultado es reproducible para los mismos seed y chunk_size. '''
+    seeds = np.random.SeedSequence(seed).spawn((n_customers + chunk_size - 1) // chunk_size)
+    for idx, chunk_seed in enumerate(seeds):
+        start = idx * chunk_size
+        yield generate_chunk(start, min(chunk_size, n_customers - start), np.random.default_rng(chunk_seed))
+
+def write_interconnect(output_dir, n_customers, seed=54321, chunk_size=1000000,
+                       names=('contract.csv', 'internet.csv', 'personal.csv', 'phone.csv')):
+    ''' Escribe las 4 tablas en output_dir por bloques de chunk_size clientes. '''
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, name) for name in names]
+    tmp_paths = [path + '.tmp' for path in paths]
+    for idx, tables in enumerate(iter_chunks(n_customers, seed, chunk_size)):
+        for df, tmp_path in zip(tables, tmp_paths):
+            df.to_csv(tmp_path, mode='w' if idx == 0 else 'a', header=idx == 0, index=False)
+    # Publicar los archivos solo cuando todos terminaron de escribirse
+    for tmp_path, path in zip(tmp_paths, paths):
+        os.replace(tmp_path, path)
+    return paths
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--seed', type=int, default=54321)
+    parser.add_argument('--chunk-size', type=int, default=1000000)
+    args = parser.parse_args()
+    for path in write_interconnect(args.output_dir, args.customers, args.seed, args.chunk_size):
+        print(path)
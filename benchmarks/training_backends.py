@@ -0,0 +1,111 @@
+''' Benchmark de los backends de entrenamiento de models/tuning.py: envoltorios de scikit-learn contra
+la API nativa con los datos discretizados una sola vez (NativeDataset).
+
+Para cada librería se ejecuta, en un proceso nuevo por backend, una validación cruzada de la configuración
+de BEST_PARAMS (con parada temprana) seguida del ajuste final:
+- sklearn: cada ajuste recibe los arreglos de sus filas y la librería vuelve a discretizarlos;
+- native: lgb.Dataset / xgb.QuantileDMatrix (hist) / catboost.Pool cuantizado se construyen una vez y los
+  pliegues y el ajuste final usan subconjuntos de ese dataset.
+Se reporta el tiempo de construcción del dataset, el tiempo por ajuste, el aumento del RSS máximo y el
+ROC-AUC promedio de validación de ambos caminos.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.training_backends --rows 200000 --libraries lightgbm xgboost catboost '''
+import argparse
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+MODEL_MODULES = {'catboost': 'models.c00_catboost', 'lightgbm': 'models.l00_lightgbm', 'xgboost': 'models.x00_xgboost'}
+
+def make_data(n_rows, n_cols=5, seed=54321):
+    ''' Características en [0, 1] (como las escaladas por preparing_data) y objetivo con relación no lineal. '''
+    rng = np.random.default_rng(seed)
+    features = rng.random((n_rows, n_cols)).astype(np.float32)
+    logit = 3 * features[:, 0] - 2 * features[:, 1] * features[:, 2] + np.sin(6 * features[:, 3]) - 1
+    target = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+    return features, target
+
+def fit_wrapper(library, params, features, target, train_idx, valid_idx, early_stopping_rounds):
+    ''' Un pliegue con el envoltorio de scikit-learn: ajuste sobre train_idx con parada temprana sobre valid_idx.
+    Regresa el ROC-AUC de validación. '''
+    from sklearn.metrics import roc_auc_score
+    from models.tuning import split_rounds
+    n_rounds, params = split_rounds(library, params)
+    features_train, target_train = features[train_idx], target[train_idx]
+    features_valid, target_valid = features[valid_idx], target[valid_idx]
+    if library == 'catboost':
+        from catboost import CatBoostClassifier
+        params = {key: value for key, value in params.items() if key != 'verbose'}
+        model = CatBoostClassifier(**params, iterations=n_rounds, eval_metric='AUC', verbose=False)
+        model.fit(features_train, target_train, eval_set=(features_valid, target_valid),
+                  early_stopping_rounds=early_stopping_rounds)
+    elif library == 'lightgbm':
+        import lightgbm as lgb
+        model = lgb.LGBMClassifier(**params, n_estimators=n_rounds)
+        model.fit(features_train, target_train, eval_set=[(features_valid, target_valid)], eval_metric='auc',
+                  callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+    else:
+        import xgboost as xgb
+        model = xgb.XGBClassifier(**params, n_estimators=n_rounds, early_stopping_rounds=early_stopping_rounds)
+        model.fit(features_train, target_train, eval_set=[(features_valid, target_valid)], verbose=False)
+    return roc_auc_score(target_valid, model.predict_proba(features_valid)[:, 1])
+
+def run_backend(library, backend, n_rows, cv, max_rounds, early_stopping_rounds):
+    ''' Validación cruzada más ajuste final con un backend. Se ejecuta en un proceso aparte. '''
+    from sklearn.model_selection import StratifiedKFold
+    from models.tuning import NativeDataset, build_folds, fit_early_stopped, split_rounds, train_booster, ROUNDS_PARAM
+    from utils.profiling import RunProfiler
+
+    features, target = make_data(n_rows)
+    params = dict(importlib.import_module(MODEL_MODULES[library]).BEST_PARAMS)
+    params[ROUNDS_PARAM[library]] = min(params[ROUNDS_PARAM[library]], max_rounds)
+    n_rounds, _ = split_rounds(library, params)
+
+    scores = []
+    with RunProfiler(sample_interval=0.005) as profiler:
+        with profiler.stage(backend):
+            start = time.perf_counter()
+            if backend == 'native':
+                dataset = NativeDataset(library, features, target)
+                build_s = time.perf_counter() - start
+                for train_set, valid_set in build_folds(library, features, target, cv, dataset=dataset):
+                    _, _, score = train_booster(library, params, train_set, valid_set, n_rounds, early_stopping_rounds)
+                    scores.append(score)
+                fit_early_stopped(library, params, features, target, early_stopping_rounds, backend='native', dataset=dataset)
+            else:
+                build_s = 0.0
+                splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=54321)
+                for train_idx, valid_idx in splitter.split(features, target):
+                    scores.append(fit_wrapper(library, params, features, target, np.sort(train_idx), np.sort(valid_idx),
+                                              early_stopping_rounds))
+                fit_early_stopped(library, params, features, target, early_stopping_rounds)
+            total_s = time.perf_counter() - start
+    record = profiler.stages[0]
+    return {'library': library, 'backend': backend, 'build_s': build_s, 'fit_s': (total_s - build_s) / (cv + 1),
+            'total_s': total_s, 'peak_rss_mb': (record['peak_rss_bytes'] - record['rss_start_bytes']) / 2**20,
+            'cv_roc_auc': float(np.mean(scores))}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--libraries', nargs='+', choices=sorted(MODEL_MODULES), default=['lightgbm', 'xgboost', 'catboost'])
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--max-rounds', type=int, default=200, help='Tope de árboles por ajuste')
+    parser.add_argument('--early-stopping-rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for library in args.libraries:
+        for backend in ('sklearn', 'native'):
+            # Un proceso nuevo por backend para que la memoria máxima no se mezcle
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(run_backend, library, backend, args.rows, args.cv, args.max_rounds,
+                                               args.early_stopping_rounds).result())
+    report = pd.DataFrame(results)
+    speedup = report.pivot(index='library', columns='backend', values='total_s')
+    print(report.round(3).to_string(index=False))
+    print((speedup['sklearn'] / speedup['native']).rename('aceleración').round(2).to_string())
@@ -0,0 +1,80 @@
+''' Benchmark de latencia del ensamble aplanado (models/compiled.py) contra los modelos de las librerías.
+
+Para cada librería se entrena el modelo de models/ (BEST_PARAMS) sobre datos sintéticos con los dos backends
+de models/tuning.py y se exporta con compile_model. Por defecto la parada temprana no corta el ajuste, para
+que los ensambles tengan el tamaño de los del proyecto (cientos de árboles profundos). Se mide:
+- un cliente: predict_proba con un arreglo de 1 fila (como en ChurnScorer) del envoltorio de scikit-learn,
+  del modelo nativo y CompiledEnsemble.predict_one (mediana y p99 en microsegundos);
+- lotes: filas por segundo de predict_proba del modelo nativo y de CompiledEnsemble.predict_raw;
+- paridad: diferencia máxima de probabilidades sobre todas las filas de prueba.
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.tree_predictor --rows 50000 --calls 2000 '''
+import argparse
+import importlib
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.training_backends import MODEL_MODULES, make_data
+from models.compiled import compile_model, parity_error
+from models.tuning import fit_early_stopped
+
+def latencies_us(function, rows, calls):
+    ''' Latencia por llamada (microsegundos) de function sobre rows[i % len(rows)]. '''
+    times = np.empty(calls)
+    for idx in range(calls):
+        row = rows[idx % len(rows)]
+        start = time.perf_counter()
+        function(row)
+        times[idx] = time.perf_counter() - start
+    return times * 1e6
+
+def throughput(function, features, repeat=3):
+    best = min(timed(function, features) for _ in range(repeat))
+    return len(features) / best
+
+def timed(function, features):
+    start = time.perf_counter()
+    function(features)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000, help='Filas de entrenamiento')
+    parser.add_argument('--test-rows', type=int, default=20000)
+    parser.add_argument('--calls', type=int, default=2000, help='Llamadas de un cliente por camino')
+    parser.add_argument('--early-stopping-rounds', type=int, default=1000)
+    parser.add_argument('--libraries', nargs='+', choices=sorted(MODEL_MODULES), default=['lightgbm', 'xgboost', 'catboost'])
+    args = parser.parse_args()
+
+    features, target = make_data(args.rows + args.test_rows)
+    features_train, target_train = features[:args.rows], target[:args.rows]
+    features_test = features[args.rows:]
+    rows = features_test[:1000]
+
+    results = []
+    for library in args.libraries:
+        params = dict(importlib.import_module(MODEL_MODULES[library]).BEST_PARAMS)
+        if library == 'catboost':
+            params['verbose'] = False
+        wrapper = fit_early_stopped(library, params, features_train, target_train, args.early_stopping_rounds)
+        model = fit_early_stopped(library, params, features_train, target_train, args.early_stopping_rounds,
+                                  backend='native')
+        compiled = compile_model(model)
+        compiled.row_function()
+
+        wrapper_one = latencies_us(wrapper.predict_proba, rows[:, None], args.calls)
+        native_one = latencies_us(model.predict_proba, rows[:, None], args.calls)
+        compiled_one = latencies_us(compiled.predict_one, rows, args.calls)
+        results.append({
+            'library': library, 'trees': compiled.n_trees, 'max_depth': compiled.max_depth,
+            'wrapper_p50_us': np.median(wrapper_one), 'native_p50_us': np.median(native_one),
+            'native_p99_us': np.percentile(native_one, 99),
+            'compiled_p50_us': np.median(compiled_one), 'compiled_p99_us': np.percentile(compiled_one, 99),
+            'native_rows_s': throughput(model.predict_proba, features_test),
+            'compiled_rows_s': throughput(compiled.predict_raw, features_test),
+            'max_abs_diff': max(parity_error(model, compiled, features_test),
+                                max(abs(model.predict_proba(row[None])[0, 1] - compiled.predict_one(row)) for row in rows)),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False, float_format='{:.3g}'.format))
@@ -0,0 +1,161 @@
+''' Re-puntuación incremental: solo se limpian y puntúan los clientes cuyas filas cambiaron.
+
+Para cada cliente se guarda un hash (digest) de su fila en cada una de las 4 tablas junto con su
+probabilidad de abandono. En cada ejecución se calculan los digests del snapshot nuevo y se comparan:
+- insertados: clientes nuevos;
+- actualizados: clientes con alguna fila distinta (incluye filas agregadas o eliminadas de internet/phone);
+- eliminados: clientes que ya no aparecen en ninguna tabla.
+preprocessing_data y el modelo se ejecutan solo para insertados y actualizados, y el resultado se une
+a la tabla guardada. Si cambia la versión del modelo se vuelven a puntuar todos los clientes.
+Los clientes que no se pueden puntuar (por ejemplo, sin fila en contract) quedan con churn_proba nulo y se
+cuentan en 'unscored' del resumen.
+La lectura y el hash de los CSV recorren todas las filas, pero son vectorizados; la limpieza y la
+predicción, que son lo costoso, son proporcionales al volumen de cambios.
+
+Uso (desde la raíz del repositorio):
+    python -m excecution.incremental --model catboost --input ./files/datasets/input/ --output predicciones.csv '''
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from preprocessing.preprocessing import preprocessing_data
+from utils.functions import read_csv_files
+from utils.monitoring import quality_counts
+from utils.profiling import profiled
+
+TABLES = ('contract', 'internet', 'personal', 'phone')
+# Tabla de estado con churn_proba = probabilidad de abandono. Las tablas 'predictions.feather' anteriores
+# guardaban P(is_active) con la misma versión del modelo, así que no se reutilizan
+STATE_NAME = 'churn_predictions.feather'
+
+def table_digests(df, id_col='customerID', name='tabla'):
+    ''' Hash de 64 bits del contenido de cada fila, indexado por cliente. Cada cliente debe tener una sola fila. '''
+    duplicated = df[id_col][df[id_col].duplicated()]
+    if len(duplicated):
+        raise ValueError(f'{name}: {len(duplicated)} filas con {id_col} repetido (por ejemplo {duplicated.iloc[0]!r}); '
+                         'la re-puntuación incremental necesita una fila por cliente en cada tabla')
+    values = df.drop(columns=id_col)
+    digests = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return pd.Series(digests, index=df[id_col].to_numpy(), dtype=np.uint64)
+
+def snapshot_digests(datasets, id_col='customerID'):
+    ''' Digests por cliente de las 4 tablas. Un cliente que no está en una tabla tiene digest 0 en esa tabla. '''
+    tables = [table_digests(df, id_col, name) for name, df in zip(TABLES, datasets)]
+    # Se alinea cada tabla con todos los clientes con fill_value=0: con concat/fillna las columnas con clientes
+    # faltantes pasarían por float64 y los hashes de 64 bits quedarían redondeados
+    customer_ids = pd.Index(np.concatenate([digests.index.to_numpy() for digests in tables])).unique()
+    digests = pd.DataFrame({name: digests.reindex(customer_ids, fill_value=0).to_numpy()
+                            for name, digests in zip(TABLES, tables)}, index=customer_ids)
+    digests.index.name = 'customer_id'
+    return digests
+
+def diff_snapshots(previous, current):
+    ''' Compara los digests guardados con los actuales. Regresa los índices de insertados, actualizados y eliminados. '''
+    inserted = current.index.difference(previous.index)
+    deleted = previous.index.difference(current.index)
+    common = current.index.intersection(previous.index)
+    changed = (current.loc[common, list(TABLES)].to_numpy() != previous.loc[common, list(TABLES)].to_numpy()).any(axis=1)
+    return inserted, common[changed], deleted
+
+def load_state(state_dir):
+    ''' Tabla guardada de la ejecución anterior (digests y predicciones por cliente), o None. '''
+    path = os.path.join(state_dir, STATE_NAME)
+    if not os.path.exists(path):
+        return None
+    import pyarrow.feather as feather
+    return feather.read_table(path).to_pandas().set_index('customer_id')
+
+def save_state(state, state_dir):
+    ''' Guarda digests y predicciones en un solo archivo, con escritura atómica, para que nunca queden desalineados. '''
+    import pyarrow.feather as feather
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, STATE_NAME)
+    feather.write_feather(state.reset_index(), path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path
+
+@profiled()
+def score_customers(scorer, datasets, customer_ids, id_col='customerID', monitor=None):
+    ''' Limpia y puntúa solo los clientes indicados. Los clientes que no se pueden puntuar (sin fila en contract,
+    o con un tipo de contrato no visto en entrenamiento) quedan con probabilidad nula en lugar de detener a los demás.
+    monitor: DriftMonitor (utils/monitoring.py); recibe los contadores de calidad de las tablas crudas
+    (entre ellos without_contract.*) y las columnas limpias de los clientes puntuados. '''
+    subsets = [df[df[id_col].isin(customer_ids)].copy() for df in datasets]
+    # Los contadores se calculan antes de limpiar: clean_table renombra las columnas en el mismo dataframe
+    counters = quality_counts(*subsets, id_col=id_col) if monitor is not None else None
+    df_clean = preprocessing_data(*subsets, keep_customer_id=True)
+    if monitor is not None:
+        monitor.observe(df_clean, counters)
+    probas = pd.Series(np.nan, index=df_clean['customer_id'].to_numpy(), name='churn_proba')
+    scorable = scorer.transformer.scorable(df_clean)
+    if scorable.any():
+        probas[scorable] = scorer.predict_proba(df_clean[scorable])
+    return probas
+
+@profiled()
+def incremental_score(scorer, files_path, state_dir='./files/predictions/', monitor=None):
+    ''' Actualiza la tabla de predicciones guardada en state_dir con el snapshot de files_path.
+    Regresa la tabla actualizada (indexada por customer_id) y un resumen de los cambios.
+    monitor: DriftMonitor para los clientes que se vuelven a puntuar (ver score_customers). '''
+    start = time.perf_counter()
+    datasets = read_csv_files(files_path)
+    current = snapshot_digests(datasets)
+    previous = load_state(state_dir)
+
+    if previous is None or (previous['model_version'] != scorer.version).any():
+        # Primera ejecución o modelo nuevo: puntuar todos los clientes
+        deleted = previous.index.difference(current.index) if previous is not None else current.index[:0]
+        previous = current.iloc[:0].assign(churn_proba=np.float64(0), model_version='')
+        inserted, updated = current.index, current.index[:0]
+        deleted_in_state = previous.index
+    else:
+        inserted, updated, deleted = diff_snapshots(previous, current)
+        deleted_in_state = deleted
+
+    to_score = inserted.append(updated)
+    state = previous.drop(index=deleted_in_state.append(updated))
+    if len(to_score):
+        probas = score_customers(scorer, datasets, to_score, monitor=monitor)
+        scored = current.loc[to_score].assign(churn_proba=probas, model_version=scorer.version)
+        state = pd.concat([state, scored])
+    # Mismo orden de clientes que el snapshot actual
+    state = state.reindex(current.index)
+    save_state(state, state_dir)
+
+    summary = {'customers': len(current), 'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted),
+               'unchanged': len(current) - len(to_score), 'model_version': scorer.version,
+               'unscored': int(state['churn_proba'].isna().sum()), 'elapsed_s': time.perf_counter() - start}
+    if monitor is not None:
+        summary['drift'] = monitor.summary()
+    return state, summary
+
+def export_predictions(state, output_path):
+    ''' Escribe customer_id, churn_proba y model_version en un CSV (escritura atómica). '''
+    state[['churn_proba', 'model_version']].to_csv(output_path + '.tmp', index_label='customer_id')
+    os.replace(output_path + '.tmp', output_path)
+
+if __name__ == '__main__':
+    from excecution.inference import ChurnScorer
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='catboost', help='Nombre del modelo en el registro')
+    parser.add_argument('--version', default=None, help='Versión del modelo (por defecto la última)')
+    parser.add_argument('--registry-dir', default='./files/models/')
+    parser.add_argument('--preprocessor', default='./files/models/preprocessor.pkl')
+    parser.add_argument('--input', default='./files/datasets/input/', help='Carpeta con los 4 CSV del snapshot')
+    parser.add_argument('--state-dir', default='./files/predictions/')
+    parser.add_argument('--output', default=None, help='CSV con la tabla completa de predicciones')
+    parser.add_argument('--monitor', action='store_true',
+                        help='Deriva y calidad de los clientes puntuados contra el perfil de entrenamiento')
+    parser.add_argument('--profile', default='./files/models/training_profile.json')
+    args = parser.parse_args()
+
+    scorer = ChurnScorer(args.model, args.version, args.registry_dir, args.preprocessor)
+    monitor = None
+    if args.monitor:
+        from utils.monitoring import DriftMonitor
+        monitor = DriftMonitor.load(args.profile)
+    state, summary = incremental_score(scorer, args.input, args.state_dir, monitor)
+    if args.output:
+        export_predictions(state, args.output)
+    print(summary)
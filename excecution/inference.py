@@ -0,0 +1,251 @@
+''' Inferencia con los modelos guardados en el registro (./files/models/).
+
+Uso (desde la raíz del repositorio):
+    # Puntuar un archivo grande por lotes, con memoria acotada al tamaño del lote
+    python -m excecution.inference --model catboost batch --input clientes.csv --output predicciones.csv
+    # Salida en Parquet o en CSV comprimido según la extensión
+    python -m excecution.inference --model catboost batch --input clientes.csv --output predicciones.parquet
+    # --monitor: deriva (PSI/KS) y calidad de cada lote contra el perfil de entrenamiento (utils/monitoring.py)
+    python -m excecution.inference --model catboost batch --input clientes.csv --output predicciones.csv --monitor
+
+    # Servidor HTTP local con micro-lotes: POST /predict con un cliente (objeto JSON) o una lista de clientes
+    python -m excecution.inference --model catboost serve --port 8000
+
+    # --compiled: los modelos de boosting predicen con el ensamble aplanado de models/compiled.py
+    python -m excecution.inference --model lightgbm --compiled serve --port 8000
+
+El archivo de entrada y las peticiones usan las columnas de salida de preprocessing_data
+(type, payment_method, monthly_charges, ...); customer_id es opcional y se copia a la salida (sin él se
+numeran las filas). La salida lleva customer_id, churn_proba, churn_pred, model y model_version. '''
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from models.registry import load_model
+from preprocessing.transformer import FittedPreprocessor
+from utils.feature_matrix import FEATURE_DTYPE
+from utils.prediction_writer import PredictionWriter, churn_probability
+
+class LatencyTracker:
+    ''' Guarda las latencias más recientes y el total de filas para reportar p50/p99 y filas por segundo.
+    Cada record es una unidad de trabajo (una petición HTTP o un lote del archivo) con rows filas;
+    unit es el nombre con el que se reporta su número en summary. '''
+
+    def __init__(self, window=100000, unit='requests'):
+        self.latencies = deque(maxlen=window)
+        self.unit = unit
+        self.count = 0
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def record(self, latency, rows=1):
+        self.latencies.append(latency)
+        self.count += 1
+        self.rows += rows
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        latencies_ms = np.asarray(self.latencies) * 1000
+        return {
+            self.unit: self.count,
+            'rows': self.rows,
+            'p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+            'p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+            'rows_per_sec': self.rows / elapsed if elapsed > 0 else None,
+        }
+
+class ChurnScorer:
+    ''' Carga una sola vez el preprocesamiento ajustado y el modelo, y calcula la probabilidad de abandono
+    (1 - P(is_active)). El preprocesamiento debe producir las columnas con las que se entrenó el modelo. '''
+
+    def __init__(self, model_name, version=None, registry_dir='./files/models/',
+                 preprocessor_path='./files/models/preprocessor.pkl', compiled=False):
+        self.model, self.metadata = load_model(model_name, version, registry_dir)
+        self.transformer = FittedPreprocessor.load(preprocessor_path)
+        self.version = self.metadata['version']
+        # Un preprocesamiento de otra ejecución de select-features puede tener otras columnas u otro orden
+        features = self.metadata.get('features')
+        if features is not None and list(features) != self.transformer.output_columns:
+            raise ValueError(f'El preprocesamiento {preprocessor_path} produce las columnas {self.transformer.output_columns}, '
+                             f'pero el modelo {model_name} (versión {self.version}) se entrenó con {list(features)}: '
+                             'vuelva a entrenar el modelo o use el preprocesamiento de su ejecución')
+        if compiled:
+            # Ensamble de árboles aplanado (models/compiled.py): el exportado junto al modelo o se exporta al cargar
+            from models.compiled import CompiledEnsemble, compile_model, compiled_path
+            path = compiled_path(model_name, self.version, registry_dir)
+            self.model = CompiledEnsemble.load(path) if os.path.exists(path) else compile_model(self.model)
+
+    def predict_proba(self, records):
+        ''' Probabilidad de abandono de cada cliente.
+        records: lista de diccionarios o DataFrame con las columnas de preprocessing_data. '''
+        # Mismo tipo que la matriz de entrenamiento (utils/feature_matrix.py)
+        features = self.transformer.transform(records).astype(FEATURE_DTYPE)
+        return churn_probability(self.model, features)
+
+def score_batches(scorer, input_path, output_path, batch_size=50000, customer_id='customer_id', monitor=None):
+    ''' Puntúa un CSV por bloques de batch_size filas y escribe las predicciones en output_path
+    (Parquet o CSV, comprimido según la extensión; ver utils/prediction_writer.py).
+    Solo unos pocos bloques están en memoria a la vez: el archivo se escribe en un hilo en segundo plano
+    mientras se puntúa el siguiente bloque, y se publica solo si todo el proceso terminó bien.
+    monitor: DriftMonitor (utils/monitoring.py) que compara cada bloque con el perfil de entrenamiento. '''
+    tracker = LatencyTracker(unit='batches')
+    with PredictionWriter(output_path, scorer.metadata['name'], scorer.version, id_column=customer_id) as writer:
+        for chunk in pd.read_csv(input_path, chunksize=batch_size):
+            start = time.perf_counter()
+            customer_ids = chunk[customer_id].to_numpy() if customer_id in chunk.columns else None
+            if monitor is not None:
+                monitor.observe(chunk)
+            writer.write(customer_ids, scorer.predict_proba(chunk))
+            tracker.record(time.perf_counter() - start, rows=len(chunk))
+    summary = tracker.summary()
+    if monitor is not None:
+        summary['drift'] = monitor.summary()
+    return summary
+
+class MicroBatcher:
+    ''' Junta las peticiones individuales que llegan casi al mismo tiempo en un solo lote
+    (hasta max_batch filas o max_wait_ms de espera) para llamar al modelo una sola vez. '''
+
+    def __init__(self, scorer, max_batch=64, max_wait_ms=2.0):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # Latencia por petición HTTP (desde que se recibe hasta que se tienen todas sus probabilidades)
+        self.tracker = LatencyTracker(unit='requests')
+
+    async def predict(self, record):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((record, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            records = [record for record, _ in batch]
+            try:
+                # El modelo se ejecuta en un hilo para no bloquear el ciclo de eventos
+                probas = await loop.run_in_executor(None, self.scorer.predict_proba, records)
+            except Exception:
+                # Un registro inválido no debe hacer fallar al resto del lote: se puntúa cada uno por separado
+                probas = [await loop.run_in_executor(None, self._predict_one, record) for record in records]
+            for (_, future), proba in zip(batch, probas):
+                if isinstance(proba, Exception):
+                    future.set_exception(proba)
+                    continue
+                future.set_result(float(proba))
+
+    def _predict_one(self, record):
+        try:
+            return self.scorer.predict_proba([record])[0]
+        except Exception as error:
+            return error
+
+async def handle_connection(reader, writer, batcher):
+    ''' Servidor HTTP/1.1 mínimo: POST /predict y GET /stats. '''
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, value = line.decode().split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            status = '200 OK'
+            if method == 'GET' and path == '/stats':
+                response = batcher.tracker.summary()
+            elif method == 'POST' and path == '/predict':
+                try:
+                    payload = json.loads(body)
+                    records = payload if isinstance(payload, list) else [payload]
+                    start = time.perf_counter()
+                    probas = await asyncio.gather(*(batcher.predict(record) for record in records))
+                    batcher.tracker.record(time.perf_counter() - start, rows=len(records))
+                    response = {'model_version': batcher.scorer.version, 'churn_proba': probas}
+                except Exception as error:
+                    status, response = '400 Bad Request', {'error': str(error)}
+            else:
+                status, response = '404 Not Found', {'error': 'not found'}
+
+            data = json.dumps(response).encode()
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                         f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(scorer, host='127.0.0.1', port=8000, max_batch=64, max_wait_ms=2.0):
+    batcher = MicroBatcher(scorer, max_batch, max_wait_ms)
+    batcher_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(lambda r, w: handle_connection(r, w, batcher), host, port)
+    print(f'Sirviendo el modelo {scorer.metadata["name"]} (versión {scorer.version}) en http://{host}:{port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+        print(batcher.tracker.summary())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='catboost', help='Nombre del modelo en el registro')
+    parser.add_argument('--version', default=None, help='Versión del modelo (por defecto la última)')
+    parser.add_argument('--registry-dir', default='./files/models/')
+    parser.add_argument('--preprocessor', default='./files/models/preprocessor.pkl')
+    parser.add_argument('--compiled', action='store_true',
+                        help='Predecir con el ensamble aplanado de models/compiled.py (modelos de boosting)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help='Puntuar un archivo CSV por lotes')
+    batch_parser.add_argument('--input', required=True)
+    batch_parser.add_argument('--output', required=True)
+    batch_parser.add_argument('--batch-size', type=int, default=50000)
+    batch_parser.add_argument('--monitor', action='store_true',
+                              help='Comparar cada lote con el perfil de entrenamiento (deriva y calidad de datos)')
+    batch_parser.add_argument('--profile', default='./files/models/training_profile.json')
+
+    serve_parser = subparsers.add_parser('serve', help='Servidor HTTP local con micro-lotes')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--max-batch', type=int, default=64)
+    serve_parser.add_argument('--max-wait-ms', type=float, default=2.0)
+
+    args = parser.parse_args()
+    scorer = ChurnScorer(args.model, args.version, args.registry_dir, args.preprocessor, args.compiled)
+    if args.command == 'batch':
+        monitor = None
+        if args.monitor:
+            from utils.monitoring import DriftMonitor
+            monitor = DriftMonitor.load(args.profile)
+        print(score_batches(scorer, args.input, args.output, args.batch_size, monitor=monitor))
+    else:
+        try:
+            asyncio.run(serve(scorer, args.host, args.port, args.max_batch, args.max_wait_ms))
+        except KeyboardInterrupt:
+            pass
@@ -1,34 +1,252 @@
-from utils.functions import read_csv_files
-from preprocessing.preprocessing import preprocessing_data
-from preprocessing.preparing import preparing_data
-from models.d00_dummy import dummytest
-from models.m00_logistic_regresion import log_reg_model
-from models.c00_catboost import catboost_model
-from models.l00_lightgbm import lgbm_model
-from models.x00_xgboost import xgboost_model
+''' Punto de entrada del proyecto. Sin subcomando ejecuta el pipeline completo.
 
-# Lectura de los archivos
-df_contract, df_internet, df_personal, df_phone = read_csv_files('./files/datasets/input/')
+Uso (desde la raíz del repositorio):
+    python -m excecution.pipeline                      # preprocesamiento, selección de características y todos los modelos
+    python -m excecution.pipeline preprocess           # solo lectura y limpieza (con caché)
+    python -m excecution.pipeline select-features      # preparación, Boruta y preprocesamiento ajustado
+    python -m excecution.pipeline train catboost       # uno o varios modelos sobre los datos preparados
+    python -m excecution.pipeline predict --model catboost --input clientes.csv --output predicciones.csv
+    python -m excecution.pipeline rescore --model catboost   # solo los clientes que cambiaron desde la última vez
+    python -m excecution.pipeline compare --n-boot 2000      # intervalos de confianza y comparación pareada de los modelos
 
-# Preprocesar los datasets
-df_telecom_clean = preprocessing_data(df_contract, df_internet, df_personal, df_phone)
+Las librerías pesadas (boruta, imblearn, catboost, lightgbm, xgboost, matplotlib) se importan solo
+dentro de las etapas que las usan, por lo que cada subcomando carga únicamente lo que necesita. '''
+import argparse
+import os
+from excecution.zoo import MODEL_ZOO
+from utils.profiling import RunProfiler, profiled
 
-# Preparar los datos
-features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train, target_test = preparing_data(df_telecom_clean)
+# Balanceo de clases: 'oversample' (RandomOverSampler) o 'weights' (pesos en los modelos, sin duplicar filas)
+BALANCE = 'oversample'
 
-# Aplicar los modelos de machine learning
+INPUT_PATH = './files/datasets/input/'
+INPUT_FILES = ('contract.csv', 'internet.csv', 'personal.csv', 'phone.csv')
+# Datos preparados por select-features (matrices float32 mapeadas en memoria, utils/feature_matrix.py),
+# para entrenar después modelos sueltos sin repetir Boruta y compartirlos entre los procesos de los modelos
+PREPARED_PATH = './files/cache/prepared/'
+# Cambiar este valor cuando cambie preparing_data para que se vuelvan a preparar los datos guardados
+PREPARED_VERSION = 2
+PREPROCESSOR_PATH = './files/models/preprocessor.pkl'
+# Perfil de las características de entrenamiento para el monitoreo de deriva (utils/monitoring.py)
+PROFILE_PATH = './files/models/training_profile.json'
+# Predicciones del conjunto de prueba que escribe cada modelo (utils/prediction_writer.py)
+OUTPUT_PATH = './files/datasets/output/'
+# Reportes JSON de cada ejecución (tiempos, CPU, memoria y tamaño de los datos por etapa)
+REPORT_DIR = './files/reports/'
 
-# Dummy model
-dummytest(features_train_encoded_scaled, target_train, features_test_encoded_scaled, target_test)
+def preprocess(files_path=INPUT_PATH, n_workers=1, keep_customer_id=True):
+    ''' Lectura y preprocesamiento de los archivos (n_workers > 1: una tabla por proceso).
+    Si los archivos de entrada no cambiaron, se carga el resultado guardado en ./files/cache/
+    keep_customer_id: conservar customer_id, que preparing_data usa como índice de los conjuntos. '''
+    from preprocessing.preprocessing import preprocessing_data_cached
+    return preprocessing_data_cached(files_path, n_workers=n_workers, keep_customer_id=keep_customer_id)
 
-# Logistic Regression model
-log_reg_model(features_train_encoded_scaled, target_train, features_test_encoded_scaled, target_test)
+def prepared_key(files_path=INPUT_PATH, balance=BALANCE):
+    ''' Huella de los archivos de entrada, del balanceo y de la versión de la preparación (utils/cache.py). '''
+    from utils.cache import cache_key
+    return cache_key([os.path.join(files_path, name) for name in INPUT_FILES], params={'balance': balance, 'version': PREPARED_VERSION})
 
-# Catboost model
-catboost_model(features_train_encoded_scaled, target_train, features_test_encoded_scaled, target_test)
+@profiled()
+def select_features(files_path=INPUT_PATH, balance=BALANCE, prepared_path=PREPARED_PATH,
+                    preprocessor_path=PREPROCESSOR_PATH, n_workers=1, profile_path=PROFILE_PATH):
+    ''' Prepara los datos (balanceo, codificación, escalado y Boruta), guarda el preprocesamiento ajustado
+    para transformar clientes nuevos, el perfil de las características para el monitoreo de deriva y los
+    conjuntos escalados para la etapa de entrenamiento.
+    Regresa los conjuntos abiertos desde prepared_path (mapeados en memoria). '''
+    from preprocessing.preparing import preparing_data
+    from utils.feature_matrix import load_feature_matrix, write_feature_matrix
+    from utils.monitoring import FeatureProfile
+    df_telecom_clean = preprocess(files_path, n_workers)
+    FeatureProfile.fit(df_telecom_clean).save(profile_path)
+    _, _, features_train_encoded_scaled, features_test_encoded_scaled, target_train, target_test, transformer = preparing_data(
+        df_telecom_clean, return_transformer=True, balance=balance
+    )
 
-# LightGBM model
-lgbm_model(features_train_encoded_scaled, target_train, features_test_encoded_scaled, target_test)
+    os.makedirs(os.path.dirname(preprocessor_path), exist_ok=True)
+    transformer.save(preprocessor_path)
 
-# XGBoost model
-xgboost_model(features_train_encoded_scaled, target_train, features_test_encoded_scaled, target_test)
\ No newline at end of file
+    write_feature_matrix(prepared_path, features_train_encoded_scaled, target_train, features_test_encoded_scaled,
+                         target_test, balance=balance, input_key=prepared_key(files_path, balance))
+    return load_feature_matrix(prepared_path)
+
+def load_prepared(files_path=INPUT_PATH, balance=BALANCE, prepared_path=PREPARED_PATH, n_workers=1):
+    ''' Carga los datos guardados por select-features; si no existen, se prepararon con otro balanceo
+    o los archivos de files_path cambiaron desde entonces, se vuelven a preparar. '''
+    from utils.feature_matrix import has_feature_matrix, load_feature_matrix
+    if has_feature_matrix(prepared_path):
+        prepared = load_feature_matrix(prepared_path)
+        if prepared.get('input_key') == prepared_key(files_path, balance):
+            return prepared
+    return select_features(files_path, balance, prepared_path, n_workers=n_workers)
+
+@profiled()
+def train(model_names=None, prepared=None, cpu_budget=None, parallel=True, search=False, backend='native'):
+    ''' Aplica los modelos de machine learning (por defecto Dummy, Logistic Regression, Catboost, LightGBM y XGBoost).
+    Los modelos se entrenan en paralelo repartiendo los núcleos disponibles entre ellos.
+    backend: API con la que se entrenan los modelos de boosting ('native' o 'sklearn', ver models/tuning.py).
+    search: False (parámetros fijos), 'halving' (o True) o 'hyperband'. '''
+    from excecution.zoo import run_model_zoo
+    prepared = prepared if prepared is not None else load_prepared()
+    return run_model_zoo(prepared['features_train'], prepared['target_train'], prepared['features_test'],
+                         prepared['target_test'], model_names=model_names, cpu_budget=cpu_budget, parallel=parallel,
+                         model_kwargs={'balanced': prepared['balance'] == 'weights'},
+                         threaded_kwargs={'search': search, 'backend': backend},
+                         matrix_dir=prepared.get('matrix_dir'))
+
+def load_monitor(profile_path=PROFILE_PATH):
+    ''' Monitor de deriva con el perfil guardado por select-features. '''
+    from utils.monitoring import DriftMonitor
+    return DriftMonitor.load(profile_path)
+
+@profiled()
+def predict(model_name, input_path, output_path, version=None, registry_dir='./files/models/',
+            preprocessor_path=PREPROCESSOR_PATH, batch_size=50000, monitor=False, profile_path=PROFILE_PATH):
+    ''' Puntúa un CSV por lotes con un modelo del registro.
+    monitor: comparar cada lote con el perfil de entrenamiento (deriva y calidad de datos). '''
+    from excecution.inference import ChurnScorer, score_batches
+    scorer = ChurnScorer(model_name, version, registry_dir, preprocessor_path)
+    return score_batches(scorer, input_path, output_path, batch_size, monitor=load_monitor(profile_path) if monitor else None)
+
+@profiled()
+def rescore(model_name, files_path=INPUT_PATH, state_dir='./files/predictions/', output_path=None, version=None,
+            registry_dir='./files/models/', preprocessor_path=PREPROCESSOR_PATH, monitor=False, profile_path=PROFILE_PATH):
+    ''' Re-puntuación incremental de los clientes de files_path (ver excecution/incremental.py). '''
+    from excecution.inference import ChurnScorer
+    from excecution.incremental import export_predictions, incremental_score
+    scorer = ChurnScorer(model_name, version, registry_dir, preprocessor_path)
+    state, summary = incremental_score(scorer, files_path, state_dir, load_monitor(profile_path) if monitor else None)
+    if output_path:
+        export_predictions(state, output_path)
+    return summary
+
+@profiled()
+def compare(model_names=None, prepared_path=PREPARED_PATH, output_path=OUTPUT_PATH, method='bootstrap', n_boot=2000,
+            alpha=0.05, n_workers=1):
+    ''' Intervalos de confianza de ROC-AUC/APS y comparación pareada de los modelos entrenados, a partir de sus
+    predicciones del conjunto de prueba (ver utils/model_comparison.py). Sin model_names se usan todos los
+    modelos de MODEL_ZOO que tengan predicciones guardadas. Regresa (intervalos, comparaciones). '''
+    import numpy as np
+    import pandas as pd
+    from utils.feature_matrix import load_feature_matrix
+    from utils.model_comparison import compare_models
+    prepared = load_feature_matrix(prepared_path)
+    target_test = prepared['target_test']
+    # Los intervalos suponen filas independientes: cada fila de prueba debe ser un cliente distinto y que no esté
+    # en entrenamiento (los datos preparados antes de sobremuestrear solo entrenamiento tienen duplicados)
+    duplicated = int(target_test.index.duplicated().sum())
+    in_train = int(target_test.index.isin(prepared['target_train'].index).sum())
+    if duplicated or in_train:
+        raise ValueError(f'El conjunto de prueba de {prepared_path} tiene {duplicated} clientes repetidos y {in_train} filas '
+                         'de clientes de entrenamiento: vuelva a ejecutar select-features y a entrenar los modelos')
+    customer_ids = target_test.index.astype(str)
+
+    probas = {}
+    for name in model_names or MODEL_ZOO:
+        path = os.path.join(output_path, f'{name}_predicts.parquet')
+        if not os.path.exists(path):
+            if model_names:
+                raise FileNotFoundError(f'No hay predicciones de {name} en {path}: entrene el modelo primero')
+            continue
+        predictions = pd.read_parquet(path, columns=['customer_id', 'churn_proba'])
+        # Las filas deben ser las del conjunto de prueba preparado actual, en el mismo orden
+        if not np.array_equal(predictions['customer_id'].astype(str).to_numpy(), customer_ids.to_numpy()):
+            raise ValueError(f'Las predicciones de {name} no corresponden a los datos preparados: vuelva a entrenar el modelo')
+        probas[name] = predictions['churn_proba'].to_numpy()
+    if not probas:
+        raise FileNotFoundError(f'No hay predicciones de ningún modelo en {output_path}')
+    # churn_proba es la probabilidad de abandono: la clase positiva es is_active = False
+    return compare_models(~target_test.to_numpy(dtype=bool), probas, method, n_boot, alpha, n_workers=n_workers)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files-path', default=INPUT_PATH, help='Carpeta con los CSV de entrada')
+    parser.add_argument('--balance', choices=['oversample', 'weights'], default=BALANCE)
+    parser.add_argument('--prepared-path', default=PREPARED_PATH)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos para limpiar las 4 tablas en paralelo (0 para todos los núcleos)')
+    parser.add_argument('--report', default=REPORT_DIR,
+                        help='Archivo o carpeta del reporte JSON de la ejecución ("" para no guardarlo)')
+    parser.add_argument('--profile', action='append', default=[], metavar='STAGE',
+                        help='Capturar cProfile en esta etapa (por ejemplo Boruta_alg o catboost); se puede repetir')
+    parser.add_argument('--tracemalloc', action='append', default=[], metavar='STAGE',
+                        help='Capturar las mayores asignaciones de memoria con tracemalloc en esta etapa')
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('preprocess', help='Lectura y limpieza de los archivos de entrada')
+    subparsers.add_parser('select-features', help='Preparación de los datos y selección de características con Boruta')
+
+    train_parser = subparsers.add_parser('train', help='Entrenar modelos sobre los datos preparados')
+    train_parser.add_argument('models', nargs='*', metavar='model',
+                              help=f'Modelos a entrenar (por defecto todos): {", ".join(MODEL_ZOO)}')
+    train_parser.add_argument('--cpu-budget', type=int, default=None)
+    train_parser.add_argument('--sequential', action='store_true', help='Entrenar los modelos uno después del otro')
+    train_parser.add_argument('--search', nargs='?', const='halving', default=False, choices=['halving', 'hyperband'],
+                              help='Búsqueda de hiperparámetros en los modelos de boosting (por defecto mitades sucesivas)')
+    train_parser.add_argument('--backend', choices=['native', 'sklearn'], default='native',
+                              help='native: datos discretizados una vez y API nativa; sklearn: envoltorios de scikit-learn')
+
+    predict_parser = subparsers.add_parser('predict', help='Puntuar un CSV con un modelo del registro')
+    predict_parser.add_argument('--model', default='catboost')
+    predict_parser.add_argument('--version', default=None)
+    predict_parser.add_argument('--registry-dir', default='./files/models/')
+    predict_parser.add_argument('--preprocessor', default=PREPROCESSOR_PATH)
+    predict_parser.add_argument('--input', required=True)
+    predict_parser.add_argument('--output', required=True)
+    predict_parser.add_argument('--batch-size', type=int, default=50000)
+    predict_parser.add_argument('--monitor', action='store_true', help='Deriva y calidad de datos de cada lote')
+
+    rescore_parser = subparsers.add_parser('rescore', help='Puntuar solo los clientes que cambiaron en los CSV de entrada')
+    rescore_parser.add_argument('--model', default='catboost')
+    rescore_parser.add_argument('--version', default=None)
+    rescore_parser.add_argument('--registry-dir', default='./files/models/')
+    rescore_parser.add_argument('--preprocessor', default=PREPROCESSOR_PATH)
+    rescore_parser.add_argument('--state-dir', default='./files/predictions/')
+    rescore_parser.add_argument('--output', default=None, help='CSV con la tabla completa de predicciones')
+    rescore_parser.add_argument('--monitor', action='store_true', help='Deriva y calidad de los clientes puntuados')
+
+    compare_parser = subparsers.add_parser('compare', help='Intervalos de confianza y comparación pareada de los modelos')
+    compare_parser.add_argument('models', nargs='*', metavar='model',
+                                help='Modelos a comparar (por defecto todos los que tienen predicciones)')
+    compare_parser.add_argument('--method', choices=['bootstrap', 'delong'], default='bootstrap')
+    compare_parser.add_argument('--n-boot', type=int, default=2000, help='Réplicas bootstrap')
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help='Nivel de los intervalos: 1 - alpha')
+    return parser
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command in ('train', 'compare'):
+        unknown = [name for name in args.models if name not in MODEL_ZOO]
+        if unknown:
+            parser.error(f'Modelos desconocidos: {", ".join(unknown)}')
+
+    n_workers = args.workers or None
+    with RunProfiler(profile_stages=args.profile, trace_stages=args.tracemalloc) as profiler:
+        if args.command == 'preprocess':
+            df_telecom_clean = preprocess(args.files_path, n_workers)
+            print(f'Datos preprocesados: {df_telecom_clean.shape[0]} filas, {df_telecom_clean.shape[1]} columnas')
+        elif args.command == 'select-features':
+            prepared = select_features(args.files_path, args.balance, args.prepared_path, n_workers=n_workers)
+            print(f"Características seleccionadas: {', '.join(prepared['features_train'].columns)}")
+        elif args.command == 'train':
+            prepared = load_prepared(args.files_path, args.balance, args.prepared_path, n_workers)
+            train(args.models or None, prepared, args.cpu_budget, parallel=not args.sequential, search=args.search,
+                  backend=args.backend)
+        elif args.command == 'predict':
+            print(predict(args.model, args.input, args.output, args.version, args.registry_dir, args.preprocessor,
+                          args.batch_size, args.monitor))
+        elif args.command == 'rescore':
+            print(rescore(args.model, args.files_path, args.state_dir, args.output, args.version, args.registry_dir,
+                          args.preprocessor, args.monitor))
+        elif args.command == 'compare':
+            intervals, comparisons = compare(args.models or None, args.prepared_path, method=args.method,
+                                             n_boot=args.n_boot, alpha=args.alpha, n_workers=n_workers)
+            print(intervals.round(4).to_string(index=False))
+            print(comparisons.round(4).to_string(index=False))
+        else:
+            prepared = select_features(args.files_path, args.balance, args.prepared_path, n_workers=n_workers)
+            train(prepared=prepared)
+
+    print(profiler.summary())
+    if args.report:
+        print(f'Reporte de la ejecución: {profiler.write_report(args.report)}')
@@ -0,0 +1,148 @@
+''' Ejecución en paralelo de los modelos de models/ con un presupuesto de CPU.
+
+Cada modelo se entrena en su propio proceso. Los núcleos disponibles se reparten entre los modelos:
+los modelos sin hilos usan un núcleo y los de boosting reparten el resto como hilos de cada ajuste
+(thread_count/n_jobs), de modo que el total de hilos no supere el presupuesto.
+Los datos se comparten con los procesos como una matriz float32 mapeada en memoria (utils/feature_matrix.py):
+cada proceso recibe solo la carpeta y abre los archivos, en lugar de una copia serializada de los dataframes. '''
+import importlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.profiling import RunProfiler, active_profiler
+
+# Modelos disponibles: módulo, función y si acepta n_jobs (los modelos de boosting).
+# El orden es el de excecution/pipeline.py; en paralelo se lanzan primero los más pesados.
+MODEL_ZOO = {
+    'dummy': {'module': 'models.d00_dummy', 'function': 'dummytest', 'threaded': False},
+    'logistic_regression': {'module': 'models.m00_logistic_regresion', 'function': 'log_reg_model', 'threaded': False},
+    'catboost': {'module': 'models.c00_catboost', 'function': 'catboost_model', 'threaded': True},
+    'lightgbm': {'module': 'models.l00_lightgbm', 'function': 'lgbm_model', 'threaded': True},
+    'xgboost': {'module': 'models.x00_xgboost', 'function': 'xgboost_model', 'threaded': True},
+}
+
+def plan_cpu_budget(model_names, cpu_budget=None):
+    ''' Reparte cpu_budget núcleos entre los modelos.
+    Regresa el número de procesos y, por modelo, el argumento n_jobs. '''
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    threaded = [name for name in model_names if MODEL_ZOO[name]['threaded']]
+    plan = {name: {} for name in model_names}
+
+    # Con menos núcleos que modelos, cada modelo usa un solo núcleo y los procesos se limitan al presupuesto
+    if cpu_budget <= len(model_names):
+        for name in threaded:
+            plan[name] = {'n_jobs': 1}
+        return cpu_budget, plan
+
+    # Los modelos sin hilos usan un núcleo; el resto se reparte entre los modelos de boosting
+    threaded_cores = cpu_budget - (len(model_names) - len(threaded))
+    for idx, name in enumerate(threaded):
+        cores = threaded_cores // len(threaded) + (1 if idx < threaded_cores % len(threaded) else 0)
+        plan[name] = {'n_jobs': cores}
+    return len(model_names), plan
+
+def stage_data(data):
+    ''' Los 4 conjuntos de un modelo: data es la tupla de conjuntos o la carpeta de una matriz guardada
+    con write_feature_matrix, que se abre mapeada en memoria. '''
+    if isinstance(data, str):
+        from utils.feature_matrix import load_feature_matrix
+        matrix = load_feature_matrix(data)
+        return matrix['features_train'], matrix['target_train'], matrix['features_test'], matrix['target_test']
+    return data
+
+def run_stage(name, data, kwargs, profile_options=None):
+    ''' Importa y entrena un modelo; se ejecuta dentro de un proceso del pool.
+    profile_options: si se indica, el modelo se mide con un RunProfiler propio del proceso
+    (argumentos de RunProfiler) y se regresan sus registros. '''
+    data = stage_data(data)
+    model_info = MODEL_ZOO[name]
+    model_function = getattr(importlib.import_module(model_info['module']), model_info['function'])
+    start = time.perf_counter()
+    if profile_options is None:
+        model_function(*data, **kwargs)
+        return name, time.perf_counter() - start, []
+    with RunProfiler(**profile_options) as profiler:
+        with profiler.stage(name, rows=len(data[0]), cols=data[0].shape[1]):
+            model_function(*data, **kwargs)
+    return name, time.perf_counter() - start, profiler.stages
+
+def stage_kwargs(name, model_kwargs=None, threaded_kwargs=None):
+    ''' Argumentos de la función de un modelo: los comunes más, en los modelos de boosting, threaded_kwargs. '''
+    kwargs = dict(model_kwargs or {})
+    if MODEL_ZOO[name]['threaded']:
+        kwargs.update(threaded_kwargs or {})
+    return kwargs
+
+def run_sequential(model_names, data, model_kwargs=None, threaded_kwargs=None, profile_options=None):
+    ''' Entrena los modelos uno después del otro, como en la versión original del pipeline. '''
+    start = time.perf_counter()
+    stage_times, profile = {}, []
+    for name in model_names:
+        _, elapsed, records = run_stage(name, data, stage_kwargs(name, model_kwargs, threaded_kwargs), profile_options)
+        stage_times[name] = elapsed
+        profile.extend(records)
+    return {'mode': 'sequential', 'total_s': time.perf_counter() - start, 'stages_s': stage_times, 'profile': profile}
+
+def run_parallel(model_names, data, cpu_budget=None, model_kwargs=None, threaded_kwargs=None, profile_options=None):
+    ''' Entrena los modelos en paralelo en un pool de procesos respetando cpu_budget. '''
+    max_workers, plan = plan_cpu_budget(model_names, cpu_budget)
+    # Lanzar primero los modelos de boosting, que son los que más tardan
+    ordered = sorted(model_names, key=lambda name: not MODEL_ZOO[name]['threaded'])
+
+    start = time.perf_counter()
+    stage_times, profile = {}, []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_stage, name, data, dict(stage_kwargs(name, model_kwargs, threaded_kwargs), **plan[name]),
+                                   profile_options) for name in ordered]
+        for future in as_completed(futures):
+            name, elapsed, records = future.result()
+            stage_times[name] = elapsed
+            profile.extend(records)
+    return {'mode': 'parallel', 'total_s': time.perf_counter() - start, 'stages_s': stage_times,
+            'workers': max_workers, 'plan': plan, 'profile': profile}
+
+def run_model_zoo(features_train, target_train, features_test, target_test, model_names=None,
+                  cpu_budget=None, parallel=True, compare_sequential=False, model_kwargs=None, threaded_kwargs=None,
+                  matrix_dir=None):
+    ''' Entrena los modelos indicados (por defecto todos los de MODEL_ZOO) y regresa un reporte de tiempos.
+    compare_sequential: además ejecuta la versión secuencial y reporta ambos tiempos totales.
+    model_kwargs: argumentos comunes para todas las funciones de los modelos (por ejemplo balanced=True).
+    threaded_kwargs: argumentos solo para los modelos de boosting (por ejemplo search='hyperband').
+    matrix_dir: carpeta donde ya están guardados los conjuntos (write_feature_matrix). Si no se indica y los
+    modelos se entrenan en paralelo, se escriben en una carpeta temporal.
+    Si hay un RunProfiler activo, cada modelo se mide en su proceso y sus registros se agregan al reporte. '''
+    model_names = list(model_names or MODEL_ZOO)
+    data = (features_train, target_train, features_test, target_test)
+    tmp_dir = None
+    if matrix_dir is None and parallel:
+        from utils.feature_matrix import write_feature_matrix
+        tmp_dir = tempfile.TemporaryDirectory(prefix='feature_matrix_')
+        matrix_dir = write_feature_matrix(tmp_dir.name, *data)
+    if matrix_dir is not None:
+        data = matrix_dir
+    profiler = active_profiler()
+    profile_options = None
+    if profiler is not None:
+        profile_options = {'profile_stages': profiler.profile_stages, 'trace_stages': profiler.trace_stages,
+                           'sample_interval': profiler.sample_interval, 'top': profiler.top}
+
+    reports = []
+    try:
+        if compare_sequential or not parallel:
+            reports.append(run_sequential(model_names, data, model_kwargs, threaded_kwargs, profile_options))
+        if parallel:
+            reports.append(run_parallel(model_names, data, cpu_budget, model_kwargs, threaded_kwargs, profile_options))
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    if profiler is not None:
+        for report in reports:
+            profiler.extend([dict(record, mode=report['mode']) for record in report['profile']], parent=profiler.current_stage())
+
+    for report in reports:
+        stages = ', '.join(f'{name}: {elapsed:.1f}s' for name, elapsed in report['stages_s'].items())
+        print(f"Tiempo total ({report['mode']}): {report['total_s']:.1f}s [{stages}]")
+    if len(reports) == 2:
+        print(f"Aceleración: {reports[0]['total_s'] / reports[1]['total_s']:.2f}x")
+    return reports
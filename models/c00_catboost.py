@@ -1,42 +1,62 @@
-import pandas as pd
-from catboost import CatBoostClassifier, Pool
-from sklearn.metrics import roc_auc_score, f1_score, accuracy_score
-from sklearn.model_selection import GridSearchCV
 from utils.functions import evaluate_model
-
-def catboost_model(features_train, target_train, features_test, target_test, show_metrics=True):
-
-    # Definir la grilla de hiperparámetros para la búsqueda aleatoria
-    # *Nota: La busueda de hiperparametros ya se realizo, por lo que los hiperaparámetros puestos a continuación son los que obtienen un mejor resultado.
-    # Esto con el objetivo de reducir el tiempo del modelo.
-
-    param_grid = {
-        'learning_rate': [0.1],
-        'depth': [6],
-        'l2_leaf_reg': [1],
-        'iterations': [500],
-        'verbose_eval': [100]
-    }
-
-    # Métricas de evaluación
-    scoring = {'ROC-AUC': 'roc_auc', 'F1': 'f1', 'Accuracy': 'accuracy'}
-
-    # Definir el modelo catboost
-    catboost = CatBoostClassifier()
-
-    # Realizar la búsqueda aleatoria con validación cruzada
-    grid_search = GridSearchCV(estimator=catboost, param_grid=param_grid, cv=5, scoring=scoring, refit='ROC-AUC', verbose=2)
-    grid_search.fit(features_train, target_train.astype(int))
-
-    # Obtener los mejores hiperparámetros
-    best_model = grid_search.best_estimator_
-    best_params = grid_search.best_params_
-    print("Mejores hiperparámetros encontrados:", best_params)
-    
-    # Guardar las predicciones
-    predicts = pd.Series(best_model.predict(features_test))
-    predicts.to_csv('./files/datasets/output/catboost_predicts.csv', index=False)
+from models.registry import save_model
+from utils.prediction_writer import write_predictions
+from models.tuning import NativeDataset, fit_early_stopped, search_method
+from sklearn.utils.class_weight import compute_sample_weight
+
+# *Nota: La busueda de hiperparametros ya se realizo, por lo que los hiperaparámetros puestos a continuación son los que obtienen un mejor resultado.
+# Esto con el objetivo de reducir el tiempo del modelo.
+BEST_PARAMS = {
+    'learning_rate': 0.1,
+    'depth': 6,
+    'l2_leaf_reg': 1,
+    'iterations': 500,
+    'verbose': 100
+}
+
+# Grilla para la búsqueda de hiperparámetros (search='halving' o 'hyperband')
+SEARCH_GRID = {
+    'learning_rate': [0.05, 0.1],
+    'depth': [4, 6, 8],
+    'l2_leaf_reg': [1, 3, 9]
+}
+
+def catboost_model(features_train, target_train, features_test, target_test, show_metrics=True, registry_dir='./files/models/',
+                   n_jobs=None, search=False, early_stopping_rounds=50, balanced=False, backend='native'):
+
+    # Balancear las clases con pesos por fila en lugar de sobremuestreo
+    sample_weight = compute_sample_weight('balanced', target_train) if balanced else None
+
+    # Cliente de cada fila: con sobremuestreo un cliente se repite, y sus copias no deben quedar repartidas
+    # entre entrenamiento y validación en la parada temprana ni en los pliegues de la búsqueda
+    groups = target_train.index.to_numpy()
+
+    # backend='native': los datos se discretizan una sola vez (NativeDataset) y se reutilizan en la búsqueda
+    # y en el ajuste final; backend='sklearn': envoltorio de scikit-learn, que discretiza en cada ajuste
+    dataset = NativeDataset('catboost', features_train, target_train, sample_weight) if backend == 'native' else None
+
+    # Parámetros fijos o búsqueda (mitades sucesivas o Hyperband) con parada temprana sobre validación cruzada
+    params = BEST_PARAMS
+    if search:
+        search_result = search_method(search)('catboost', SEARCH_GRID, features_train, target_train,
+                                              max_rounds=BEST_PARAMS['iterations'], early_stopping_rounds=early_stopping_rounds,
+                                              n_jobs=n_jobs, sample_weight=sample_weight, dataset=dataset, groups=groups)
+        params = dict(BEST_PARAMS, **search_result['best_params'])
+        print("Mejores hiperparámetros encontrados:", params)
+
+    # Un solo ajuste con parada temprana (en lugar de validación cruzada y reajuste)
+    best_model = fit_early_stopped('catboost', params, features_train, target_train,
+                                   early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs, sample_weight=sample_weight,
+                                   backend=backend, dataset=dataset, groups=groups)
+    print("Árboles usados tras la parada temprana:", best_model.get_best_iteration() + 1)
+
+    # Guardar el modelo en el registro para poder reutilizarlo en inferencia
+    version = save_model(best_model, 'catboost', registry_dir, metadata={'features': list(features_train.columns)})
+
+    # Guardar las predicciones (customer_id, probabilidad, clase y versión del modelo)
+    write_predictions(best_model, 'catboost', version, features_test)
 
     if show_metrics:
         # Evaluar el mejor modelo para Exactitud, F1, APS, ROC-AUC
-        evaluate_model(best_model, features_train, target_train, features_test, target_test)
\ No newline at end of file
+        eval_stats = evaluate_model(best_model, features_train, target_train, features_test, target_test)
+        print(eval_stats['metrics'].round(2))
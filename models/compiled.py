@@ -0,0 +1,312 @@
+''' Exportación de los modelos de boosting (LightGBM, XGBoost y CatBoost) a un ensamble de árboles aplanado.
+
+Todos los nodos de todos los árboles se guardan en arreglos de NumPy (característica, umbral, hijo izquierdo,
+valor y dirección de los faltantes; el hijo derecho es el siguiente al izquierdo) con una sola regla de
+decisión: ir a la izquierda si x < umbral. Las reglas de cada librería se traducen a esa forma al exportar:
+- LightGBM (x <= t a la izquierda): el umbral se sube al siguiente double, np.nextafter(t, inf);
+- XGBoost (x < t a la izquierda): igual, con las entradas en float32 como hace la librería;
+- CatBoost (árboles simétricos, bit 1 si x > borde): cada árbol se expande a un árbol binario completo.
+- predict_raw (lotes): las hojas apuntan a sí mismas, así que todas las filas y todos los árboles avanzan a la
+  vez max_depth pasos con operaciones de NumPy, sin ramas por fila;
+- predict_one (un cliente, para el servidor de inferencia): los arreglos se traducen una vez a una función de
+  Python con un if/else por nodo, compilada a bytecode, sin NumPy, pandas ni las validaciones de los
+  envoltorios de scikit-learn.
+
+Uso (desde la raíz del repositorio):
+    python -m models.compiled --model lightgbm     # exporta la última versión del registro y verifica la paridad '''
+import argparse
+import json
+import math
+import os
+import tempfile
+import numpy as np
+
+# Profundidad máxima para generar la función de un cliente: cada nivel es un if anidado y el tokenizador
+# de Python admite hasta 100 niveles de indentación
+MAX_GENERATED_DEPTH = 64
+
+class CompiledEnsemble:
+    ''' Ensamble de árboles aplanado: probabilidad = sigmoide(bias + scale * suma de las hojas).
+    Los dos hijos de cada nodo son consecutivos (derecho = left + 1); las hojas tienen left igual a sí mismas
+    y umbral NaN (x >= NaN siempre es falso), así que se quedan en su lugar en los pasos siguientes. '''
+
+    ARRAYS = ('feature', 'threshold', 'left', 'value', 'default_left', 'roots')
+
+    def __init__(self, feature, threshold, left, value, default_left, roots, max_depth, bias=0.0, scale=1.0,
+                 float32_inputs=False, library=None):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.bias = float(bias)
+        self.scale = float(scale)
+        # XGBoost y CatBoost comparan en float32: las entradas se redondean igual antes de comparar
+        self.float32_inputs = bool(float32_inputs)
+        self.library = library
+        self._row_function = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _inputs(self, features):
+        values = np.asarray(features, dtype=np.float32 if self.float32_inputs else np.float64)
+        return values.reshape(1, -1) if values.ndim == 1 else values
+
+    def predict_raw(self, features, chunk_size=4096):
+        ''' Margen (log-odds) de un lote, evaluando todas las filas y todos los árboles a la vez.
+        Las filas se procesan por bloques de chunk_size para acotar la matriz de nodos actuales (filas x árboles). '''
+        values = self._inputs(features)
+        n_features = values.shape[1]
+        raw = np.empty(len(values))
+        for start in range(0, len(values), chunk_size):
+            block = np.ascontiguousarray(values[start:start + chunk_size])
+            flat = block.ravel()
+            offsets = (np.arange(len(block)) * n_features)[:, None]
+            has_nan = np.isnan(flat).any()
+            node = np.broadcast_to(self.roots, (len(block), self.n_trees))
+            for _ in range(self.max_depth):
+                x = flat[offsets + self.feature[node]]
+                go_right = x >= self.threshold[node]
+                if has_nan:
+                    go_right |= np.isnan(x) & ~self.default_left[node]
+                node = self.left[node] + go_right
+            raw[start:start + len(block)] = self.value[node].sum(axis=1)
+        return self.bias + self.scale * raw
+
+    def row_function(self):
+        ''' Función de Python generada a partir de los arreglos (un if/else por nodo) y compilada a bytecode:
+        evalúa un cliente sin llamadas a NumPy. Se genera la primera vez que se usa. '''
+        if self._row_function is None:
+            lines = ['def raw_score(x):', '    total = 0.0']
+            for root in self.roots.tolist():
+                self._emit(root, 1, lines)
+            lines.append('    return total')
+            namespace = {}
+            exec(compile('\n'.join(lines), f'<compiled {self.library}>', 'exec'), namespace)
+            self._row_function = namespace['raw_score']
+        return self._row_function
+
+    def _emit(self, node, depth, lines):
+        indent = '    ' * depth
+        left = self.left[node]
+        if left == node:
+            lines.append(f'{indent}total += {float(self.value[node])!r}')
+            return
+        lines.append(f'{indent}if x[{self.feature[node]}] < {float(self.threshold[node])!r}:')
+        self._emit(left, depth + 1, lines)
+        lines.append(f'{indent}else:')
+        self._emit(left + 1, depth + 1, lines)
+
+    def predict_one(self, row):
+        ''' Probabilidad de un solo cliente (arreglo 1D con las columnas de los modelos). '''
+        x = self._inputs(row)[0]
+        if self.max_depth > MAX_GENERATED_DEPTH or np.isnan(x).any():
+            # Árboles muy profundos (límite de anidación del compilador) o faltantes: camino vectorizado
+            raw = self.predict_raw(x)[0]
+        else:
+            raw = self.bias + self.scale * self.row_function()(x.tolist())
+        return 1 / (1 + math.exp(-raw))
+
+    def predict_proba(self, features):
+        values = self._inputs(features)
+        if len(values) == 1:
+            proba = np.array([self.predict_one(values[0])])
+        else:
+            proba = 1 / (1 + np.exp(-self.predict_raw(values)))
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, features):
+        return (self.predict_proba(features)[:, 1] > 0.5).astype(int)
+
+    def save(self, path):
+        ''' Guarda los arreglos en un .npz (escritura atómica). '''
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **{name: getattr(self, name) for name in self.ARRAYS},
+                 meta=np.array(json.dumps({'max_depth': self.max_depth, 'bias': self.bias, 'scale': self.scale,
+                                           'float32_inputs': self.float32_inputs, 'library': self.library})))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            meta = json.loads(str(data['meta']))
+        return cls(**arrays, **meta)
+
+    def __getstate__(self):
+        # La función generada no se serializa; se vuelve a generar al usarla
+        return dict(self.__dict__, _row_function=None)
+
+class TreeBuilder:
+    ''' Acumula los nodos de varios árboles en listas planas, con los dos hijos de cada nodo en posiciones consecutivas. '''
+
+    def __init__(self):
+        self.nodes = {name: [] for name in ('feature', 'threshold', 'left', 'value', 'default_left')}
+        self.roots = []
+        self.max_depth = 0
+
+    def add_node(self):
+        ''' Agrega un nodo (hoja con valor 0 hasta que se le asigne una división). '''
+        idx = len(self.nodes['feature'])
+        for name, default in (('feature', 0), ('threshold', np.nan), ('left', idx), ('value', 0.0), ('default_left', True)):
+            self.nodes[name].append(default)
+        return idx
+
+    def split(self, idx, feature, threshold, default_left):
+        ''' Convierte el nodo idx en división y regresa sus hijos (izquierdo, derecho). '''
+        left = self.add_node()
+        right = self.add_node()
+        self.nodes['feature'][idx] = feature
+        self.nodes['threshold'][idx] = threshold
+        self.nodes['left'][idx] = left
+        self.nodes['default_left'][idx] = default_left
+        return left, right
+
+    def set_leaf(self, idx, value):
+        self.nodes['value'][idx] = value
+
+    def build(self, **kwargs):
+        return CompiledEnsemble(**self.nodes, roots=self.roots, max_depth=self.max_depth, **kwargs)
+
+def compile_lightgbm(booster, num_iteration=None):
+    ''' lgb.Booster -> CompiledEnsemble (solo divisiones numéricas, como las de preparing_data). '''
+    dump = booster.dump_model(num_iteration=num_iteration)
+    builder = TreeBuilder()
+
+    def add(tree, idx, depth):
+        builder.max_depth = max(builder.max_depth, depth)
+        if 'leaf_value' in tree:
+            builder.set_leaf(idx, tree['leaf_value'])
+            return
+        if tree['decision_type'] != '<=':
+            raise ValueError(f"División no soportada: {tree['decision_type']}")
+        left, right = builder.split(idx, tree['split_feature'], np.nextafter(tree['threshold'], np.inf), tree['default_left'])
+        add(tree['left_child'], left, depth + 1)
+        add(tree['right_child'], right, depth + 1)
+
+    for tree in dump['tree_info']:
+        root = builder.add_node()
+        builder.roots.append(root)
+        add(tree['tree_structure'], root, 0)
+    return builder.build(library='lightgbm')
+
+def compile_xgboost(booster, n_rounds=None):
+    ''' xgb.Booster (objetivo binary:logistic) -> CompiledEnsemble. '''
+    config = json.loads(booster.save_config())
+    base_score = float(config['learner']['learner_model_param']['base_score'])
+    feature_names = booster.feature_names
+    trees = booster.get_dump(dump_format='json')
+    trees = trees[:n_rounds] if n_rounds is not None else trees
+    builder = TreeBuilder()
+
+    def feature_index(split):
+        return feature_names.index(split) if feature_names else int(split.lstrip('f'))
+
+    def add(tree, idx, depth):
+        builder.max_depth = max(builder.max_depth, depth)
+        if 'leaf' in tree:
+            builder.set_leaf(idx, tree['leaf'])
+            return
+        children = {child['nodeid']: child for child in tree['children']}
+        left, right = builder.split(idx, feature_index(tree['split']), np.float32(tree['split_condition']),
+                                    tree['missing'] == tree['yes'])
+        add(children[tree['yes']], left, depth + 1)
+        add(children[tree['no']], right, depth + 1)
+
+    for tree in trees:
+        root = builder.add_node()
+        builder.roots.append(root)
+        add(json.loads(tree), root, 0)
+    return builder.build(bias=np.log(base_score / (1 - base_score)), float32_inputs=True, library='xgboost')
+
+def compile_catboost(model):
+    ''' CatBoostClassifier (solo características numéricas) -> CompiledEnsemble.
+    Cada árbol simétrico de profundidad d se expande a un árbol completo: en el nivel j se usa la división j
+    desde el final, para que el bit de la primera división sea el menos significativo del índice de la hoja. '''
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        model.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+    features = {info['feature_index']: info['flat_feature_index'] for info in dump['features_info']['float_features']}
+    scale, bias = dump['scale_and_bias']
+    builder = TreeBuilder()
+
+    for tree in dump['oblivious_trees']:
+        splits = tree['splits']
+        depth = len(splits)
+        builder.max_depth = max(builder.max_depth, depth)
+
+        def add(idx, level, leaf_index):
+            if level == depth:
+                builder.set_leaf(idx, tree['leaf_values'][leaf_index])
+                return
+            split = splits[depth - 1 - level]
+            # x > borde -> bit en 1 (derecha); x <= borde -> izquierda. Los faltantes se tratan como mínimos (izquierda)
+            left, right = builder.split(idx, features[split['float_feature_index']],
+                                        np.nextafter(np.float32(split['border']), np.inf), True)
+            add(left, level + 1, leaf_index)
+            add(right, level + 1, leaf_index | 1 << (depth - 1 - level))
+
+        root = builder.add_node()
+        builder.roots.append(root)
+        add(root, 0, 0)
+    return builder.build(bias=bias[0] if isinstance(bias, list) else bias, scale=scale, float32_inputs=True,
+                         library='catboost')
+
+def compile_model(model):
+    ''' Exporta un modelo entrenado de models/ (envoltorio de scikit-learn, BoosterClassifier o CatBoostClassifier). '''
+    from models.tuning import BoosterClassifier
+    if isinstance(model, BoosterClassifier):
+        if model.library == 'lightgbm':
+            return compile_lightgbm(model.booster, model.best_rounds)
+        return compile_xgboost(model.booster, model.best_rounds)
+    name = type(model).__name__
+    if name == 'LGBMClassifier':
+        return compile_lightgbm(model.booster_, model.best_iteration_ or None)
+    if name == 'XGBClassifier':
+        best_iteration = getattr(model, 'best_iteration', None)
+        return compile_xgboost(model.get_booster(), best_iteration + 1 if best_iteration is not None else None)
+    if name == 'CatBoostClassifier':
+        return compile_catboost(model)
+    raise ValueError(f'Modelo no soportado: {name}')
+
+def parity_error(model, compiled, features):
+    ''' Máxima diferencia absoluta entre las probabilidades del modelo original y las del ensamble exportado. '''
+    return float(np.max(np.abs(model.predict_proba(features)[:, 1] - compiled.predict_proba(features)[:, 1])))
+
+def compiled_path(name, version, registry_dir='./files/models/'):
+    return os.path.join(registry_dir, name, f'{version}.compiled.npz')
+
+def export_model(name, version=None, registry_dir='./files/models/', features=None, tolerance=1e-6):
+    ''' Exporta un modelo del registro junto a su .pkl. Si se dan features, se verifica la paridad antes de guardar. '''
+    from models.registry import latest_version, load_model
+    version = version or latest_version(name, registry_dir)
+    model, _ = load_model(name, version, registry_dir)
+    compiled = compile_model(model)
+    error = parity_error(model, compiled, features) if features is not None else None
+    if error is not None and error > tolerance:
+        raise ValueError(f'{name} {version}: diferencia máxima {error:.2e} mayor que la tolerancia {tolerance:.0e}')
+    return compiled.save(compiled_path(name, version, registry_dir)), compiled, error
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True, choices=['lightgbm', 'xgboost', 'catboost'])
+    parser.add_argument('--version', default=None)
+    parser.add_argument('--registry-dir', default='./files/models/')
+    parser.add_argument('--prepared-path', default='./files/cache/prepared/',
+                        help='Datos de select-features; features_test se usa para verificar la paridad')
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    from utils.feature_matrix import has_feature_matrix, load_feature_matrix
+    features = load_feature_matrix(args.prepared_path)['features_test'].to_numpy() if has_feature_matrix(args.prepared_path) else None
+    path, compiled, error = export_model(args.model, args.version, args.registry_dir, features, args.tolerance)
+    print(f'{compiled.n_trees} árboles, profundidad máxima {compiled.max_depth}, {len(compiled.feature)} nodos: {path}')
+    if error is not None:
+        print(f'Diferencia máxima contra el modelo original: {error:.2e}')
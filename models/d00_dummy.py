@@ -1,18 +1,23 @@
-import pandas as pd
 from sklearn.dummy import DummyClassifier
-from sklearn.metrics import roc_auc_score, f1_score, accuracy_score
+from sklearn.utils.class_weight import compute_sample_weight
 from utils.functions import evaluate_model
+from models.registry import save_model
+from utils.prediction_writer import write_predictions
 
-def dummytest(features_train, target_train, features_test, target_test, show_metrics=True):
+def dummytest(features_train, target_train, features_test, target_test, show_metrics=True, registry_dir='./files/models/', balanced=False):
 
     # Entrenamiento
+    # balanced: balancear las clases con pesos por fila en lugar de sobremuestreo
     model = DummyClassifier()
-    model.fit(features_train, target_train)
+    model.fit(features_train, target_train, sample_weight=compute_sample_weight('balanced', target_train) if balanced else None)
 
-    # Guardar las predicciones
-    predicts = pd.Series(model.predict(features_test))
-    predicts.to_csv('./files/datasets/output/dummy_predicts.csv', index=False)
+    # Guardar el modelo en el registro para poder reutilizarlo en inferencia
+    version = save_model(model, 'dummy', registry_dir, metadata={'features': list(features_train.columns)})
+
+    # Guardar las predicciones (customer_id, probabilidad, clase y versión del modelo)
+    write_predictions(model, 'dummy', version, features_test)
 
     if show_metrics:
         # Evaluar el modelo para Exactitud, F1, APS, ROC-AUC
-        evaluate_model(model, features_train, target_train, features_test, target_test)
\ No newline at end of file
+        eval_stats = evaluate_model(model, features_train, target_train, features_test, target_test)
+        print(eval_stats['metrics'].round(2))
\ No newline at end of file
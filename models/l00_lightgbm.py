@@ -1,41 +1,68 @@
-import lightgbm as lgb
-from sklearn.model_selection import GridSearchCV
 from utils.functions import evaluate_model
-import pandas as pd
-
-def lgbm_model(features_train_encoded, target_train, features_test_encoded, target_test, show_metrics=True):
-
-    # Definir la grilla de hiperparámetros para la búsqueda en cuadrícula
-    # Nota los hiperaparámetros puestos a continuación son los mejores obtenidos en la búsqueda gridsearch
-    # Para minimizar el tiempo de entrenamiento, se utilizaron los mejores.
-    param_grid = {
-        'objective': ['binary'],
-        'metric': ['auc'],
-        'learning_rate': [0.1],
-        'max_depth': [24],
-        'reg_lambda': [1],
-        'n_estimators': [1000],
-        'num_leaves': [24],
-        'verbose_eval': [100]
-    }
-
-    # Crear un clasificador LightGBM
-    lgb_classifier = lgb.LGBMClassifier()
-
-    # Realizar la búsqueda en cuadrícula con validación cruzada
-    grid_search = GridSearchCV(estimator=lgb_classifier, param_grid=param_grid, cv=5, scoring='roc_auc')
-    grid_search.fit(features_train_encoded.values, target_train.values)
-
-    # Obtener los mejores hiperparámetros y el mejor modelo
-    best_model = grid_search.best_estimator_
-    best_params = grid_search.best_params_
-    print("Mejores hiperparámetros encontrados:", best_params)
-
-    # Guardar las predicciones
-    predicts = pd.Series(best_model.predict(features_test_encoded))
-    predicts.to_csv('./files/datasets/output/lightGBM_predicts.csv', index=False)
+from models.registry import save_model
+from utils.prediction_writer import write_predictions
+from models.tuning import NativeDataset, fit_early_stopped, search_method
+from sklearn.utils.class_weight import compute_sample_weight
+
+# Nota los hiperaparámetros puestos a continuación son los mejores obtenidos en la búsqueda gridsearch
+# Para minimizar el tiempo de entrenamiento, se utilizan directamente con parada temprana.
+BEST_PARAMS = {
+    'objective': 'binary',
+    'metric': 'auc',
+    'learning_rate': 0.1,
+    'max_depth': 24,
+    'reg_lambda': 1,
+    'n_estimators': 1000,
+    'num_leaves': 24,
+    'verbose': -1
+}
+
+# Grilla para la búsqueda de hiperparámetros (search='halving' o 'hyperband')
+SEARCH_GRID = {
+    'learning_rate': [0.05, 0.1],
+    'max_depth': [8, 24],
+    'num_leaves': [16, 24, 48],
+    'reg_lambda': [0, 1, 5]
+}
+
+def lgbm_model(features_train_encoded, target_train, features_test_encoded, target_test, show_metrics=True, registry_dir='./files/models/',
+               n_jobs=None, search=False, early_stopping_rounds=50, balanced=False, backend='native'):
+
+    # Balancear las clases con pesos por fila en lugar de sobremuestreo
+    sample_weight = compute_sample_weight('balanced', target_train) if balanced else None
+
+    # Cliente de cada fila: con sobremuestreo un cliente se repite, y sus copias no deben quedar repartidas
+    # entre entrenamiento y validación en la parada temprana ni en los pliegues de la búsqueda
+    groups = target_train.index.to_numpy()
+
+    # backend='native': los datos se discretizan una sola vez (NativeDataset) y se reutilizan en la búsqueda
+    # y en el ajuste final; backend='sklearn': envoltorio de scikit-learn, que discretiza en cada ajuste
+    dataset = NativeDataset('lightgbm', features_train_encoded.values, target_train.values, sample_weight) if backend == 'native' else None
+
+    # Parámetros fijos o búsqueda (mitades sucesivas o Hyperband) con parada temprana sobre validación cruzada
+    params = BEST_PARAMS
+    if search:
+        search_result = search_method(search)('lightgbm', SEARCH_GRID, features_train_encoded.values, target_train.values,
+                                              max_rounds=BEST_PARAMS['n_estimators'], early_stopping_rounds=early_stopping_rounds,
+                                              n_jobs=n_jobs, sample_weight=sample_weight, dataset=dataset, groups=groups)
+        params = dict(BEST_PARAMS, **search_result['best_params'])
+        print("Mejores hiperparámetros encontrados:", params)
+
+    # Un solo ajuste con parada temprana (en lugar de validación cruzada y reajuste)
+    best_model = fit_early_stopped('lightgbm', params, features_train_encoded.values, target_train.values,
+                                   early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs, sample_weight=sample_weight,
+                                   backend=backend, dataset=dataset, groups=groups)
+    n_trees = best_model.best_rounds if backend == 'native' else best_model.best_iteration_
+    print("Árboles usados tras la parada temprana:", n_trees)
+
+    # Guardar el modelo en el registro para poder reutilizarlo en inferencia
+    version = save_model(best_model, 'lightgbm', registry_dir, metadata={'features': list(features_train_encoded.columns)})
+
+    # Guardar las predicciones (customer_id, probabilidad, clase y versión del modelo)
+    write_predictions(best_model, 'lightgbm', version, features_test_encoded)
 
     # Evaluar el mejor modelo para Exactitud, F1, APS, ROC-AUC
     if show_metrics:
 
-        evaluate_model(best_model, features_train_encoded, target_train, features_test_encoded, target_test)
\ No newline at end of file
+        eval_stats = evaluate_model(best_model, features_train_encoded, target_train, features_test_encoded, target_test)
+        print(eval_stats['metrics'].round(2))
@@ -1,17 +1,23 @@
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import roc_auc_score, f1_score, accuracy_score
+from models.registry import save_model
+from utils.prediction_writer import write_predictions
 
-def log_reg_model(features_train, target_train, features_test, target_test, show_metrics=False):
+def log_reg_model(features_train, target_train, features_test, target_test, show_metrics=False, registry_dir='./files/models/', balanced=False):
     # Entrenar el modelo
-    model = LogisticRegression()
+    # balanced: balancear las clases con pesos en lugar de sobremuestreo
+    model = LogisticRegression(class_weight='balanced' if balanced else None)
     model.fit(features_train, target_train)
 
     # Predicciones en Serie
     predicts = pd.Series(model.predict(features_test))
 
-    # Guardar las predicciones
-    predicts.to_csv('./files/datasets/output/logistic_regression_predicts.csv', index=False)
+    # Guardar el modelo en el registro para poder reutilizarlo en inferencia
+    version = save_model(model, 'logistic_regression', registry_dir, metadata={'features': list(features_train.columns)})
+
+    # Guardar las predicciones (customer_id, probabilidad, clase y versión del modelo)
+    write_predictions(model, 'logistic_regression', version, features_test)
 
     if show_metrics:
         # Imprime las métricas ROC-AUC, F1 y Accuracy
@@ -0,0 +1,41 @@
+import json
+import os
+import pickle
+from datetime import datetime
+
+def save_model(model, name, registry_dir='./files/models/', metadata=None):
+    ''' Guarda un modelo entrenado en el registro con una versión basada en la fecha y hora.
+    Estructura: registry_dir/<name>/<version>.pkl, <version>.json con metadatos y LATEST con la última versión. '''
+    model_dir = os.path.join(registry_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+
+    # Escribir primero en un archivo temporal para no dejar un modelo incompleto
+    model_path = os.path.join(model_dir, f'{version}.pkl')
+    with open(model_path + '.tmp', 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(model_path + '.tmp', model_path)
+
+    metadata = dict(metadata or {}, name=name, version=version, model_class=type(model).__name__)
+    with open(os.path.join(model_dir, f'{version}.json'), 'w') as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    with open(os.path.join(model_dir, 'LATEST'), 'w') as f:
+        f.write(version)
+    return version
+
+def latest_version(name, registry_dir='./files/models/'):
+    with open(os.path.join(registry_dir, name, 'LATEST')) as f:
+        return f.read().strip()
+
+def load_model(name, version=None, registry_dir='./files/models/'):
+    ''' Carga un modelo del registro. Si no se indica version, se carga la última guardada.
+    Regresa el modelo y sus metadatos. '''
+    if version is None:
+        version = latest_version(name, registry_dir)
+    model_dir = os.path.join(registry_dir, name)
+    with open(os.path.join(model_dir, f'{version}.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(model_dir, f'{version}.json')) as f:
+        metadata = json.load(f)
+    return model, metadata
@@ -0,0 +1,283 @@
+''' Búsqueda de hiperparámetros y ajuste con parada temprana para CatBoost, LightGBM y XGBoost.
+
+- fit_early_stopped: modo de parámetros fijos. Un solo ajuste con parada temprana sobre una
+  partición de validación, en lugar de GridSearchCV(cv=5) con un solo punto más el reajuste.
+- successive_halving / hyperband: búsquedas sobre grillas reales. Cada configuración se evalúa con
+  validación cruzada y parada temprana nativa; en cada ronda sobrevive la mejor fracción (1/eta)
+  de las configuraciones y se les da más iteraciones.
+
+Los datasets nativos de cada librería (NativeDataset: lgb.Dataset, xgb.QuantileDMatrix con hist y
+catboost.Pool cuantizado) se construyen una sola vez con todos los datos y los pliegues se obtienen con
+subset/slice (en XGBoost, QuantileDMatrix con ref=), por lo que la discretización de las características
+se reutiliza en todos los pliegues, configuraciones y en el ajuste final con backend='native'.
+
+groups: cliente de cada fila (el índice de target_train). Con sobremuestreo un mismo cliente aparece en varias
+filas; la validación de la parada temprana y los pliegues se parten por cliente para que sus copias no queden a
+ambos lados de la partición. '''
+import math
+import numpy as np
+from sklearn.model_selection import ParameterGrid, StratifiedGroupKFold, StratifiedKFold, train_test_split
+from utils.profiling import profiled
+
+# Nombre del parámetro que indica el número de árboles en cada librería
+ROUNDS_PARAM = {'catboost': 'iterations', 'lightgbm': 'n_estimators', 'xgboost': 'n_estimators'}
+
+def split_rounds(library, params):
+    ''' Separa el número de árboles del resto de los parámetros. '''
+    params = dict(params)
+    n_rounds = params.pop(ROUNDS_PARAM[library], None)
+    return n_rounds, params
+
+def holdout_split(target, groups=None, valid_size=0.2, random_state=54321):
+    ''' Índices (ordenados) de entrenamiento y validación estratificados por target. Con groups, todas las filas
+    de un grupo quedan del mismo lado (el primer pliegue de StratifiedGroupKFold con 1/valid_size pliegues). '''
+    target = np.asarray(target, dtype=int)
+    positions = np.arange(len(target))
+    if groups is None:
+        train_idx, valid_idx = train_test_split(positions, test_size=valid_size, stratify=target, random_state=random_state)
+    else:
+        splitter = StratifiedGroupKFold(n_splits=max(2, int(round(1 / valid_size))), shuffle=True, random_state=random_state)
+        train_idx, valid_idx = next(splitter.split(positions, target, np.asarray(groups)))
+    return np.sort(train_idx), np.sort(valid_idx)
+
+def fold_splits(target, groups=None, cv=5, random_state=54321):
+    ''' Pliegues (train, valid) estratificados por target; con groups, sin repartir un grupo entre pliegues. '''
+    target = np.asarray(target, dtype=int)
+    positions = np.arange(len(target))
+    if groups is None:
+        splits = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state).split(positions, target)
+    else:
+        splits = StratifiedGroupKFold(n_splits=cv, shuffle=True, random_state=random_state).split(positions, target,
+                                                                                                  np.asarray(groups))
+    return [(np.sort(train_idx), np.sort(valid_idx)) for train_idx, valid_idx in splits]
+
+class NativeDataset:
+    ''' Datos discretizados de una librería, construidos una sola vez; subset(idx) regresa las filas idx
+    reutilizando los límites de los bins (y en LightGBM/CatBoost también los datos ya discretizados). '''
+
+    def __init__(self, library, features, target, sample_weight=None):
+        self.library = library
+        self.features = np.asarray(features)
+        self.target = np.asarray(target, dtype=int)
+        self.sample_weight = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        if library == 'catboost':
+            from catboost import Pool
+            self.dataset = Pool(self.features, label=self.target, weight=self.sample_weight)
+            self.dataset.quantize()
+        elif library == 'lightgbm':
+            import lightgbm as lgb
+            self.dataset = lgb.Dataset(self.features, label=self.target, weight=self.sample_weight,
+                                       params={'verbose': -1}, free_raw_data=False).construct()
+        elif library == 'xgboost':
+            import xgboost as xgb
+            self.dataset = xgb.QuantileDMatrix(self.features, label=self.target, weight=self.sample_weight)
+        else:
+            raise ValueError(f'Librería no soportada: {library}')
+
+    def __len__(self):
+        return len(self.target)
+
+    def subset(self, idx):
+        ''' Filas idx (ordenadas) del dataset. '''
+        if self.library == 'catboost':
+            return self.dataset.slice(idx)
+        if self.library == 'lightgbm':
+            return self.dataset.subset(idx.tolist())
+        # QuantileDMatrix no permite slice: se usan los cortes del dataset completo (ref) sin volver a calcularlos
+        import xgboost as xgb
+        return xgb.QuantileDMatrix(self.features[idx], label=self.target[idx],
+                                   weight=None if self.sample_weight is None else self.sample_weight[idx],
+                                   ref=self.dataset)
+
+def take_rows(features, idx):
+    ''' Filas idx de un DataFrame (por posición) o de un arreglo. '''
+    return features.iloc[idx] if hasattr(features, 'iloc') else np.asarray(features)[idx]
+
+class BoosterClassifier:
+    ''' Booster de LightGBM o XGBoost entrenado con la API nativa, con predict/predict_proba como los
+    modelos de scikit-learn para evaluate_model, el registro y ChurnScorer. Predice con la mejor iteración. '''
+
+    def __init__(self, library, booster, best_rounds):
+        self.library = library
+        self.booster = booster
+        self.best_rounds = best_rounds
+
+    def predict_proba(self, features):
+        values = np.asarray(features)
+        if self.library == 'lightgbm':
+            proba = self.booster.predict(values, num_iteration=self.best_rounds)
+        else:
+            proba = self.booster.inplace_predict(values, iteration_range=(0, self.best_rounds))
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, features):
+        return (self.predict_proba(features)[:, 1] > 0.5).astype(int)
+
+def train_booster(library, params, train_set, valid_set, n_rounds, early_stopping_rounds=50, n_jobs=None):
+    ''' Entrena con la API nativa y parada temprana sobre valid_set.
+    Regresa el modelo (CatBoostClassifier o BoosterClassifier), el mejor número de árboles y el ROC-AUC de validación. '''
+    _, params = split_rounds(library, params)
+    if library == 'catboost':
+        from catboost import CatBoostClassifier
+        params = {key: value for key, value in params.items() if key != 'verbose'}
+        model = CatBoostClassifier(**params, iterations=n_rounds, eval_metric='AUC', verbose=False,
+                                   thread_count=n_jobs if n_jobs is not None else -1)
+        model.fit(train_set, eval_set=valid_set, early_stopping_rounds=early_stopping_rounds)
+        return model, model.get_best_iteration() + 1, model.get_best_score()['validation']['AUC']
+    if library == 'lightgbm':
+        import lightgbm as lgb
+        params = dict(params, objective='binary', metric='auc', verbose=-1)
+        if n_jobs is not None:
+            params['num_threads'] = n_jobs
+        booster = lgb.train(params, train_set, num_boost_round=n_rounds, valid_sets=[valid_set],
+                            callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+        return (BoosterClassifier(library, booster, booster.best_iteration), booster.best_iteration,
+                booster.best_score['valid_0']['auc'])
+    if library == 'xgboost':
+        import xgboost as xgb
+        params = dict(params, objective='binary:logistic', eval_metric='auc', tree_method='hist')
+        if n_jobs is not None:
+            params['nthread'] = n_jobs
+        booster = xgb.train(params, train_set, num_boost_round=n_rounds, evals=[(valid_set, 'valid')],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        return BoosterClassifier(library, booster, booster.best_iteration + 1), booster.best_iteration + 1, booster.best_score
+    raise ValueError(f'Librería no soportada: {library}')
+
+def fit_native(library, params, features, target, early_stopping_rounds=50, valid_size=0.2, n_jobs=None,
+               random_state=54321, sample_weight=None, dataset=None, groups=None):
+    ''' Igual que fit_early_stopped pero con la API nativa: la partición de validación se toma del
+    dataset discretizado (dataset, o uno nuevo si no se indica) en lugar de discretizar de nuevo cada parte. '''
+    dataset = dataset if dataset is not None else NativeDataset(library, features, target, sample_weight)
+    train_idx, valid_idx = holdout_split(dataset.target, groups, valid_size, random_state)
+    n_rounds, _ = split_rounds(library, params)
+    model, _, _ = train_booster(library, params, dataset.subset(train_idx), dataset.subset(valid_idx),
+                                n_rounds, early_stopping_rounds, n_jobs)
+    return model
+
+@profiled()
+def fit_early_stopped(library, params, features, target, early_stopping_rounds=50, valid_size=0.2,
+                      n_jobs=None, random_state=54321, sample_weight=None, backend='sklearn', dataset=None, groups=None):
+    ''' Ajusta un solo modelo (API de scikit-learn) con parada temprana sobre una partición
+    estratificada de validación. El modelo resultante predice con la mejor iteración.
+    sample_weight: pesos por fila (por ejemplo para balancear las clases); se aplican también a la validación.
+    groups: cliente de cada fila; la validación se parte por cliente (holdout_split).
+    backend='native': ajuste con la API nativa (fit_native), reutilizando dataset si se indica. '''
+    if backend == 'native':
+        return fit_native(library, params, features, target, early_stopping_rounds, valid_size, n_jobs, random_state,
+                          sample_weight, dataset, groups)
+    target = np.asarray(target, dtype=int)
+    sample_weight = np.ones(len(target)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    train_idx, valid_idx = holdout_split(target, groups, valid_size, random_state)
+    features_train, features_valid = take_rows(features, train_idx), take_rows(features, valid_idx)
+    target_train, target_valid = target[train_idx], target[valid_idx]
+    weight_train, weight_valid = sample_weight[train_idx], sample_weight[valid_idx]
+
+    if library == 'catboost':
+        from catboost import CatBoostClassifier
+        model = CatBoostClassifier(**params, thread_count=n_jobs if n_jobs is not None else -1)
+        from catboost import Pool
+        model.fit(Pool(features_train, target_train, weight=weight_train), early_stopping_rounds=early_stopping_rounds,
+                  eval_set=Pool(features_valid, target_valid, weight=weight_valid))
+    elif library == 'lightgbm':
+        import lightgbm as lgb
+        model = lgb.LGBMClassifier(**params, n_jobs=n_jobs)
+        model.fit(features_train, target_train, sample_weight=weight_train, eval_set=[(features_valid, target_valid)],
+                  eval_sample_weight=[weight_valid], eval_metric='auc',
+                  callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+    elif library == 'xgboost':
+        import xgboost as xgb
+        model = xgb.XGBClassifier(**params, early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs)
+        model.fit(features_train, target_train, sample_weight=weight_train, eval_set=[(features_valid, target_valid)],
+                  sample_weight_eval_set=[weight_valid], verbose=False)
+    else:
+        raise ValueError(f'Librería no soportada: {library}')
+    return model
+
+def build_folds(library, features, target, cv=5, random_state=54321, sample_weight=None, dataset=None, groups=None):
+    ''' Construye el dataset nativo una vez (o usa dataset) y regresa una lista de pliegues (train, valid) que lo reutilizan.
+    sample_weight: pesos por fila; cada pliegue conserva los pesos de sus filas.
+    groups: cliente de cada fila; las copias de un cliente quedan en el mismo pliegue. '''
+    dataset = dataset if dataset is not None else NativeDataset(library, features, target, sample_weight)
+    splits = fold_splits(dataset.target, groups, cv, random_state)
+    return [(dataset.subset(train_idx), dataset.subset(valid_idx)) for train_idx, valid_idx in splits]
+
+def train_native(library, params, train_set, valid_set, n_rounds, early_stopping_rounds=50, n_jobs=None):
+    ''' Entrena con la API nativa y parada temprana. Regresa (mejor número de árboles, ROC-AUC de validación). '''
+    _, best_rounds, score = train_booster(library, params, train_set, valid_set, n_rounds, early_stopping_rounds, n_jobs)
+    return best_rounds, score
+
+def evaluate_config(library, params, folds, n_rounds, early_stopping_rounds=50, n_jobs=None):
+    ''' Validación cruzada de una configuración: ROC-AUC promedio y número promedio de árboles. '''
+    results = [train_native(library, params, train_set, valid_set, n_rounds, early_stopping_rounds, n_jobs)
+               for train_set, valid_set in folds]
+    best_rounds, scores = zip(*results)
+    return float(np.mean(scores)), int(round(np.mean(best_rounds)))
+
+@profiled()
+def successive_halving(library, param_grid, features, target, configs=None, cv=5, min_rounds=50,
+                       max_rounds=1000, eta=3, early_stopping_rounds=50, n_jobs=None, folds=None, verbose=True,
+                       sample_weight=None, dataset=None, groups=None):
+    ''' Búsqueda por mitades sucesivas. Empieza evaluando todas las configuraciones con min_rounds árboles
+    y en cada ronda conserva la mejor 1/eta de ellas multiplicando por eta el número de árboles.
+    Regresa los mejores parámetros (con el número de árboles encontrado por la parada temprana),
+    su ROC-AUC de validación cruzada y el historial de evaluaciones. '''
+    configs = list(configs if configs is not None else ParameterGrid(param_grid))
+    folds = folds if folds is not None else build_folds(library, features, target, cv, sample_weight=sample_weight,
+                                                        dataset=dataset, groups=groups)
+    history = []
+    n_rounds = min_rounds
+
+    while True:
+        scored = []
+        for params in configs:
+            score, best_rounds = evaluate_config(library, params, folds, n_rounds, early_stopping_rounds, n_jobs)
+            scored.append((score, best_rounds, params))
+            history.append({'params': params, 'rounds': n_rounds, 'best_rounds': best_rounds, 'roc_auc': score})
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if verbose:
+            print(f'{library}: {len(configs)} configuraciones con {n_rounds} árboles, mejor ROC-AUC={scored[0][0]:.4f}')
+
+        if len(configs) == 1 or n_rounds >= max_rounds:
+            break
+        configs = [params for _, _, params in scored[:max(1, len(configs) // eta)]]
+        n_rounds = min(n_rounds * eta, max_rounds)
+
+    best_score, best_rounds, best_params = scored[0]
+    best_params = dict(best_params, **{ROUNDS_PARAM[library]: best_rounds})
+    return {'best_params': best_params, 'best_score': best_score, 'history': history}
+
+def hyperband(library, param_grid, features, target, configs=None, cv=5, min_rounds=50, max_rounds=1000, eta=3,
+              early_stopping_rounds=50, n_jobs=None, folds=None, verbose=True, sample_weight=None, dataset=None,
+              groups=None, random_state=54321):
+    ''' Hyperband: ejecuta varias búsquedas por mitades sucesivas (brackets) que empiezan con distinto
+    número de configuraciones y de árboles, muestreando las configuraciones (de configs o de la grilla).
+    Mismos argumentos y resultado que successive_halving; los pliegues se construyen una sola vez para todos los brackets. '''
+    rng = np.random.default_rng(random_state)
+    grid = list(configs if configs is not None else ParameterGrid(param_grid))
+    folds = folds if folds is not None else build_folds(library, features, target, cv, sample_weight=sample_weight,
+                                                        dataset=dataset, groups=groups)
+    s_max = int(math.floor(math.log(max_rounds / min_rounds, eta)))
+
+    best = None
+    history = []
+    for s in range(s_max, -1, -1):
+        n_configs = min(len(grid), int(math.ceil((s_max + 1) / (s + 1) * eta ** s)))
+        bracket = [grid[idx] for idx in rng.choice(len(grid), size=n_configs, replace=False)]
+        result = successive_halving(library, param_grid, features, target, configs=bracket,
+                                    min_rounds=max(1, int(max_rounds * eta ** -s)), max_rounds=max_rounds, eta=eta,
+                                    early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs, folds=folds,
+                                    verbose=verbose)
+        history.extend(result['history'])
+        if best is None or result['best_score'] > best['best_score']:
+            best = result
+    return {'best_params': best['best_params'], 'best_score': best['best_score'], 'history': history}
+
+# Búsquedas disponibles en los modelos de boosting (search='halving' o search='hyperband'; search=True es 'halving')
+SEARCH_METHODS = {'halving': successive_halving, 'hyperband': hyperband}
+
+def search_method(search):
+    ''' Función de búsqueda para el argumento search de los modelos. '''
+    search = 'halving' if search is True else search
+    if search not in SEARCH_METHODS:
+        raise ValueError(f"search debe ser uno de {sorted(SEARCH_METHODS)}, no {search!r}")
+    return SEARCH_METHODS[search]
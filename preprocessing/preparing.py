@@ -1,37 +1,68 @@
 import pandas as pd
-from imblearn.over_sampling import RandomOverSampler
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 from utils.functions import Boruta_alg, LabelEncoder_dataset, MinMaxScaler_dataset, split_target_features
+from preprocessing.transformer import FittedPreprocessor
+from utils.profiling import profiled
 
+@profiled()
 def preparing_data(df_preprocessed, target_col:str='is_active', ohe_cols='payment_method', lb_cols='type',
-                   columns_to_scale=['type', 'monthly_charges', 'total_charges','active_days']):
+                   columns_to_scale=['type', 'monthly_charges', 'total_charges','active_days'], return_transformer=False,
+                   boruta_params=None, balance='oversample', id_col='customer_id'):
     
+    # Si los datos traen id_col (preprocessing_data con keep_customer_id=True), se usa como índice
+    # para que cada fila de los conjuntos conserve su cliente (por ejemplo en las predicciones)
+    if id_col in df_preprocessed.columns:
+        df_preprocessed = df_preprocessed.set_index(id_col)
+
     # Dividir el objetivo de las características
     features, target = split_target_features(df_preprocessed, target_col)
 
-    # Aplicar sobremuestreo para balancear el objetivo
-    over_sampler = RandomOverSampler(random_state=54321)
-    features_oversampled, target_oversampled = over_sampler.fit_resample(features, target)
-
-    # Dividir el dataframe en entrenamiento y prueba
+    # Dividir el dataframe en entrenamiento y prueba (estratificado por el objetivo). El balanceo se aplica solo
+    # a entrenamiento: prueba conserva la proporción real de clases, un cliente por fila y ningún cliente de entrenamiento
     features_train, features_test, target_train, target_test = train_test_split(
-        features_oversampled, target_oversampled, test_size=0.2, random_state=54321
+        features, target, test_size=0.2, random_state=54321, stratify=target
     )
 
+    # Balancear el objetivo
+    # 'oversample': sobremuestreo con RandomOverSampler (duplica filas de la clase minoritaria de entrenamiento)
+    # 'weights': no se duplican filas; el balance se aplica con pesos en los modelos (balanced=True)
+    if balance == 'oversample':
+        from imblearn.over_sampling import RandomOverSampler
+        over_sampler = RandomOverSampler(random_state=54321)
+        train_index = features_train.index
+        features_train, target_train = over_sampler.fit_resample(features_train, target_train)
+        # fit_resample numera de nuevo las filas: se recupera el índice original de cada fila (con repeticiones)
+        features_train.index = target_train.index = train_index[over_sampler.sample_indices_]
+    elif balance == 'weights':
+        boruta_params = dict(boruta_params or {}, class_weight='balanced')
+    else:
+        raise ValueError(f"balance debe ser 'oversample' o 'weights', no {balance!r}")
+
     # One Hot Encoding (payment_method)
     features_train_encoded = pd.get_dummies(features_train, columns=[ohe_cols])
     features_test_encoded = pd.get_dummies(features_test, columns=[ohe_cols])    
 
     # Label encoding (Type)
-    features_train_encoded, features_test_encoded = LabelEncoder_dataset(features_train, features_test, features_train_encoded, features_test_encoded, lb_cols)
+    features_train_encoded, features_test_encoded, label_encoder = LabelEncoder_dataset(
+        features_train, features_test, features_train_encoded, features_test_encoded, lb_cols, return_encoder=True
+    )
 
     # Escalar las características de prueba y entrenamiento
-    features_train_encoded_scaled, features_test_encoded_scaled = MinMaxScaler_dataset(features_train_encoded, features_test_encoded, columns_to_scale)
+    features_train_encoded_scaled, features_test_encoded_scaled, scaler = MinMaxScaler_dataset(
+        features_train_encoded, features_test_encoded, columns_to_scale, return_scaler=True
+    )
 
     # Seleccion de características importantes a partir de Boruta
+    # boruta_params: opciones de Boruta_alg (modelo base, submuestreo, caché)
     features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled = Boruta_alg(
-        features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train
+        features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train,
+        **(boruta_params or {})
     )
 
+    if return_transformer:
+        # Guardar los pasos ajustados para transformar clientes nuevos (produce las columnas escaladas)
+        transformer = FittedPreprocessor.from_fitted(features_train, features_train_encoded_scaled, lb_cols, label_encoder,
+                                                     ohe_cols, columns_to_scale, scaler)
+        return features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train, target_test, transformer
+
     return features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train, target_test
\ No newline at end of file
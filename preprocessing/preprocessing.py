@@ -1,21 +1,169 @@
-from utils.functions import camelcase_to_snakecase, contract_cleaning, internet_cleaning, merge_datasets, personal_cleaning, phone_cleaning
+import os
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from utils.cache import cache_key, load_cached_frame, save_cached_frame
+from utils.profiling import profiled
+from utils.functions import (CSV_DTYPES, TELECOM_SCHEMA, apply_categories, apply_schema, camelcase_to_snakecase,
+                             contract_cleaning, internet_cleaning, load_partition, merge_datasets, personal_cleaning,
+                             phone_cleaning, read_csv_files, spill_csv_partitions, unknown_categories)
 
-def preprocessing_data(df_contract, df_internet, df_personal, df_phone):
-    # Formatear el nombre de las columnas a snake_case para cada dataframe
-    datasets = [df_contract, df_internet, df_personal, df_phone] 
-    for df in datasets:
-        camelcase_to_snakecase(df)
+# Función de limpieza de cada tabla (mismos nombres que CSV_DTYPES)
+CLEANING_FUNCTIONS = {'contract': contract_cleaning, 'internet': internet_cleaning,
+                      'personal': personal_cleaning, 'phone': phone_cleaning}
 
-    # Limpiar cada dataset
-    df_contract = contract_cleaning(df_contract)
-    df_internet = internet_cleaning(df_internet)
-    df_personal = personal_cleaning(df_personal)
-    df_phone = phone_cleaning(df_phone)
+def clean_table(source, df, schema=TELECOM_SCHEMA):
+    if schema is not None:
+        # Fijar las categorías conocidas; los valores no vistos quedan como nulos, por lo que se avisa cuántos hay
+        # (utils/monitoring.py los reporta además como contadores unknown_category)
+        unknown = unknown_categories(source, df)
+        if unknown:
+            warnings.warn(f'{source}: valores no vistos en entrenamiento que se tratan como ausentes: {unknown}')
+        df = apply_categories(source, df)
+
+    # Formatear el nombre de las columnas a snake_case
+    camelcase_to_snakecase(df)
+
+    # Limpiar el dataset
+    df = CLEANING_FUNCTIONS[source](df)
 
+    # Aplicar los tipos de datos compactos antes del merge para que las copias ocupen menos memoria
+    if schema is not None:
+        df = apply_schema(df, schema)
+    return df
+
+def assemble_tables(df_contract, df_internet, df_personal, df_phone, keep_customer_id=False, schema=TELECOM_SCHEMA):
     # Combinar los dataframes
     df_merged = merge_datasets(df_contract, df_internet, df_personal, df_phone)
 
+    # El merge deja como object/float las columnas con valores ausentes; se restauran los tipos
+    if schema is not None:
+        df_merged = apply_schema(df_merged, schema)
+
     # Eliminar columnas innecesarias para el modelo
-    df_merged.drop(['begin_year', 'begin_month', 'end_month', 'end_year', 'customer_id'], axis=1, inplace=True)
+    drop_cols = ['begin_year', 'begin_month', 'end_month', 'end_year']
+    if not keep_customer_id:
+        drop_cols.append('customer_id')
+    df_merged.drop(drop_cols, axis=1, inplace=True)
+
+    return df_merged
+
+@profiled()
+def preprocessing_data(df_contract, df_internet, df_personal, df_phone, keep_customer_id=False, schema=TELECOM_SCHEMA):
+    # Limpiar cada dataset
+    df_contract = clean_table('contract', df_contract, schema)
+    df_internet = clean_table('internet', df_internet, schema)
+    df_personal = clean_table('personal', df_personal, schema)
+    df_phone = clean_table('phone', df_phone, schema)
+
+    return assemble_tables(df_contract, df_internet, df_personal, df_phone, keep_customer_id, schema)
+
+def read_and_clean_table(files_path, source, file_name, schema=TELECOM_SCHEMA, dtypes=CSV_DTYPES):
+    ''' Lee y limpia una tabla; se ejecuta en un proceso del pool de preprocessing_data_parallel. '''
+    df = pd.read_csv(files_path + file_name, dtype=(dtypes or {}).get(source))
+    return clean_table(source, df, schema)
+
+@profiled()
+def preprocessing_data_parallel(files_path:str, n_workers=None, keep_customer_id=False, schema=TELECOM_SCHEMA,
+                                dtypes=CSV_DTYPES, contract_name:str='contract.csv', internet_name:str='internet.csv',
+                                personal_name:str='personal.csv', phone_name:str='phone.csv'):
+    ''' Equivalente a read_csv_files + preprocessing_data con las 4 tablas leídas y limpiadas en paralelo,
+    una por proceso (hasta n_workers procesos; por defecto el número de núcleos). El proceso principal solo
+    une las tablas limpias, que ya tienen los tipos compactos del esquema. '''
+    sources = {'contract': contract_name, 'internet': internet_name, 'personal': personal_name, 'phone': phone_name}
+    n_workers = min(len(sources), n_workers or os.cpu_count() or 1)
+    if n_workers == 1:
+        cleaned = {source: read_and_clean_table(files_path, source, name, schema, dtypes) for source, name in sources.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # contract es la tabla más costosa de limpiar: se envía primero
+            futures = {source: executor.submit(read_and_clean_table, files_path, source, name, schema, dtypes)
+                       for source, name in sources.items()}
+            cleaned = {source: future.result() for source, future in futures.items()}
+    return assemble_tables(cleaned['contract'], cleaned['internet'], cleaned['personal'], cleaned['phone'],
+                           keep_customer_id, schema)
+
+@profiled()
+def preprocessing_data_partitioned(partitions, keep_customer_id=False):
+    ''' Aplica preprocessing_data a cada partición entregada por read_csv_partitions y une los resultados.
+    Cada partición contiene todas las filas de sus clientes, por lo que la limpieza y el merge se hacen
+    partición por partición. Las filas se ordenan como en contract.csv, igual que en la versión en memoria. '''
+    cleaned_partitions = []
+    for df_contract, df_internet, df_personal, df_phone in partitions:
+        # Guardar la posición original de cada cliente en contract.csv antes de limpiar
+        contract_order = pd.Series(df_contract.index, index=df_contract['customerID'])
+        df_partition = preprocessing_data(df_contract, df_internet, df_personal, df_phone, keep_customer_id=True)
+        df_partition['row_order'] = df_partition['customer_id'].map(contract_order)
+        cleaned_partitions.append(df_partition)
+
+    # Unir las particiones y restaurar el orden original (los clientes que no estan en contract van al final)
+    df_merged = pd.concat(cleaned_partitions, ignore_index=True)
+    df_merged = df_merged.sort_values('row_order', kind='stable', na_position='last', ignore_index=True)
+    drop_cols = ['row_order']
+    if not keep_customer_id:
+        drop_cols.append('customer_id')
+    df_merged.drop(drop_cols, axis=1, inplace=True)
+
+    return df_merged
+
+def clean_spilled_partition(spill_dir, sources, partition, output_path, keep_customer_id=True):
+    ''' Limpia una partición guardada por spill_csv_partitions y la escribe en Feather.
+    Se ejecuta en un proceso del pool de preprocessing_data_out_of_core. '''
+    import pyarrow.feather as feather
+    df_partition = preprocessing_data(*(load_partition(spill_dir, source, partition) for source in sources),
+                                      keep_customer_id=keep_customer_id)
+    feather.write_feather(df_partition, output_path + '.tmp', compression='uncompressed')
+    os.replace(output_path + '.tmp', output_path)
+    return output_path, len(df_partition)
+
+@profiled()
+def preprocessing_data_out_of_core(files_path:str, output_dir:str, n_partitions:int=16, n_workers=None,
+                                   chunksize:int=100000, keep_customer_id=True, contract_name:str='contract.csv',
+                                   internet_name:str='internet.csv', personal_name:str='personal.csv',
+                                   phone_name:str='phone.csv'):
+    ''' Preprocesamiento para entradas más grandes que la memoria. Los CSV se leen por bloques y se reparten
+    en disco por el hash de customer_id (cada cliente queda completo en una partición); las particiones
+    se limpian en paralelo (n_workers procesos) y cada una se escribe en output_dir como Feather sin
+    compresión, que después se puede leer mapeada en memoria. La memoria máxima depende del tamaño de
+    la partición por el número de procesos, no del total de clientes.
+    Regresa la lista de archivos y el número de filas de cada uno. '''
+    os.makedirs(output_dir, exist_ok=True)
+    n_workers = n_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as spill_dir:
+        sources = spill_csv_partitions(files_path, spill_dir, n_partitions, chunksize, contract_name, internet_name,
+                                       personal_name, phone_name)
+        output_paths = [os.path.join(output_dir, f'telecom_clean_{partition}.feather') for partition in range(n_partitions)]
+        if n_workers == 1:
+            return [clean_spilled_partition(spill_dir, sources, partition, output_paths[partition], keep_customer_id)
+                    for partition in range(n_partitions)]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(clean_spilled_partition, spill_dir, sources, partition, output_paths[partition],
+                                       keep_customer_id) for partition in range(n_partitions)]
+            return [future.result() for future in futures]
+
+@profiled()
+def preprocessing_data_cached(files_path:str, cache_dir:str='./files/cache/', max_cache_bytes:int=2*1024**3,
+                              keep_customer_id=False, contract_name:str='contract.csv', internet_name:str='internet.csv',
+                              personal_name:str='personal.csv', phone_name:str='phone.csv', n_workers=1):
+    ''' Equivalente a read_csv_files + preprocessing_data, guardando el resultado en una caché en disco.
+    La llave de la caché es el hash del contenido de los 4 archivos y de los parámetros de limpieza,
+    por lo que una entrada se invalida sola cuando cambian los datos de entrada.
+    max_cache_bytes: tamaño máximo de la caché; las versiones menos usadas se eliminan primero.
+    n_workers: con más de 1 (o None para todos los núcleos) las tablas se limpian en paralelo (preprocessing_data_parallel). '''
+    file_names = [contract_name, internet_name, personal_name, phone_name]
+    key = cache_key([os.path.join(files_path, name) for name in file_names],
+                    params={'keep_customer_id': keep_customer_id})
+
+    df_cached = load_cached_frame(cache_dir, 'telecom_clean', key)
+    if df_cached is not None:
+        return df_cached
 
-    return df_merged
\ No newline at end of file
+    if n_workers == 1:
+        df_telecom_clean = preprocessing_data(*read_csv_files(files_path, *file_names), keep_customer_id=keep_customer_id)
+    else:
+        df_telecom_clean = preprocessing_data_parallel(files_path, n_workers, keep_customer_id=keep_customer_id,
+                                                       contract_name=contract_name, internet_name=internet_name,
+                                                       personal_name=personal_name, phone_name=phone_name)
+    save_cached_frame(df_telecom_clean, cache_dir, 'telecom_clean', key, max_cache_bytes=max_cache_bytes)
+    return df_telecom_clean
\ No newline at end of file
@@ -0,0 +1,133 @@
+import pickle
+import numpy as np
+import pandas as pd
+
+class FittedPreprocessor:
+    ''' Guarda los pasos ajustados en preparing_data (LabelEncoder, One Hot Encoding, MinMaxScaler
+    y la selección de columnas de Boruta) para aplicarlos a clientes nuevos sin volver a entrenar.
+
+    Cada columna de salida se precalcula como una operación sobre el registro de entrada:
+    - 'label': índice de la categoría en las clases del LabelEncoder,
+    - 'onehot': 1 si el valor de la columna es igual a la categoría, 0 en caso contrario,
+    - 'value': el valor numérico/bool de la columna.
+    Despues se aplica el escalado (x * scale + min) si la columna fue escalada. Así un registro
+    se transforma con un ciclo sobre listas de Python, sin construir un DataFrame. '''
+
+    def __init__(self, feature_columns, output_columns, lb_col, lb_classes, ohe_col, ohe_categories,
+                 scaled_columns, scale, min_):
+        self.feature_columns = list(feature_columns)
+        self.output_columns = list(output_columns)
+        self.lb_col = lb_col
+        self.lb_classes = list(lb_classes)
+        self.ohe_col = ohe_col
+        self.ohe_categories = list(ohe_categories)
+        self.scaled_columns = list(scaled_columns)
+        self.scale = np.asarray(scale, dtype=float)
+        self.min_ = np.asarray(min_, dtype=float)
+        self._compile()
+
+    @classmethod
+    def from_fitted(cls, features_train, features_train_encoded_selected, lb_col, label_encoder, ohe_col,
+                    columns_to_scale, scaler):
+        ''' Construye el transformador a partir de los objetos ajustados en preparing_data.
+        features_train: características de entrenamiento antes de codificar (columnas de entrada).
+        features_train_encoded_selected: características después de Boruta (columnas de salida). '''
+        ohe_prefix = f'{ohe_col}_'
+        ohe_categories = [col[len(ohe_prefix):] for col in features_train_encoded_selected.columns
+                          if col.startswith(ohe_prefix)]
+        # Se guardan todas las categorías vistas en entrenamiento, no solo las seleccionadas
+        ohe_categories = sorted(set(ohe_categories) | set(features_train[ohe_col].unique()))
+        return cls(feature_columns=features_train.columns,
+                   output_columns=features_train_encoded_selected.columns,
+                   lb_col=lb_col, lb_classes=label_encoder.classes_,
+                   ohe_col=ohe_col, ohe_categories=ohe_categories,
+                   scaled_columns=columns_to_scale, scale=scaler.scale_, min_=scaler.min_)
+
+    def _compile(self):
+        ''' Precalcula la operación de cada columna de salida. '''
+        self._lb_index = {category: idx for idx, category in enumerate(self.lb_classes)}
+        scaled = {col: (self.scale[idx], self.min_[idx]) for idx, col in enumerate(self.scaled_columns)}
+        ohe_prefix = f'{self.ohe_col}_'
+        self._ops = []
+        for col in self.output_columns:
+            col_scale, col_min = scaled.get(col, (1.0, 0.0))
+            if col == self.lb_col:
+                self._ops.append(('label', col, None, col_scale, col_min))
+            elif col.startswith(ohe_prefix) and col[len(ohe_prefix):] in self.ohe_categories:
+                self._ops.append(('onehot', self.ohe_col, col[len(ohe_prefix):], col_scale, col_min))
+            else:
+                self._ops.append(('value', col, None, col_scale, col_min))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_ops'], state['_lb_index']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def scorable(self, df):
+        ''' Filas de df que transform puede procesar: la columna del LabelEncoder tiene una etiqueta de
+        entrenamiento (queda nula para los clientes sin fila en contract o con un tipo de contrato no visto). '''
+        return df[self.lb_col].isin(self.lb_classes).to_numpy()
+
+    def transform_record(self, record):
+        ''' Transforma un solo cliente (diccionario columna -> valor) en un arreglo 1D
+        con las columnas de salida en el orden usado por los modelos. '''
+        row = np.empty(len(self._ops))
+        for idx, (kind, col, category, col_scale, col_min) in enumerate(self._ops):
+            if kind == 'label':
+                if pd.isna(record[col]):
+                    raise ValueError(f'{col} es nulo; el LabelEncoder necesita una etiqueta de entrenamiento')
+                try:
+                    value = self._lb_index[record[col]]
+                except KeyError:
+                    raise ValueError(f'{col} contiene una etiqueta no vista en entrenamiento: {record[col]!r}')
+            elif kind == 'onehot':
+                value = record[col] == category
+            else:
+                value = record[col]
+            row[idx] = value * col_scale + col_min
+        return row
+
+    def transform(self, records):
+        ''' Transforma un lote de clientes. records puede ser una lista de diccionarios
+        o un DataFrame con las columnas de entrada; regresa un arreglo 2D de float. '''
+        if hasattr(records, 'columns'):
+            return self._transform_columns(records)
+        out = np.empty((len(records), len(self._ops)))
+        for idx, record in enumerate(records):
+            out[idx] = self.transform_record(record)
+        return out
+
+    def _transform_columns(self, df):
+        ''' Versión por columnas para lotes grandes que ya estan en un DataFrame. '''
+        out = np.empty((len(df), len(self._ops)))
+        for idx, (kind, col, category, col_scale, col_min) in enumerate(self._ops):
+            values = df[col].to_numpy()
+            if kind == 'label':
+                # searchsorted no puede comparar nulos con las etiquetas (TypeError): se rechazan antes
+                nulls = pd.isna(values)
+                if nulls.any():
+                    raise ValueError(f'{col} contiene {nulls.sum()} valores nulos; el LabelEncoder necesita una '
+                                     'etiqueta de entrenamiento (ver scorable)')
+                codes = np.searchsorted(self.lb_classes, values)
+                codes = np.minimum(codes, len(self.lb_classes) - 1)
+                unknown = np.asarray(self.lb_classes, dtype=object)[codes] != values
+                if unknown.any():
+                    raise ValueError(f'{col} contiene etiquetas no vistas en entrenamiento: {set(values[unknown])!r}')
+                values = codes
+            elif kind == 'onehot':
+                values = values == category
+            out[:, idx] = values * col_scale + col_min
+        return out
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from utils.functions import (calculate_active_days, calculate_active_days_vectorized, real_end_date,
+                             real_end_date_vectorized)
+
+def contract(rows):
+    ''' Contratos con begin_date/end_date ya convertidos a fecha, como en contract_cleaning. '''
+    df = pd.DataFrame(rows, columns=['begin_date', 'end_date', 'type'])
+    df['begin_date'] = pd.to_datetime(df['begin_date'])
+    df['end_date'] = pd.to_datetime(df['end_date'])
+    return df
+
+def rowwise(df):
+    df = df.copy()
+    df['end_date_with_contract'] = df.apply(real_end_date, axis=1)
+    df['active_days'] = df.apply(calculate_active_days, axis=1)
+    return df[['end_date_with_contract', 'active_days']]
+
+def vectorized(df):
+    df = df.copy()
+    df['end_date_with_contract'] = real_end_date_vectorized(df)
+    df['active_days'] = calculate_active_days_vectorized(df)
+    return df[['end_date_with_contract', 'active_days']]
+
+# Clientes sin fecha de terminación (NaT) con cada tipo de contrato en meses y años límite:
+# enero/febrero (reglas mes a mes), inicio en el último año, 29 de febrero y fin de mes
+EDGE_BEGIN_DATES = ['2020-01-01', '2020-01-31', '2020-02-01', '2020-02-29', '2019-01-31', '2019-02-28', '2019-12-01',
+                    '2016-02-29', '2018-03-31', '2013-10-01']
+
+@pytest.mark.parametrize('type_contract', ['Month-to-month', 'One year', 'Two year'])
+def test_real_end_date_matches_rowwise_without_end_date(type_contract):
+    df = contract([(begin, None, type_contract) for begin in EDGE_BEGIN_DATES])
+    assert df['end_date'].isna().all()
+    pd.testing.assert_frame_equal(vectorized(df), rowwise(df))
+
+def test_real_end_date_matches_rowwise_with_end_date():
+    # Fechas de terminación registradas, incluida una posterior al último día (se limita a 2020-01-01)
+    df = contract([('2019-10-01', '2019-11-01', 'Month-to-month'), ('2016-02-29', '2020-01-01', 'Two year'),
+                   ('2019-12-31', '2020-01-01', 'One year'), ('2018-05-01', '2020-03-01', 'Month-to-month'),
+                   ('2020-01-01', None, 'Month-to-month'), ('2020-02-01', None, 'One year')])
+    result = vectorized(df)
+    pd.testing.assert_frame_equal(result, rowwise(df))
+    assert result['end_date_with_contract'].iloc[0] == pd.Timestamp('2019-11-01')
+    assert result['active_days'].iloc[3] == (pd.Timestamp('2020-01-01') - pd.Timestamp('2018-05-01')).days
+
+def test_missing_begin_date():
+    # Sin fecha de inicio pero con terminación: ambas versiones conservan la terminación y no calculan días
+    df = contract([('2019-01-01', '2019-11-01', 'One year'), (None, '2019-11-01', 'Two year')])
+    pd.testing.assert_frame_equal(vectorized(df), rowwise(df))
+    # Sin ninguna de las dos fechas la versión fila por fila falla al armar la fecha del contrato;
+    # la vectorizada deja NaT y días nulos
+    result = vectorized(contract([(None, None, type_contract) for type_contract in ['Month-to-month', 'One year', 'Two year']]))
+    assert result['end_date_with_contract'].isna().all() and result['active_days'].isna().all()
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from excecution.incremental import diff_snapshots, snapshot_digests
+
+def tables():
+    df_contract = pd.DataFrame({'customerID': ['a', 'b', 'c'], 'Type': ['Month-to-month', 'One year', 'Two year']})
+    df_internet = pd.DataFrame({'customerID': ['a', 'b'], 'InternetService': ['DSL', 'Fiber optic']})
+    df_personal = pd.DataFrame({'customerID': ['a', 'b', 'c'], 'gender': ['Male', 'Female', 'Male']})
+    df_phone = pd.DataFrame({'customerID': ['c'], 'MultipleLines': ['No']})
+    return [df_contract, df_internet, df_personal, df_phone]
+
+def test_digests_keep_exact_uint64_hashes():
+    digests = snapshot_digests(tables())
+    assert (digests.dtypes == np.uint64).all()
+    expected = pd.util.hash_pandas_object(tables()[0][['Type']], index=False).to_numpy()
+    assert np.array_equal(digests.loc[['a', 'b', 'c'], 'contract'].to_numpy(), expected)
+
+def test_orphan_row_only_inserts_that_customer():
+    previous = snapshot_digests(tables())
+    datasets = tables()
+    datasets[3] = pd.concat([datasets[3], pd.DataFrame({'customerID': ['z'], 'MultipleLines': ['Yes']})])
+    inserted, updated, deleted = diff_snapshots(previous, snapshot_digests(datasets))
+    assert list(inserted) == ['z']
+    assert len(updated) == 0 and len(deleted) == 0
+
+def test_duplicate_customer_is_rejected():
+    datasets = tables()
+    datasets[1] = pd.concat([datasets[1], datasets[1].iloc[:1]])
+    with pytest.raises(ValueError, match='internet'):
+        snapshot_digests(datasets)
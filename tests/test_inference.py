@@ -0,0 +1,40 @@
+import asyncio
+import json
+from excecution.inference import MicroBatcher, handle_connection
+
+class ConstantScorer:
+    ''' Sustituto de ChurnScorer: probabilidad fija para cada registro. '''
+    version = 'test'
+    metadata = {'name': 'constant'}
+
+    def predict_proba(self, records):
+        return [0.25] * len(records)
+
+async def post(port, path, payload=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    method = 'GET' if payload is None else 'POST'
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+async def stats_after_requests():
+    batcher = MicroBatcher(ConstantScorer(), max_batch=8, max_wait_ms=1.0)
+    batcher_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(lambda r, w: handle_connection(r, w, batcher), '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        assert (await post(port, '/predict', [{'a': 1}, {'a': 2}, {'a': 3}]))['churn_proba'] == [0.25] * 3
+        assert (await post(port, '/predict', {'a': 4}))['churn_proba'] == [0.25]
+        return await post(port, '/stats')
+    finally:
+        server.close()
+        batcher_task.cancel()
+
+def test_stats_count_http_requests_and_rows_separately():
+    stats = asyncio.run(stats_after_requests())
+    assert stats['requests'] == 2
+    assert stats['rows'] == 4
+    assert stats['p50_ms'] is not None
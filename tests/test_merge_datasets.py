@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.functions import align_by_key, merge_datasets
+
+def chained_merge(df_contract, df_internet, df_personal, df_phone, on='customer_id'):
+    ''' Merges encadenados y relleno con False, como merge_datasets antes de align_by_key. '''
+    df_merged = pd.merge(df_contract, df_personal, on=on, how='outer')
+    df_merged = pd.merge(df_merged, df_internet, on=on, how='outer')
+    df_merged = pd.merge(df_merged, df_phone, on=on, how='outer')
+    return df_merged.fillna({col: False for col in df_merged.columns})
+
+def tables(personal_ids=('a', 'b', 'c')):
+    df_contract = pd.DataFrame({'customer_id': ['a', 'b', 'c'], 'x': [1.0, 2.0, 3.0]})
+    df_internet = pd.DataFrame({'customer_id': ['b', 'd'], 'z': [True, False]})
+    df_personal = pd.DataFrame({'customer_id': list(personal_ids), 'y': np.arange(10.0, 10.0 * (len(personal_ids) + 1), 10.0)})
+    df_phone = pd.DataFrame({'customer_id': ['c'], 'w': [True]})
+    return df_contract, df_internet, df_personal, df_phone
+
+def test_merge_datasets_matches_chained_merge():
+    pd.testing.assert_frame_equal(merge_datasets(*tables()), chained_merge(*tables()), check_dtype=False)
+
+def test_merge_datasets_null_key_does_not_overwrite_other_customer():
+    # La fila con customer_id nulo (y=40) no debe quedar en la fila de otro cliente
+    df_merged = merge_datasets(*tables(personal_ids=('a', 'b', 'c', np.nan)))
+    pd.testing.assert_frame_equal(df_merged, chained_merge(*tables(personal_ids=('a', 'b', 'c', np.nan))),
+                                  check_dtype=False)
+    assert df_merged.loc[df_merged['customer_id'] == 'c', 'y'].tolist() == [30.0]
+
+def test_align_by_key_rejects_null_keys():
+    with pytest.raises(ValueError):
+        align_by_key(list(tables(personal_ids=('a', np.nan))))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, average_precision_score, f1_score, roc_auc_score
+from utils.functions import metrics_from_curves, threshold_curves
+
+def test_metrics_from_curves_match_sklearn():
+    rng = np.random.default_rng(0)
+    target = rng.random(500) < 0.3
+    # Probabilidades redondeadas para que haya umbrales repetidos
+    proba = np.clip(target * 0.3 + rng.random(500) * 0.7, 0, 1).round(2)
+    metrics = metrics_from_curves(threshold_curves(target, proba))
+    assert metrics['ROC AUC'] == pytest.approx(roc_auc_score(target, proba))
+    assert metrics['APS'] == pytest.approx(average_precision_score(target, proba))
+    assert metrics['Accuracy'] == pytest.approx(accuracy_score(target, proba > 0.5))
+    assert metrics['F1'] == pytest.approx(f1_score(target, proba > 0.5))
+
+@pytest.mark.parametrize('label', [True, False])
+def test_single_class_roc_auc_is_nan(label):
+    target = np.full(20, label)
+    metrics = metrics_from_curves(threshold_curves(target, np.linspace(0, 1, 20)))
+    assert np.isnan(metrics['ROC AUC'])
+    assert np.isnan(metrics['APS']) != label
+    assert metrics['Accuracy'] == pytest.approx(accuracy_score(target, np.linspace(0, 1, 20) > 0.5))
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from utils.prediction_writer import write_predictions
+
+def test_churn_proba_is_high_for_a_known_churner(tmp_path):
+    # Objetivo is_active como en preparing_data: los cargos mensuales altos abandonan (is_active = False)
+    rng = np.random.default_rng(0)
+    monthly_charges = rng.uniform(0, 1, 500)
+    features = pd.DataFrame({'monthly_charges': monthly_charges}, index=[f'c{idx}' for idx in range(500)])
+    model = LogisticRegression().fit(features, monthly_charges < 0.5)
+
+    test = pd.DataFrame({'monthly_charges': [0.95, 0.05]}, index=['churner', 'stayer'])
+    path = write_predictions(model, 'logistic_regression', 'v1', test, output_dir=str(tmp_path))
+    predictions = pd.read_parquet(path).set_index('customer_id')
+
+    assert predictions.loc['churner', 'churn_proba'] > 0.9
+    assert predictions.loc['churner', 'churn_pred'] == 1
+    assert predictions.loc['stayer', 'churn_proba'] < 0.1
+    assert predictions.loc['stayer', 'churn_pred'] == 0
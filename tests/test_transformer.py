@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from preprocessing.transformer import FittedPreprocessor
+
+def preprocessor():
+    return FittedPreprocessor(feature_columns=['type', 'payment_method', 'monthly_charges'],
+                              output_columns=['type', 'payment_method_Mailed check', 'monthly_charges'],
+                              lb_col='type', lb_classes=['Month-to-month', 'One year', 'Two year'],
+                              ohe_col='payment_method', ohe_categories=['Electronic check', 'Mailed check'],
+                              scaled_columns=['type', 'monthly_charges'], scale=[0.5, 0.01], min_=[0.0, -0.18])
+
+def customers(types):
+    return pd.DataFrame({'type': types, 'payment_method': 'Mailed check', 'monthly_charges': 50.0})
+
+def test_transform_columns_matches_transform_record():
+    transformer = preprocessor()
+    df = customers(['Two year', 'Month-to-month', 'One year'])
+    expected = np.array([transformer.transform_record(record) for record in df.to_dict('records')])
+    np.testing.assert_allclose(transformer.transform(df), expected)
+    np.testing.assert_allclose(expected[:, 0], [1.0, 0.0, 0.5])
+
+@pytest.mark.parametrize('null', [None, np.nan])
+def test_null_label_raises_value_error_naming_column(null):
+    transformer = preprocessor()
+    df = customers(['Two year', null, 'One year'])
+    with pytest.raises(ValueError, match='type contiene 1 valores nulos'):
+        transformer.transform(df)
+    with pytest.raises(ValueError, match='type contiene 1 valores nulos'):
+        transformer.transform(df.astype({'type': 'category'}))
+    with pytest.raises(ValueError, match='type es nulo'):
+        transformer.transform(df.to_dict('records'))
+    assert transformer.scorable(df).tolist() == [True, False, True]
+
+def test_unseen_label_raises_value_error():
+    with pytest.raises(ValueError, match='no vistas en entrenamiento'):
+        preprocessor().transform(customers(['Two year', 'Three year']))
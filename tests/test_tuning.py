@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from models.tuning import NativeDataset, fold_splits, holdout_split, hyperband, search_method, successive_halving
+
+def oversampled(n_customers=200, seed=0):
+    ''' Objetivo y cliente de cada fila con la clase minoritaria repetida, como tras RandomOverSampler. '''
+    rng = np.random.default_rng(seed)
+    target = (rng.random(n_customers) < 0.75).astype(int)
+    minority = np.flatnonzero(target == 0)
+    extra = rng.choice(minority, size=(target == 1).sum() - len(minority))
+    rows = np.concatenate([np.arange(n_customers), extra])
+    return target[rows], np.array([f'c{idx}' for idx in rows])
+
+def test_holdout_split_keeps_customer_copies_together():
+    target, groups = oversampled()
+    train_idx, valid_idx = holdout_split(target, groups, valid_size=0.2)
+    assert not set(groups[train_idx]) & set(groups[valid_idx])
+    assert len(train_idx) + len(valid_idx) == len(target)
+    assert abs(target[valid_idx].mean() - target.mean()) < 0.1
+
+def test_fold_splits_keep_customer_copies_together():
+    target, groups = oversampled()
+    splits = fold_splits(target, groups, cv=5)
+    assert len(splits) == 5
+    for train_idx, valid_idx in splits:
+        assert not set(groups[train_idx]) & set(groups[valid_idx])
+    assert np.array_equal(np.sort(np.concatenate([valid_idx for _, valid_idx in splits])), np.arange(len(target)))
+
+def test_search_method():
+    assert search_method(True) is successive_halving
+    assert search_method('hyperband') is hyperband
+    with pytest.raises(ValueError):
+        search_method('random')
+
+def test_hyperband_uses_given_dataset_and_groups():
+    target, groups = oversampled(n_customers=150)
+    rng = np.random.default_rng(1)
+    features = rng.normal(size=(len(target), 3)) + target[:, None]
+    dataset = NativeDataset('lightgbm', features, target)
+    grid = {'num_leaves': [4, 8], 'learning_rate': [0.1]}
+    result = hyperband('lightgbm', grid, None, None, cv=3, min_rounds=5, max_rounds=20, early_stopping_rounds=5,
+                       n_jobs=1, verbose=False, dataset=dataset, groups=groups)
+    assert result['best_params']['num_leaves'] in (4, 8)
+    assert 1 <= result['best_params']['n_estimators'] <= 20
+    assert result['history']
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Cambiar este valor cuando cambie la lógica de limpieza para invalidar las entradas guardadas
+CACHE_VERSION = 2
+
+def file_fingerprint(file_path, block_size=1 << 20):
+    ''' Calcula el hash sha256 del contenido de un archivo, leyendolo por bloques. '''
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_key(file_paths, params=None):
+    ''' Genera la llave de la caché a partir del contenido de los archivos de entrada
+    y de los parámetros de limpieza. Si cambia cualquiera de los dos, cambia la llave. '''
+    digest = hashlib.sha256()
+    digest.update(f'v{CACHE_VERSION}'.encode())
+    for file_path in file_paths:
+        digest.update(file_fingerprint(file_path).encode())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+def frame_fingerprint(df, target=None, params=None):
+    ''' Hash del contenido de un dataframe (columnas y valores), de un objetivo opcional y de parámetros. '''
+    digest = hashlib.sha256()
+    digest.update(f'v{CACHE_VERSION}'.encode())
+    digest.update(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    if target is not None:
+        digest.update(np.ascontiguousarray(np.asarray(target)).tobytes())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+def cache_path(cache_dir, name, key):
+    return os.path.join(cache_dir, f'{name}_{key}.feather')
+
+def load_cached_frame(cache_dir, name, key):
+    ''' Carga el dataframe guardado para la llave dada mapeando el archivo en memoria.
+    Regresa None si no existe una entrada para esa llave. '''
+    path = cache_path(cache_dir, name, key)
+    if not os.path.exists(path):
+        return None
+    import pyarrow.feather as feather
+    df = feather.read_table(path, memory_map=True).to_pandas()
+    # Actualizar la fecha de acceso para que la evicción elimine primero las entradas menos usadas
+    os.utime(path)
+    return df
+
+def save_cached_frame(df, cache_dir, name, key, max_cache_bytes=None):
+    ''' Guarda el dataframe en formato Feather (Arrow IPC) sin compresión, para poder mapearlo en memoria.
+    La escritura es atómica: se escribe en un archivo temporal y luego se renombra. '''
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, name, key)
+    tmp_path = path + '.tmp'
+    import pyarrow.feather as feather
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    if max_cache_bytes is not None:
+        evict_cache(cache_dir, name, max_cache_bytes, keep=path)
+    return path
+
+def evict_cache(cache_dir, name, max_cache_bytes, keep=None):
+    ''' Elimina las entradas menos usadas recientemente hasta que la caché ocupe como máximo max_cache_bytes.
+    keep: entrada que nunca se elimina (la recién escrita). '''
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if file_name.startswith(f'{name}_') and file_name.endswith('.feather'):
+            path = os.path.join(cache_dir, file_name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_cache_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total_bytes -= size
+        removed.append(path)
+    return removed
+
+def load_cached_json(cache_dir, name, key):
+    ''' Carga un resultado pequeño (por ejemplo, columnas seleccionadas) guardado en JSON. None si no existe. '''
+    path = os.path.join(cache_dir, f'{name}_{key}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_cached_json(value, cache_dir, name, key):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{name}_{key}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(value, f)
+    os.replace(path + '.tmp', path)
+    return path
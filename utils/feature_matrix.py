@@ -0,0 +1,74 @@
+''' Matrices de características en archivos .npy mapeados en memoria, compartidas entre procesos.
+
+Después de preparing_data los conjuntos de entrenamiento y prueba se escriben una sola vez como matrices
+float32 contiguas (por filas). Cada proceso que entrena un modelo abre los archivos con np.load(mmap_mode=...)
+en lugar de recibir una copia serializada de los dataframes: las páginas del archivo se comparten entre
+todos los procesos a través de la caché del sistema operativo y los dataframes se construyen sobre el
+mapeo sin copiar (features.values regresa la misma memoria que el archivo). '''
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FEATURE_DTYPE = np.float32
+METADATA_NAME = 'metadata.json'
+# Conjuntos guardados: (nombre, es matriz de características)
+SPLITS = (('features_train', True), ('target_train', False), ('features_test', True), ('target_test', False))
+
+def write_array(path, values, dtype=None):
+    ''' Escribe un arreglo .npy contiguo (escritura atómica). '''
+    tmp_path = path + '.tmp'
+    values = np.asarray(values, dtype=dtype)
+    array = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=values.dtype, shape=values.shape)
+    array[...] = values
+    array.flush()
+    del array
+    os.replace(tmp_path, path)
+
+def write_feature_matrix(matrix_dir, features_train, target_train, features_test, target_test, **metadata):
+    ''' Guarda los 4 conjuntos en matrix_dir: características en float32, objetivo e índice con su tipo original.
+    metadata: valores adicionales que se guardan en metadata.json (por ejemplo balance).
+    metadata.json se escribe al final, así que solo existe si todos los arreglos se escribieron completos. '''
+    os.makedirs(matrix_dir, exist_ok=True)
+    metadata_path = os.path.join(matrix_dir, METADATA_NAME)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+
+    splits = dict(zip([name for name, _ in SPLITS], (features_train, target_train, features_test, target_test)))
+    info = {}
+    for name, is_features in SPLITS:
+        data = splits[name]
+        write_array(os.path.join(matrix_dir, f'{name}.npy'), data.to_numpy(), FEATURE_DTYPE if is_features else None)
+        # Índices de texto (customer_id) como cadenas de ancho fijo: los arreglos de objetos no se pueden mapear
+        index = data.index.to_numpy()
+        write_array(os.path.join(matrix_dir, f'{name}_index.npy'), index.astype(str) if index.dtype == object else index)
+        info[name] = {'columns': list(data.columns)} if is_features else {'name': data.name}
+
+    tmp_path = metadata_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'splits': info, **metadata}, f, indent=2, default=str)
+    os.replace(tmp_path, metadata_path)
+    return matrix_dir
+
+def has_feature_matrix(matrix_dir):
+    return os.path.exists(os.path.join(matrix_dir, METADATA_NAME))
+
+def load_feature_matrix(matrix_dir, mmap_mode='c'):
+    ''' Abre los conjuntos guardados por write_feature_matrix sin copiarlos a memoria.
+    Regresa un diccionario con features_train, target_train, features_test y target_test (dataframes y
+    series sobre el mapeo), los metadatos guardados y 'matrix_dir'.
+    mmap_mode='c' (copia al escribir): las páginas se comparten mientras nadie las modifique, y las
+    librerías que piden arreglos modificables los aceptan sin copiar. '''
+    with open(os.path.join(matrix_dir, METADATA_NAME)) as f:
+        metadata = json.load(f)
+    info = metadata.pop('splits')
+
+    loaded = {}
+    for name, is_features in SPLITS:
+        values = np.load(os.path.join(matrix_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+        index = pd.Index(np.load(os.path.join(matrix_dir, f'{name}_index.npy'), mmap_mode=mmap_mode), copy=False)
+        if is_features:
+            loaded[name] = pd.DataFrame(values, index=index, columns=info[name]['columns'], copy=False)
+        else:
+            loaded[name] = pd.Series(values, index=index, name=info[name]['name'], copy=False)
+    return dict(loaded, **metadata, matrix_dir=matrix_dir)
@@ -1,11 +1,56 @@
 import pandas as pd
+import os
+import pickle
 import re
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-from sklearn.ensemble import RandomForestClassifier
-from boruta import BorutaPy
-import matplotlib.pyplot as plt
+import tempfile
+from utils.cache import frame_fingerprint, load_cached_json, save_cached_json
+from utils.profiling import profiled
 import numpy as np
-from sklearn.metrics import accuracy_score, f1_score, roc_curve, roc_auc_score, average_precision_score, precision_recall_curve
+
+# Tipos de datos explícitos de los CSV de entrada. Las columnas categóricas se leen como 'category' con las
+# categorías que traiga el archivo, para no perder al leer un valor que no se vio en entrenamiento (con
+# categorías fijas read_csv lo convertiría en nulo sin avisar); los cargos se leen como float32 para reducir
+# la memoria de todas las copias posteriores.
+CSV_DTYPES = {
+    'contract': {'customerID': str, 'BeginDate': str, 'EndDate': str, 'Type': 'category',
+                 'PaperlessBilling': 'category', 'PaymentMethod': 'category', 'MonthlyCharges': 'float32',
+                 'TotalCharges': str},
+    'internet': {'customerID': str, 'InternetService': 'category', 'OnlineSecurity': 'category',
+                 'OnlineBackup': 'category', 'DeviceProtection': 'category', 'TechSupport': 'category',
+                 'StreamingTV': 'category', 'StreamingMovies': 'category'},
+    'personal': {'customerID': str, 'gender': 'category', 'SeniorCitizen': 'uint8', 'Partner': 'category',
+                 'Dependents': 'category'},
+    'phone': {'customerID': str, 'MultipleLines': 'category'},
+}
+
+# Categorías conocidas de las columnas categóricas de los CSV. clean_table cuenta los valores fuera de estas
+# categorías (unknown_categories) y después las fija (apply_categories) para que get_dummies(drop_first=True)
+# genere las mismas columnas en cada partición, aunque una partición no contenga todas las categorías.
+YES_NO = pd.CategoricalDtype(['No', 'Yes'])
+CONTRACT_TYPES = pd.CategoricalDtype(['Month-to-month', 'One year', 'Two year'])
+PAYMENT_METHODS = pd.CategoricalDtype(['Bank transfer (automatic)', 'Credit card (automatic)',
+                                       'Electronic check', 'Mailed check'])
+CSV_CATEGORIES = {
+    'contract': {'Type': CONTRACT_TYPES, 'PaperlessBilling': YES_NO, 'PaymentMethod': PAYMENT_METHODS},
+    'internet': {'InternetService': pd.CategoricalDtype(['DSL', 'Fiber optic']), 'OnlineSecurity': YES_NO,
+                 'OnlineBackup': YES_NO, 'DeviceProtection': YES_NO, 'TechSupport': YES_NO, 'StreamingTV': YES_NO,
+                 'StreamingMovies': YES_NO},
+    'personal': {'gender': pd.CategoricalDtype(['Female', 'Male']), 'Partner': YES_NO, 'Dependents': YES_NO},
+    'phone': {'MultipleLines': YES_NO},
+}
+
+# Tipos de datos del dataset limpio. Se aplican a cada tabla después de su limpieza y al resultado
+# de merge_datasets: categóricas para type/payment_method, bool/uint8 para las banderas,
+# int16 para las partes de las fechas y los días activos, float32 para los cargos.
+TELECOM_SCHEMA = {
+    'type': CONTRACT_TYPES, 'payment_method': PAYMENT_METHODS,
+    'monthly_charges': 'float32', 'total_charges': 'float32',
+    'begin_month': 'int16', 'begin_year': 'int16', 'end_month': 'int16', 'end_year': 'int16',
+    'active_days': 'int16', 'senior_citizen': 'uint8',
+    'is_active': bool, 'paperless_billing': bool, 'gender_male': bool, 'partner': bool, 'dependents': bool,
+    'internet_fiber_optic': bool, 'online_security': bool, 'online_backup': bool, 'device_protection': bool,
+    'tech_support': bool, 'streaming_tv': bool, 'streaming_movies': bool, 'multiple_lines': bool,
+}
 
 def bool_user_active(user_info):
     ''' Verifica si la persona sigue activa.
@@ -50,11 +95,11 @@ def dcolumn_to_bool(df, columns):
     ''' Convierte el tipo de dato de las columnas con 2 categorias a bool. 
     columns: Columnas a las cuales se les aplicara la transformación. '''
     df = pd.get_dummies(df, columns=columns, drop_first=True)
-    for col in df.columns:
-        pattern = r'_([A-Z].*)'     # Encuentra el patron que agrega get_dummies
-        replace = ''                # El reemplazo es una cadena vacia
-        clean_name = re.sub(pattern=pattern, repl=replace, string=col)
-        df = df.rename(columns={col:clean_name})
+    pattern = r'_([A-Z].*)'     # Encuentra el patron que agrega get_dummies
+    replace = ''                # El reemplazo es una cadena vacia
+    # Renombrar todas las columnas de una vez para no copiar el dataframe por cada columna
+    clean_names = {col: re.sub(pattern=pattern, repl=replace, string=col) for col in df.columns}
+    df = df.rename(columns=clean_names)
     return df 
 
 def contract_cleaning(df_contract, total_charges='total_charges',
@@ -78,25 +123,73 @@ def contract_cleaning(df_contract, total_charges='total_charges',
     df_contract = split_dates(df_contract, end_date, 'end')
 
     # Crear una columna que diga si la persona esta activa o no, a partir de end_date
-    df_contract[is_active] = df_contract.apply(bool_user_active, axis=1)
+    # (equivalente vectorizado de bool_user_active)
+    df_contract[is_active] = df_contract[end_date].isna()
 
     # Convertir la columnas paperless_billing a tipo bool
     df_contract = dcolumn_to_bool(df_contract, [paperless_billing])
 
     # Reemplazar los valores ausentes de end_date por el vencimiento del contrato
-    df_contract[end_date_with_contract] = df_contract.apply(real_end_date, axis=1)
+    df_contract[end_date_with_contract] = real_end_date_vectorized(df_contract, end_date=end_date, begin_date=begin_date)
 
     # Separar la columna end_date_with_contract de df_contract en año, mes
     # Se hace de nuevo porque antes era para el análisis y ahora necesitamos eliminar los valores ausentes para el modelo.
     df_contract = split_dates(df_contract, 'end_date_with_contract', 'end')
 
     # Crear una columna con los días activo en contract
-    df_contract[active_days] = df_contract.apply(calculate_active_days, axis=1)
+    df_contract[active_days] = calculate_active_days_vectorized(df_contract, begin_date=begin_date,
+                                                                end_date_with_contract=end_date_with_contract)
 
     # Eliminar columnas innecesarias: being_date, end_date, end_date_with_contract
     df_contract.drop([begin_date, end_date, end_date_with_contract], axis=1, inplace=True)
     return df_contract
 
+def real_end_date_vectorized(df, last_year=2020, end_date='end_date', begin_date='begin_date', type_contract='type'):
+    ''' Versión vectorizada de real_end_date: calcula la columna completa con aritmética de fechas
+    sobre columnas en lugar de recorrer el dataframe fila por fila.
+    Para los usuarios sin fecha de terminación se usa el vencimiento de su contrato. '''
+    begin = df[begin_date]
+    end = df[end_date]
+    contract = df[type_contract]
+
+    # Contratos por años (calculate_end_date_by_year)
+    # Para los que empezaron en el año actual se suman los años a begin_date,
+    # para el resto se parte del primer día del mismo mes del año anterior.
+    # Nota: calculate_end_date_by_year evalúa `(año == last_year) & (add_n_years)` con & a nivel de bits,
+    # por lo que la primera rama solo aplica cuando add_n_years es impar. Se conserva el mismo resultado.
+    started_last_year = (begin.dt.year == last_year).to_numpy()
+    first_day_prev_year = pd.to_datetime(pd.DataFrame({'year': last_year - 1,
+                                                       'month': begin.dt.month,
+                                                       'day': 1}), errors='coerce')
+    by_year = {}
+    for n_years in (1, 2):
+        offset = pd.DateOffset(years=n_years)
+        by_year[n_years] = np.where(started_last_year & bool(True & n_years), begin + offset, first_day_prev_year + offset)
+
+    # Contrato mes a mes: febrero agrega un mes, enero vence en febrero
+    month_to_month = (contract == 'Month-to-month').to_numpy()
+    begin_month = begin.dt.month.to_numpy()
+    conditions = [end.notna().to_numpy(),
+                  month_to_month & (begin_month == 2),
+                  month_to_month & (begin_month == 1),
+                  (contract == 'One year').to_numpy()]
+    choices = [end.to_numpy(),
+               (begin + pd.DateOffset(months=1)).to_numpy(),
+               np.full(len(df), np.datetime64('2020-02-01', 'ns')),
+               by_year[1]]
+    real_end = np.select(conditions, choices, default=by_year[2])
+    return pd.Series(real_end, index=df.index, dtype='datetime64[ns]')
+
+def calculate_active_days_vectorized(df, begin_date='begin_date', end_date_with_contract='end_date_with_contract',
+                                     end_point='2020-01-01'):
+    ''' Versión vectorizada de calculate_active_days: días activos de cada usuario, limitados
+    por el último día registrado de cancelación/terminación de contrato. '''
+    end_active_day = df[end_date_with_contract]
+    end_point = pd.to_datetime(end_point)
+    # Limitar la fecha al último día registrado
+    end_active_day = end_active_day.mask(end_active_day > end_point, end_point)
+    return (end_active_day - df[begin_date]).dt.days
+
 def personal_cleaning(df_personal):
         
     # Cambiar las columnas gender, partner y dependents por bool. 
@@ -118,34 +211,168 @@ def phone_cleaning(df_phone):
     df_phone = dcolumn_to_bool(df_phone, ['multiple_lines'])
     return df_phone
 
+def align_by_key(tables, on='customer_id'):
+    ''' Une tablas con una fila por cliente en una sola pasada, con el mismo resultado que los merges
+    how='outer' encadenados: on se factoriza una vez a claves enteras (en orden de primera aparición)
+    y cada columna se toma en el orden final con un solo take, sin copias intermedias del dataframe unido
+    (copy=False evita además la copia al consolidar las columnas en bloques).
+    on no debe tener nulos: factorize les asigna el código -1, que en el indexer apuntaría a la fila de otro cliente. '''
+    codes, uniques = pd.factorize(pd.concat([df[on] for df in tables], ignore_index=True))
+    if (codes < 0).any():
+        raise ValueError(f'align_by_key: {on} tiene {int((codes < 0).sum())} valores nulos')
+    columns = {on: uniques}
+    offset = 0
+    for df in tables:
+        table_codes = codes[offset:offset + len(df)]
+        offset += len(df)
+        # Fila de cada cliente en la tabla (-1 si no aparece, esos valores quedan ausentes como en el merge)
+        indexer = np.full(len(uniques), -1, dtype=np.intp)
+        indexer[table_codes] = np.arange(len(df))
+        for col in df.columns.drop(on):
+            values = df[col].array if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].to_numpy()
+            columns[col] = pd.api.extensions.take(values, indexer, allow_fill=True)
+    return pd.DataFrame(columns, copy=False)
+
 def merge_datasets(df_contract, df_internet, df_personal, df_phone, on='customer_id', how='outer'):
     # Juntar los datasets
-    df_merged = pd.merge(df_contract, df_personal, on=on, how=how)
-    df_merged = pd.merge(df_merged, df_internet, on=on, how=how)
-    df_merged = pd.merge(df_merged, df_phone, on=on, how=how)
+    tables = [df_contract, df_personal, df_internet, df_phone]
+    if how == 'outer' and all(df[on].is_unique and df[on].notna().all() for df in tables):
+        # Un cliente por fila en cada tabla y sin claves nulas: se unen en una sola pasada por clave entera
+        # (con claves nulas se usa el merge, que no las mezcla con las de otros clientes)
+        df_merged = align_by_key(tables, on)
+    else:
+        df_merged = pd.merge(df_contract, df_personal, on=on, how=how)
+        df_merged = pd.merge(df_merged, df_internet, on=on, how=how)
+        df_merged = pd.merge(df_merged, df_phone, on=on, how=how)
 
     # Rellenar valores ausentes provocados por el merge. Se rellenaran con false.
-    df_merged.fillna(False, inplace=True)
+    # Las columnas categóricas no admiten False como valor, por lo que se dejan sin rellenar.
+    fill_values = {col: False for col in df_merged.columns if not isinstance(df_merged[col].dtype, pd.CategoricalDtype)}
+    df_merged.fillna(fill_values, inplace=True)
 
     return df_merged
 
-def read_csv_files(files_path:str, contract_name:str='contract.csv', internet_name:str='internet.csv', personal_name:str='personal.csv', phone_name:str='phone.csv'):
+@profiled()
+def read_csv_files(files_path:str, contract_name:str='contract.csv', internet_name:str='internet.csv', personal_name:str='personal.csv', phone_name:str='phone.csv',
+                   dtypes=CSV_DTYPES):
     '''
     Esta función permite leer los 4 archivos CSV en el siguiente orden: contrat, internet, personal y phone.
     files_path: Es el string de la carpeta que contienen los csv,
     contract_name: nombre del archivo del contrato por ejemplo 'contract.csv',
     internet_name: nombre del archivo de internet por ejemplo 'internet.csv',
     personal_name: nombre del archivo del personal por ejemplo 'personal.csv',
-    phone_name: nombre del archivo de telefonia por ejemplo 'phone.csv'.
+    phone_name: nombre del archivo de telefonia por ejemplo 'phone.csv',
+    dtypes: tipos de datos por archivo (CSV_DTYPES); None deja que pandas los infiera.
 
     '''
-
-    df_contract = pd.read_csv(files_path+contract_name)
-    df_internet = pd.read_csv(files_path+internet_name)
-    df_personal = pd.read_csv(files_path+personal_name)
-    df_phone = pd.read_csv(files_path+phone_name)
+    dtypes = dtypes or {}
+    df_contract = pd.read_csv(files_path+contract_name, dtype=dtypes.get('contract'))
+    df_internet = pd.read_csv(files_path+internet_name, dtype=dtypes.get('internet'))
+    df_personal = pd.read_csv(files_path+personal_name, dtype=dtypes.get('personal'))
+    df_phone = pd.read_csv(files_path+phone_name, dtype=dtypes.get('phone'))
     return df_contract, df_internet, df_personal, df_phone
 
+def unknown_categories(source, df):
+    ''' Valores de las columnas categóricas de la tabla source (con los nombres de los CSV) que no están en
+    CSV_CATEGORIES y que apply_categories convertiría en nulos. Regresa {columna: {valor: filas}}. '''
+    unknown = {}
+    for col, dtype in CSV_CATEGORIES[source].items():
+        if col not in df.columns:
+            continue
+        # Se comparan solo los valores distintos (las categorías del archivo si la columna ya es categórica)
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes, uniques = df[col].cat.codes.to_numpy(), df[col].cat.categories
+        else:
+            codes, uniques = pd.factorize(df[col])
+        is_unknown = ~pd.Index(uniques).isin(dtype.categories)
+        if is_unknown.any():
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            found = {str(value): int(n) for value, n, flag in zip(uniques, counts, is_unknown) if flag and n}
+            if found:
+                unknown[col] = found
+    return unknown
+
+def apply_categories(source, df):
+    ''' Fija las categorías conocidas (CSV_CATEGORIES) en las columnas categóricas de la tabla source.
+    Los valores desconocidos quedan como nulos; se cuentan antes con unknown_categories. '''
+    dtypes = {col: dtype for col, dtype in CSV_CATEGORIES[source].items() if col in df.columns}
+    return df.astype(dtypes)
+
+def apply_schema(df, schema=TELECOM_SCHEMA):
+    ''' Convierte las columnas del dataframe que aparecen en schema a su tipo de dato.
+    Las columnas que no estan en el dataframe se ignoran. '''
+    dtypes = {col: dtype for col, dtype in schema.items() if col in df.columns}
+    return df.astype(dtypes)
+
+def memory_report(stages):
+    ''' Reporte de memoria por etapa.
+    stages: diccionario nombre de la etapa -> dataframe (o lista de dataframes).
+    Regresa un dataframe con los bytes (incluyendo el contenido de las cadenas) de cada etapa. '''
+    rows = []
+    for stage, frames in stages.items():
+        frames = frames if isinstance(frames, (list, tuple)) else [frames]
+        rows.append({'stage': stage, 'rows': sum(len(df) for df in frames),
+                     'bytes': int(sum(df.memory_usage(index=True, deep=True).sum() for df in frames))})
+    return pd.DataFrame(rows).set_index('stage')
+
+def hash_partition(customer_ids, n_partitions):
+    ''' Asigna cada customer_id a una partición a partir de su hash.
+    El mismo cliente cae en la misma partición en los 4 archivos. '''
+    hashes = pd.util.hash_pandas_object(customer_ids, index=False).to_numpy()
+    return hashes % n_partitions
+
+def read_csv_partitions(files_path:str, n_partitions:int=16, chunksize:int=100000,
+                        contract_name:str='contract.csv', internet_name:str='internet.csv',
+                        personal_name:str='personal.csv', phone_name:str='phone.csv',
+                        customer_id:str='customerID'):
+    '''
+    Versión por partes de read_csv_files. Lee los 4 archivos CSV por bloques (chunksize filas) con tipos
+    explícitos, reparte las filas en n_partitions según el hash de customer_id y las guarda temporalmente
+    en disco. Después entrega, una partición a la vez, la tupla (contract, internet, personal, phone)
+    con los clientes de esa partición, de modo que la memoria depende del tamaño de la partición
+    y no del total de clientes.
+    El índice de cada dataframe conserva el número de fila del archivo original.
+    '''
+    with tempfile.TemporaryDirectory() as spill_dir:
+        sources = spill_csv_partitions(files_path, spill_dir, n_partitions, chunksize, contract_name, internet_name,
+                                       personal_name, phone_name, customer_id)
+
+        # Entregar las particiones una a una
+        for partition in range(n_partitions):
+            yield tuple(load_partition(spill_dir, source, partition) for source in sources)
+
+def spill_csv_partitions(files_path:str, spill_dir:str, n_partitions:int=16, chunksize:int=100000,
+                         contract_name:str='contract.csv', internet_name:str='internet.csv',
+                         personal_name:str='personal.csv', phone_name:str='phone.csv', customer_id:str='customerID'):
+    ''' Lee los 4 archivos por bloques y guarda en spill_dir las filas de cada partición (hash de customer_id).
+    Regresa los nombres de las tablas, en el orden en que load_partition las espera. '''
+    sources = {'contract': contract_name, 'internet': internet_name,
+               'personal': personal_name, 'phone': phone_name}
+
+    # Repartir cada archivo en particiones guardadas en disco
+    for source, file_name in sources.items():
+        for chunk in pd.read_csv(files_path+file_name, dtype=CSV_DTYPES[source], chunksize=chunksize):
+            partitions = hash_partition(chunk[customer_id], n_partitions)
+            for partition, chunk_partition in chunk.groupby(partitions, sort=False):
+                with open(os.path.join(spill_dir, f'{source}_{partition}.pkl'), 'ab') as spill_file:
+                    pickle.dump(chunk_partition, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return list(sources)
+
+def load_partition(spill_dir, source, partition):
+    ''' Lee todos los bloques guardados de una partición y los une en un solo dataframe.
+    Si la partición no tiene filas de ese archivo, regresa un dataframe vacío con las columnas esperadas. '''
+    spill_path = os.path.join(spill_dir, f'{source}_{partition}.pkl')
+    if not os.path.exists(spill_path):
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in CSV_DTYPES[source].items()})
+    chunks = []
+    with open(spill_path, 'rb') as spill_file:
+        while True:
+            try:
+                chunks.append(pickle.load(spill_file))
+            except EOFError:
+                break
+    return pd.concat(chunks)
+
 def real_end_date(user_info):
     ''' Para las observaciones con valores NaT, se reemplazara la fecha de terminación
     por la fecha en la que acaba su contrato. 
@@ -185,34 +412,77 @@ def split_target_features(df, target_col):
     target = df[target_col]
     return features, target
 
-def MinMaxScaler_dataset(features_train_encoded, features_test_encoded, columns_to_scale):
+def MinMaxScaler_dataset(features_train_encoded, features_test_encoded, columns_to_scale, return_scaler=False):
+    from sklearn.preprocessing import MinMaxScaler
     scaler = MinMaxScaler()
     features_train_encoded_scaled = features_train_encoded.copy()
     features_test_encoded_scaled = features_test_encoded.copy()
     features_train_encoded_scaled[columns_to_scale] = scaler.fit_transform(features_train_encoded[columns_to_scale])
     features_test_encoded_scaled[columns_to_scale] = scaler.transform(features_test_encoded[columns_to_scale])
+    if return_scaler:
+        return features_train_encoded_scaled, features_test_encoded_scaled, scaler
     return features_train_encoded_scaled, features_test_encoded_scaled
 
-def LabelEncoder_dataset(features_train, features_test, features_train_encoded, features_test_encoded, lb_cols):
+def LabelEncoder_dataset(features_train, features_test, features_train_encoded, features_test_encoded, lb_cols, return_encoder=False):
+    from sklearn.preprocessing import LabelEncoder
     label_encoder = LabelEncoder()
     features_train_encoded[lb_cols] = label_encoder.fit_transform(features_train[lb_cols])
     features_test_encoded[lb_cols] = label_encoder.transform(features_test[lb_cols])
+    if return_encoder:
+        return features_train_encoded, features_test_encoded, label_encoder
     return features_train_encoded, features_test_encoded
 
-def Boruta_alg(features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train):
-    # Se utilizara un modelo de bosque aletorio como base para el algoritmo Boruta
-
-    # Inicializar el modelo base de bosque aleatorio
-    rf = RandomForestClassifier(random_state=54321)
-
-    # Inicializar Boruta
-    boruta_selector = BorutaPy(estimator=rf, n_estimators='auto', verbose=2)
-
-    # Ajustar Boruta al conjunto de datos
-    boruta_selector.fit(features_train_encoded.values, target_train)
-
-    # Seleccionar las características mas relevantes de boruta
-    boruta_features = features_train_encoded.columns[boruta_selector.support_]
+def boruta_estimator(estimator='random_forest', n_jobs=-1, random_state=54321, class_weight=None):
+    ''' Modelo base para Boruta.
+    'random_forest': bosque aleatorio (el modelo original) usando todos los núcleos.
+    'lightgbm': LightGBM, bastante más rápido en conjuntos grandes. Se fija max_depth porque BorutaPy
+    lo usa para calcular el número de árboles con n_estimators='auto'.
+    class_weight: 'balanced' para balancear las clases con pesos en lugar de sobremuestreo. '''
+    if estimator == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(random_state=random_state, n_jobs=n_jobs, class_weight=class_weight)
+    if estimator == 'lightgbm':
+        import lightgbm as lgb
+        return lgb.LGBMClassifier(max_depth=5, num_leaves=31, importance_type='gain', n_jobs=n_jobs,
+                                  random_state=random_state, class_weight=class_weight, verbose=-1)
+    raise ValueError(f'Modelo base no soportado para Boruta: {estimator}')
+
+@profiled()
+def Boruta_alg(features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled, target_train,
+               estimator='random_forest', n_jobs=-1, max_rows=None, cache_dir='./files/cache/', verbose=0, random_state=54321,
+               class_weight=None):
+    ''' Selecciona las características relevantes con Boruta y filtra los 4 conjuntos.
+    estimator: modelo base ('random_forest' o 'lightgbm').
+    n_jobs: núcleos del modelo base (-1 usa todos).
+    class_weight: pesos de clase del modelo base ('balanced' cuando no se usa sobremuestreo).
+    max_rows: si se indica, Boruta se ajusta sobre una submuestra estratificada de ese tamaño.
+    cache_dir: carpeta donde se guardan las columnas seleccionadas, con una llave calculada a partir de
+    los datos de entrenamiento y de la configuración; solo se vuelve a ejecutar Boruta si cambian. None desactiva la caché. '''
+    params = {'estimator': estimator, 'max_rows': max_rows, 'random_state': random_state, 'class_weight': class_weight}
+    key = frame_fingerprint(features_train_encoded, target_train, params) if cache_dir is not None else None
+    boruta_features = load_cached_json(cache_dir, 'boruta', key) if key is not None else None
+
+    if boruta_features is None:
+        from boruta import BorutaPy
+        from sklearn.model_selection import train_test_split
+        features_boruta, target_boruta = features_train_encoded, target_train
+        # Submuestra estratificada de filas para las rondas de características sombra
+        if max_rows is not None and len(features_train_encoded) > max_rows:
+            features_boruta, _, target_boruta, _ = train_test_split(
+                features_train_encoded, target_train, train_size=max_rows, stratify=target_train, random_state=random_state
+            )
+
+        # Inicializar Boruta con el modelo base
+        boruta_selector = BorutaPy(estimator=boruta_estimator(estimator, n_jobs, random_state, class_weight), n_estimators='auto',
+                                   verbose=verbose, random_state=random_state)
+
+        # Ajustar Boruta al conjunto de datos
+        boruta_selector.fit(features_boruta.values, np.asarray(target_boruta))
+
+        # Seleccionar las características mas relevantes de boruta
+        boruta_features = list(features_train_encoded.columns[boruta_selector.support_])
+        if key is not None:
+            save_cached_json(boruta_features, cache_dir, 'boruta', key)
 
     # Se va a filtrar el dataset con las columnas obtenidas por Boruta
     features_train_encoded = features_train_encoded[boruta_features]
@@ -222,90 +492,134 @@ def Boruta_alg(features_train_encoded, features_test_encoded, features_train_enc
 
     return features_train_encoded, features_test_encoded, features_train_encoded_scaled, features_test_encoded_scaled
 
-def evaluate_model(model, train_features, train_target, test_features, test_target, proba=True):
-    
-    eval_stats = {}
-    
-    fig, axs = plt.subplots(1, 3, figsize=(20, 6)) 
-    
+def threshold_curves(target, proba):
+    ''' Calcula en una sola pasada sobre las probabilidades ordenadas los conteos acumulados de
+    verdaderos y falsos positivos para cada umbral distinto, y a partir de ellos precision, recall,
+    F1, FPR y TPR en todos los umbrales. '''
+    target = np.asarray(target, dtype=bool)
+    proba = np.asarray(proba, dtype=float)
+    order = np.argsort(proba, kind='mergesort')[::-1]
+    scores = proba[order]
+    cum_hits = np.cumsum(target[order])
+
+    # Último índice de cada probabilidad distinta (umbral) en el orden descendente
+    distinct = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tp = cum_hits[distinct]
+    fp = distinct + 1 - tp
+    positives, negatives = cum_hits[-1], len(scores) - cum_hits[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = tp / (tp + fp)
+        recall = tp / positives if positives else np.zeros(len(tp))
+        f1 = np.where(tp > 0, 2 * tp / (2 * tp + fp + (positives - tp)), 0.0)
+        fpr = fp / negatives if negatives else np.zeros(len(fp))
+    return {'thresholds': scores[distinct], 'tp': tp, 'fp': fp, 'precision': precision, 'recall': recall,
+            'f1': f1, 'fpr': fpr, 'tpr': recall, 'positives': positives, 'n': len(scores),
+            'sorted_scores': scores, 'cum_hits': cum_hits}
+
+def counts_at_threshold(curves, threshold, inclusive=True):
+    ''' Verdaderos y falsos positivos al predecir positivo cuando proba >= threshold (o > si inclusive=False).
+    Acepta un arreglo de umbrales. '''
+    threshold = np.asarray(threshold, dtype=float)
+    # Número de probabilidades por encima del umbral en el arreglo descendente
+    k = np.searchsorted(-curves['sorted_scores'], -threshold, side='right' if inclusive else 'left')
+    tp = np.where(k > 0, curves['cum_hits'][np.maximum(k - 1, 0)], 0)
+    return tp, k - tp
+
+def metrics_from_curves(curves, f1_thresholds=np.arange(0, 1.01, 0.05), decision_threshold=0.5):
+    ''' ROC-AUC, APS, F1 por umbral y Accuracy/F1 de la predicción (proba > decision_threshold, como predict).
+    Si el objetivo tiene una sola clase el ROC-AUC no está definido y es NaN (el APS también, si no hay positivos). '''
+    positives, n = curves['positives'], curves['n']
+    negatives = n - positives
+    roc_auc = np.trapz(np.r_[0, curves['tpr']], np.r_[0, curves['fpr']]) if positives and negatives else np.nan
+    aps = np.sum(np.diff(np.r_[0, curves['recall']]) * curves['precision']) if positives else np.nan
+
+    tp, fp = counts_at_threshold(curves, f1_thresholds)
+    f1_scores = np.where(tp > 0, 2 * tp / np.maximum(2 * tp + fp + (positives - tp), 1), 0.0)
+
+    tp, fp = counts_at_threshold(curves, decision_threshold, inclusive=False)
+    tn = negatives - fp
+    accuracy = (tp + tn) / n
+    f1 = 2 * tp / (2 * tp + fp + (positives - tp)) if tp > 0 else 0.0
+    return {'Accuracy': float(accuracy), 'F1': float(f1), 'APS': float(aps), 'ROC AUC': float(roc_auc),
+            'f1_thresholds': f1_thresholds, 'f1_scores': f1_scores}
+
+def evaluate_model(model, train_features, train_target, test_features, test_target, proba=True, plot=False):
+    ''' Evalua el modelo en entrenamiento y prueba para Exactitud, F1, APS y ROC-AUC.
+    Se calcula un solo vector de probabilidades por conjunto y todas las métricas salen de él
+    (la predicción equivale a proba > 0.5, como en predict).
+    Regresa un diccionario con 'metrics' (dataframe métrica x conjunto) y, por conjunto, las curvas y métricas.
+    plot: si es True dibuja la figura de F1/ROC/PRC (matplotlib solo se importa en ese caso). '''
+    result = {}
     for type, features, target in (('train', train_features, train_target), ('test', test_features, test_target)):
-        
-        eval_stats[type] = {}
-    
-        pred_target = model.predict(features)
         pred_proba = model.predict_proba(features)[:, 1]
-
-        # F1
-        f1_thresholds = np.arange(0, 1.01, 0.05)
-        f1_scores = [f1_score(target, pred_proba>=threshold) for threshold in f1_thresholds]
-        
-        # ROC-AUC
-        fpr, tpr, roc_thresholds = roc_curve(target, pred_proba)
-        roc_auc = roc_auc_score(target, pred_proba)    
-        eval_stats[type]['ROC AUC'] = roc_auc
-
-        # PRC
-        precision, recall, pr_thresholds = precision_recall_curve(target, pred_proba)
-        aps = average_precision_score(target, pred_proba)
-        eval_stats[type]['APS'] = aps
-        
-        if type == 'train':
-            color = 'blue'
-        else:
-            color = 'green'
+        curves = threshold_curves(target, pred_proba)
+        result[type] = dict(metrics_from_curves(curves), curves=curves)
+
+    result['metrics'] = pd.DataFrame({type: {metric: result[type][metric] for metric in ('Accuracy', 'F1', 'APS', 'ROC AUC')}
+                                      for type in ('train', 'test')})
+    if plot:
+        result['figure'] = plot_evaluation(result)
+    return result
+
+def plot_evaluation(result):
+    ''' Dibuja las curvas de F1, ROC y PRC de entrenamiento y prueba a partir del resultado de evaluate_model. '''
+    import matplotlib.pyplot as plt
+    
+    fig, axs = plt.subplots(1, 3, figsize=(20, 6))
+    for type, color in (('train', 'blue'), ('test', 'green')):
+        stats = result[type]
+        curves = stats['curves']
+        # Agregar el punto inicial (umbral por encima de todas las probabilidades)
+        fpr, tpr = np.r_[0, curves['fpr']], np.r_[0, curves['tpr']]
+        roc_thresholds = np.r_[np.inf, curves['thresholds']]
+        recall, precision, pr_thresholds = curves['recall'], curves['precision'], curves['thresholds']
+        f1_thresholds, f1_scores = stats['f1_thresholds'], stats['f1_scores']
 
         # Valor F1
         ax = axs[0]
         max_f1_score_idx = np.argmax(f1_scores)
         ax.plot(f1_thresholds, f1_scores, color=color, label=f'{type}, max={f1_scores[max_f1_score_idx]:.2f} @ {f1_thresholds[max_f1_score_idx]:.2f}')
-        # establecer cruces para algunos umbrales        
+        # establecer cruces para algunos umbrales
         for threshold in (0.2, 0.4, 0.5, 0.6, 0.8):
             closest_value_idx = np.argmin(np.abs(f1_thresholds-threshold))
             marker_color = 'orange' if threshold != 0.5 else 'red'
             ax.plot(f1_thresholds[closest_value_idx], f1_scores[closest_value_idx], color=marker_color, marker='X', markersize=7)
-        ax.set_xlim([-0.02, 1.02])    
+        ax.set_xlim([-0.02, 1.02])
         ax.set_ylim([-0.02, 1.02])
         ax.set_xlabel('threshold')
         ax.set_ylabel('F1')
         ax.legend(loc='lower center')
-        ax.set_title(f'Valor F1') 
+        ax.set_title(f'Valor F1')
 
         # ROC
-        ax = axs[1]    
-        ax.plot(fpr, tpr, color=color, label=f'{type}, ROC AUC={roc_auc:.2f}')
-        # establecer cruces para algunos umbrales        
+        ax = axs[1]
+        ax.plot(fpr, tpr, color=color, label=f'{type}, ROC AUC={stats["ROC AUC"]:.2f}')
+        # establecer cruces para algunos umbrales
         for threshold in (0.2, 0.4, 0.5, 0.6, 0.8):
             closest_value_idx = np.argmin(np.abs(roc_thresholds-threshold))
-            marker_color = 'orange' if threshold != 0.5 else 'red'            
+            marker_color = 'orange' if threshold != 0.5 else 'red'
             ax.plot(fpr[closest_value_idx], tpr[closest_value_idx], color=marker_color, marker='X', markersize=7)
         ax.plot([0, 1], [0, 1], color='grey', linestyle='--')
-        ax.set_xlim([-0.02, 1.02])    
+        ax.set_xlim([-0.02, 1.02])
         ax.set_ylim([-0.02, 1.02])
         ax.set_xlabel('FPR')
         ax.set_ylabel('TPR')
-        ax.legend(loc='lower center')        
+        ax.legend(loc='lower center')
         ax.set_title(f'Curva ROC')
-        
+
         # PRC
         ax = axs[2]
-        ax.plot(recall, precision, color=color, label=f'{type}, AP={aps:.2f}')
-        # establecer cruces para algunos umbrales        
+        ax.plot(recall, precision, color=color, label=f'{type}, AP={stats["APS"]:.2f}')
+        # establecer cruces para algunos umbrales
         for threshold in (0.2, 0.4, 0.5, 0.6, 0.8):
             closest_value_idx = np.argmin(np.abs(pr_thresholds-threshold))
             marker_color = 'orange' if threshold != 0.5 else 'red'
             ax.plot(recall[closest_value_idx], precision[closest_value_idx], color=marker_color, marker='X', markersize=7)
-        ax.set_xlim([-0.02, 1.02])    
+        ax.set_xlim([-0.02, 1.02])
         ax.set_ylim([-0.02, 1.02])
         ax.set_xlabel('recall')
         ax.set_ylabel('precision')
         ax.legend(loc='lower center')
-        ax.set_title(f'PRC')        
-
-        eval_stats[type]['Accuracy'] = accuracy_score(target, pred_target)
-        eval_stats[type]['F1'] = f1_score(target, pred_target)
-    
-    df_eval_stats = pd.DataFrame(eval_stats)
-    df_eval_stats = df_eval_stats.round(2)
-    df_eval_stats = df_eval_stats.reindex(index=('Accuracy', 'F1', 'APS', 'ROC AUC'))
-    
-    print(df_eval_stats)
\ No newline at end of file
+        ax.set_title(f'PRC')
+    return fig
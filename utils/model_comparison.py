@@ -0,0 +1,205 @@
+''' Intervalos de confianza y comparación pareada de modelos para ROC-AUC y APS.
+
+- DeLong (delong_auc): ROC-AUC de varios modelos evaluados sobre el mismo objetivo y su matriz de covarianza,
+  con el algoritmo de rangos medios de Sun y Xu (una ordenación por modelo, sin remuestrear). Da intervalos
+  normales para cada modelo y la prueba z de la diferencia entre dos modelos.
+- Bootstrap (bootstrap_metrics): réplicas de ROC-AUC y APS de todos los modelos con las mismas filas
+  remuestreadas, para intervalos por percentiles y diferencias pareadas. Cada modelo se ordena una sola vez
+  (sort_scores); una réplica es el vector de conteos de cuántas veces sale cada fila, que se reordena con el
+  orden del modelo y se acumula, así que ninguna réplica vuelve a ordenar ni a buscar empates.
+  Las réplicas se calculan por bloques (matrices réplicas x filas) repartidos entre procesos; cada bloque
+  tiene su propia semilla, así que el resultado no depende del número de procesos.
+Uso (desde la raíz del repositorio, después de entrenar los modelos):
+    python -m excecution.pipeline compare --n-boot 2000 --workers 0 '''
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from utils.feature_matrix import write_array
+
+METRICS = ('roc_auc', 'aps')
+SORTED_KEYS = ('order_pos', 'order_neg', 'neg_below', 'neg_below_or_tied', 'pos_below')
+# Elementos (réplicas x filas) por bloque de bootstrap: acota la memoria de cada proceso
+BLOCK_ELEMENTS = 2**22
+
+def midranks(values):
+    ''' Rangos (desde 1) con empates promediados. '''
+    order = np.argsort(values, kind='mergesort')
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+    ranks = np.empty(len(values))
+    ranks[order] = ((starts + ends - 1) / 2 + 1)[group]
+    return ranks
+
+def delong_auc(target, probas):
+    ''' ROC-AUC de cada fila de probas (modelos x filas) y su matriz de covarianza (DeLong, Sun y Xu 2014). '''
+    target = np.asarray(target, dtype=bool)
+    probas = np.atleast_2d(np.asarray(probas, dtype=float))
+    positives, negatives = probas[:, target], probas[:, ~target]
+    n_pos, n_neg = positives.shape[1], negatives.shape[1]
+
+    aucs, v_pos, v_neg = [], [], []
+    for pos, neg in zip(positives, negatives):
+        rank_pos, rank_neg = midranks(pos), midranks(neg)
+        rank_all = midranks(np.r_[pos, neg])
+        aucs.append((rank_all[:n_pos].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+        # Componentes estructurales: fracción de negativos debajo de cada positivo y de positivos arriba de cada negativo
+        v_pos.append((rank_all[:n_pos] - rank_pos) / n_neg)
+        v_neg.append(1 - (rank_all[n_pos:] - rank_neg) / n_pos)
+    covariance = np.atleast_2d(np.cov(v_pos)) / n_pos + np.atleast_2d(np.cov(v_neg)) / n_neg
+    return np.array(aucs), covariance
+
+def sort_scores(target, probas):
+    ''' Prepara cada modelo para las réplicas: filas positivas y negativas en orden ascendente de probabilidad y,
+    para cada positivo, cuántos negativos quedan por debajo (estrictamente y con empates) y cuántos positivos
+    por debajo, posiciones que no cambian entre réplicas. '''
+    target = np.asarray(target, dtype=bool)
+    rows_pos, rows_neg = np.flatnonzero(target), np.flatnonzero(~target)
+    sorted_models = []
+    for proba in np.atleast_2d(np.asarray(probas, dtype=float)):
+        order_pos = rows_pos[np.argsort(proba[rows_pos], kind='mergesort')]
+        order_neg = rows_neg[np.argsort(proba[rows_neg], kind='mergesort')]
+        scores_pos, scores_neg = proba[order_pos], proba[order_neg]
+        sorted_models.append({
+            'order_pos': order_pos, 'order_neg': order_neg,
+            'neg_below': np.searchsorted(scores_neg, scores_pos, side='left'),
+            'neg_below_or_tied': np.searchsorted(scores_neg, scores_pos, side='right'),
+            'pos_below': np.searchsorted(scores_pos, scores_pos, side='left'),
+        })
+    return sorted_models
+
+def prefix_sums(counts):
+    ''' Sumas acumuladas por fila con un cero al inicio (columna j: suma de las primeras j columnas). '''
+    sums = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=sums[:, 1:])
+    return sums
+
+def weighted_metrics(counts, model):
+    ''' ROC-AUC y APS de cada fila de counts (réplicas x filas, conteos en el orden original de las filas):
+    cada fila pesa lo que indica su conteo y los empates se tratan como en roc_auc_score/average_precision_score. '''
+    counts_pos = counts[:, model['order_pos']]
+    neg_sums = prefix_sums(counts[:, model['order_neg']])
+    pos_sums = prefix_sums(counts_pos)
+    n_pos, n_neg = pos_sums[:, -1], neg_sums[:, -1]
+
+    # ROC-AUC: negativos por debajo de cada positivo más la mitad de los empatados, en enteros exactos
+    neg_below = neg_sums[:, model['neg_below']]
+    pairs = (counts_pos * (neg_below + neg_sums[:, model['neg_below_or_tied']])).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roc_auc = pairs / (2 * n_pos * n_neg)
+        # APS: precisión en el umbral de cada positivo (filas con probabilidad >= la suya) pesada por su conteo
+        true_positives = n_pos[:, None] - pos_sums[:, model['pos_below']]
+        false_positives = n_neg[:, None] - neg_below
+        aps = (counts_pos * (true_positives / np.maximum(true_positives + false_positives, 1))).sum(axis=1) / n_pos
+    return roc_auc, aps
+
+def bootstrap_block(sorted_models, n_rows, n_replicates, seed):
+    ''' n_replicates réplicas de todos los modelos con las mismas filas remuestreadas.
+    Regresa un diccionario métrica -> arreglo (réplicas x modelos). '''
+    rng = np.random.default_rng(seed)
+    # Conteos de cada fila por réplica (remuestreo con reemplazo de n_rows filas), en el orden original
+    draws = rng.integers(0, n_rows, size=(n_replicates, n_rows))
+    draws += np.arange(n_replicates)[:, None] * n_rows
+    counts = np.bincount(draws.ravel(), minlength=n_replicates * n_rows).reshape(n_replicates, n_rows)
+    del draws
+
+    result = {metric: np.empty((n_replicates, len(sorted_models))) for metric in METRICS}
+    for idx, model in enumerate(sorted_models):
+        result['roc_auc'][:, idx], result['aps'][:, idx] = weighted_metrics(counts, model)
+    return result
+
+def _bootstrap_block_from_dir(data_dir, n_models, n_rows, n_replicates, seed):
+    ''' bootstrap_block dentro de un proceso del pool: los modelos ordenados se abren mapeados en memoria. '''
+    sorted_models = [{key: np.load(os.path.join(data_dir, f'{key}_{idx}.npy'), mmap_mode='r')
+                      for key in SORTED_KEYS} for idx in range(n_models)]
+    return bootstrap_block(sorted_models, n_rows, n_replicates, seed)
+
+def bootstrap_metrics(target, probas, n_boot=2000, seed=54321, n_workers=1, block_elements=BLOCK_ELEMENTS):
+    ''' Réplicas bootstrap pareadas de ROC-AUC y APS de cada fila de probas (modelos x filas).
+    n_workers: procesos entre los que se reparten los bloques (None para todos los núcleos).
+    Regresa un diccionario métrica -> arreglo (n_boot x modelos). '''
+    probas = np.atleast_2d(np.asarray(probas, dtype=float))
+    n_models, n_rows = probas.shape
+    sorted_models = sort_scores(target, probas)
+
+    block_size = max(1, min(n_boot, block_elements // n_rows))
+    sizes = [min(block_size, n_boot - start) for start in range(0, n_boot, block_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(sizes) == 1:
+        blocks = [bootstrap_block(sorted_models, n_rows, size, block_seed) for size, block_seed in zip(sizes, seeds)]
+    else:
+        # Los modelos ordenados se escriben una vez y cada proceso los abre mapeados en memoria
+        with tempfile.TemporaryDirectory(prefix='bootstrap_') as data_dir:
+            for idx, model in enumerate(sorted_models):
+                for key, values in model.items():
+                    write_array(os.path.join(data_dir, f'{key}_{idx}.npy'), values)
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(sizes))) as executor:
+                blocks = list(executor.map(_bootstrap_block_from_dir, [data_dir] * len(sizes), [n_models] * len(sizes),
+                                           [n_rows] * len(sizes), sizes, seeds))
+    return {metric: np.concatenate([block[metric] for block in blocks]) for metric in METRICS}
+
+def point_metrics(target, probas):
+    ''' ROC-AUC y APS de cada modelo sobre todas las filas (las mismas fórmulas que las réplicas). '''
+    probas = np.atleast_2d(np.asarray(probas, dtype=float))
+    result = {metric: np.empty(len(probas)) for metric in METRICS}
+    ones = np.ones((1, probas.shape[1]), dtype=np.int64)
+    for idx, model in enumerate(sort_scores(target, probas)):
+        roc_auc, aps = weighted_metrics(ones, model)
+        result['roc_auc'][idx], result['aps'][idx] = roc_auc[0], aps[0]
+    return result
+
+def compare_models(target, probas, method='bootstrap', n_boot=2000, alpha=0.05, seed=54321, n_workers=1):
+    ''' Intervalos de confianza de cada modelo y comparación de todos los pares de modelos.
+    probas: diccionario modelo -> probabilidades de la clase positiva sobre las mismas filas que target.
+    method: 'bootstrap' (ROC-AUC y APS, intervalos por percentiles) o 'delong' (solo ROC-AUC, sin remuestreo).
+    Regresa (intervals, comparisons):
+    - intervals: modelo, métrica, valor y límites del intervalo de nivel 1 - alpha;
+    - comparisons: par de modelos, métrica, diferencia (a - b), su intervalo y el valor p de diferencia = 0. '''
+    names = list(probas)
+    values = np.vstack([np.asarray(probas[name], dtype=float) for name in names])
+    estimates = point_metrics(target, values)
+    intervals, comparisons = [], []
+
+    if method == 'delong':
+        aucs, covariance = delong_auc(target, values)
+        z = norm.ppf(1 - alpha / 2)
+        for idx, name in enumerate(names):
+            se = np.sqrt(covariance[idx, idx])
+            intervals.append({'model': name, 'metric': 'roc_auc', 'estimate': aucs[idx],
+                              'low': max(aucs[idx] - z * se, 0.0), 'high': min(aucs[idx] + z * se, 1.0)})
+        for a, b in combinations(range(len(names)), 2):
+            diff = aucs[a] - aucs[b]
+            se = np.sqrt(max(covariance[a, a] + covariance[b, b] - 2 * covariance[a, b], 0.0))
+            if se > 0:
+                p_value = 2 * norm.sf(abs(diff) / se)
+            else:
+                p_value = 1.0 if diff == 0 else 0.0
+            comparisons.append({'model_a': names[a], 'model_b': names[b], 'metric': 'roc_auc', 'diff': diff,
+                                'low': diff - z * se, 'high': diff + z * se, 'p_value': p_value})
+    elif method == 'bootstrap':
+        replicates = bootstrap_metrics(target, values, n_boot, seed, n_workers)
+        quantiles = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        for metric in METRICS:
+            low, high = np.nanpercentile(replicates[metric], quantiles, axis=0)
+            for idx, name in enumerate(names):
+                intervals.append({'model': name, 'metric': metric, 'estimate': estimates[metric][idx],
+                                  'low': low[idx], 'high': high[idx]})
+            for a, b in combinations(range(len(names)), 2):
+                diff = estimates[metric][a] - estimates[metric][b]
+                diffs = replicates[metric][:, a] - replicates[metric][:, b]
+                diffs = diffs[~np.isnan(diffs)]
+                diff_low, diff_high = np.percentile(diffs, quantiles)
+                # Valor p con las diferencias centradas (distribución bajo diferencia = 0)
+                p_value = (np.sum(np.abs(diffs - diff) >= abs(diff)) + 1) / (len(diffs) + 1)
+                comparisons.append({'model_a': names[a], 'model_b': names[b], 'metric': metric, 'diff': diff,
+                                    'low': diff_low, 'high': diff_high, 'p_value': p_value})
+    else:
+        raise ValueError(f"method debe ser 'bootstrap' o 'delong', no {method!r}")
+    return pd.DataFrame(intervals), pd.DataFrame(comparisons)
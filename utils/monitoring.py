@@ -0,0 +1,301 @@
+''' Monitoreo de calidad de datos y deriva (drift) de las características de preprocessing_data.
+
+- FeatureProfile: resumen de memoria constante de cada columna, que se actualiza por lotes con operaciones
+  vectorizadas por columna y se combina con otros perfiles (merge):
+  numéricas: histograma sobre bordes fijos (cuantiles del entrenamiento), nulos, suma, mínimo y máximo;
+  bool y categóricas: conteo por categoría de entrenamiento más 'otros' (categorías nuevas) y nulos.
+  El perfil de entrenamiento se guarda en JSON junto al preprocesamiento ajustado.
+- quality_counts: contadores de lo que la limpieza corrige en silencio en las tablas crudas (total_charges
+  en blanco que pasa a 0, EndDate que no es fecha ni 'No' y se vuelve ausente, clientes sin fila en
+  internet/personal/phone que el merge rellena con False, valores fuera de las categorías conocidas que
+  clean_table convierte en nulos) y de nulos por columna.
+- DriftMonitor: compara cada lote con el perfil de entrenamiento (PSI y KS sobre los histogramas) y acumula
+  el perfil de todos los lotes; reporta las columnas que pasan los umbrales. '''
+import json
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+from utils.functions import unknown_categories
+
+N_BINS = 20
+# Umbrales de alerta: PSI >= 0.2 es un cambio importante de distribución (0.1 - 0.2 moderado)
+PSI_ALERT = 0.2
+# Aumento de la proporción de nulos respecto a entrenamiento
+NULL_ALERT = 0.01
+# Proporción mínima por contenedor en PSI para no dividir entre 0
+PSI_EPSILON = 1e-4
+RAW_ID_COL = 'customerID'
+
+class FeatureProfile:
+    ''' Histogramas y contadores de memoria constante de las columnas de un dataframe.
+    specs: columna -> {'kind': 'numeric', 'edges': [...]} o {'kind': 'category', 'categories': [...]}. '''
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.rows = 0
+        self.counts = {col: np.zeros(self.n_bins(col), dtype=np.int64) for col in specs}
+        self.nulls = dict.fromkeys(specs, 0)
+        self.sums = {col: 0.0 for col, spec in specs.items() if spec['kind'] == 'numeric'}
+        self.minimum = {col: np.inf for col in self.sums}
+        self.maximum = {col: -np.inf for col in self.sums}
+        self.counters = {}
+
+    @classmethod
+    def fit(cls, df, n_bins=N_BINS, exclude=('customer_id', 'is_active')):
+        ''' Perfil de entrenamiento: bordes de cada columna numérica a partir de sus cuantiles (o de sus
+        valores, si tiene pocos) y categorías de las columnas bool/categóricas. Incluye los conteos de df. '''
+        specs = {}
+        for col in df.columns.drop(list(exclude), errors='ignore'):
+            values = df[col]
+            if pd.api.types.is_bool_dtype(values.dtype):
+                specs[col] = {'kind': 'category', 'categories': [False, True]}
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                specs[col] = {'kind': 'category', 'categories': list(values.cat.categories)}
+            elif pd.api.types.is_numeric_dtype(values.dtype):
+                finite = values.to_numpy(dtype=np.float64, na_value=np.nan)
+                finite = finite[np.isfinite(finite)]
+                distinct = np.unique(finite)
+                if len(distinct) <= n_bins:
+                    # Pocos valores: un contenedor por valor (bordes a la mitad entre valores consecutivos)
+                    edges = (distinct[1:] + distinct[:-1]) / 2
+                else:
+                    edges = np.unique(np.quantile(finite, np.linspace(0, 1, n_bins + 1)[1:-1]))
+                specs[col] = {'kind': 'numeric', 'edges': edges.tolist()}
+            else:
+                specs[col] = {'kind': 'category', 'categories': sorted(values.dropna().unique().tolist())}
+        profile = cls(specs)
+        profile.update(df)
+        return profile
+
+    def n_bins(self, col):
+        spec = self.specs[col]
+        # Numéricas: len(edges) + 1 contenedores; categóricas: una por categoría más 'otros'
+        return len(spec['edges']) + 1 if spec['kind'] == 'numeric' else len(spec['categories']) + 1
+
+    def empty_like(self):
+        return FeatureProfile(self.specs)
+
+    def update(self, df):
+        ''' Agrega las filas de df a los conteos. Las columnas del perfil que faltan en df se cuentan
+        como nulos y en el contador missing_column.<columna>. '''
+        n_rows = len(df)
+        self.rows += n_rows
+        for col, spec in self.specs.items():
+            if col not in df.columns:
+                self.nulls[col] += n_rows
+                self.add_counters({f'missing_column.{col}': n_rows})
+                continue
+            if spec['kind'] == 'numeric':
+                self._update_numeric(col, df[col], spec['edges'])
+            else:
+                self._update_category(col, df[col], spec['categories'])
+        return self
+
+    def _update_numeric(self, col, values, edges):
+        values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        null = np.isnan(values)
+        n_null = int(null.sum())
+        if n_null:
+            values = values[~null]
+            self.nulls[col] += n_null
+        if len(values):
+            self.counts[col] += np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+            self.sums[col] += float(values.sum())
+            self.minimum[col] = min(self.minimum[col], float(values.min()))
+            self.maximum[col] = max(self.maximum[col], float(values.max()))
+
+    def _update_category(self, col, values, categories):
+        n_categories = len(categories)
+        if pd.api.types.is_bool_dtype(values.dtype):
+            # Columnas bool sin nulos: solo se cuentan los True
+            n_true = int(np.count_nonzero(values.to_numpy()))
+            self.counts[col][:2] += (len(values) - n_true, n_true)
+            return
+        if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == categories:
+            codes = values.cat.codes.to_numpy()
+            null = codes < 0
+        else:
+            codes = pd.Categorical(values, categories=categories).codes
+            null = values.isna().to_numpy()
+        # Código -1 sin ser nulo: categoría no vista en entrenamiento ('otros', último contenedor)
+        codes = np.where(codes < 0, n_categories, codes)
+        n_null = int(null.sum())
+        if n_null:
+            codes = codes[~null]
+            self.nulls[col] += n_null
+        self.counts[col] += np.bincount(codes, minlength=n_categories + 1)
+
+    def add_counters(self, counters):
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+        return self
+
+    def merge(self, other):
+        ''' Suma los conteos de otro perfil con las mismas columnas y bordes. '''
+        self.rows += other.rows
+        for col in self.specs:
+            self.counts[col] += other.counts[col]
+            self.nulls[col] += other.nulls[col]
+        for col in self.sums:
+            self.sums[col] += other.sums[col]
+            self.minimum[col] = min(self.minimum[col], other.minimum[col])
+            self.maximum[col] = max(self.maximum[col], other.maximum[col])
+        return self.add_counters(other.counters)
+
+    def to_dict(self):
+        return {'specs': self.specs, 'rows': self.rows, 'counts': {col: counts.tolist() for col, counts in self.counts.items()},
+                'nulls': self.nulls, 'sums': self.sums, 'minimum': self.minimum, 'maximum': self.maximum,
+                'counters': self.counters}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data['specs'])
+        profile.rows = data['rows']
+        profile.counts = {col: np.asarray(counts, dtype=np.int64) for col, counts in data['counts'].items()}
+        for attr in ('nulls', 'sums', 'minimum', 'maximum', 'counters'):
+            setattr(profile, attr, dict(data[attr]))
+        return profile
+
+    def save(self, path):
+        ''' Guarda el perfil en JSON (escritura atómica). '''
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f, default=float)
+        os.replace(path + '.tmp', path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def population_stability(expected, actual, epsilon=PSI_EPSILON):
+    ''' PSI entre dos histogramas con los mismos contenedores. '''
+    expected = np.maximum(expected / max(expected.sum(), 1), epsilon)
+    actual = np.maximum(actual / max(actual.sum(), 1), epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def binned_ks(expected, actual):
+    ''' Distancia máxima entre las distribuciones acumuladas de dos histogramas (KS sobre los contenedores:
+    cota inferior del KS de los valores, que no se guardan). '''
+    if expected.sum() == 0 or actual.sum() == 0:
+        return np.nan
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+def drift_report(expected, actual):
+    ''' Por columna: PSI, KS (numéricas), proporción de nulos y de categorías nuevas de actual frente a expected. '''
+    rows = []
+    for col, spec in expected.specs.items():
+        expected_counts, actual_counts = expected.counts[col], actual.counts[col]
+        numeric = spec['kind'] == 'numeric'
+        rows.append({
+            'feature': col,
+            'psi': population_stability(expected_counts, actual_counts) if actual_counts.sum() else np.nan,
+            'ks': binned_ks(expected_counts, actual_counts) if numeric else np.nan,
+            'null_rate_train': expected.nulls[col] / max(expected.rows, 1),
+            'null_rate': actual.nulls[col] / max(actual.rows, 1),
+            'new_category_rate': np.nan if numeric else actual_counts[-1] / max(actual_counts.sum(), 1),
+            'min': actual.minimum.get(col, np.nan), 'max': actual.maximum.get(col, np.nan),
+            'min_train': expected.minimum.get(col, np.nan), 'max_train': expected.maximum.get(col, np.nan),
+        })
+    return pd.DataFrame(rows).set_index('feature')
+
+def quality_counts(df_contract, df_internet, df_personal, df_phone, id_col=RAW_ID_COL):
+    ''' Contadores de calidad de las 4 tablas crudas (columnas originales, antes de clean_table):
+    valores que contract_cleaning y merge_datasets convierten sin avisar y nulos por columna. '''
+    counters = {}
+    if 'TotalCharges' in df_contract.columns:
+        # contract_cleaning reemplaza ' ' por 0
+        counters['total_charges_blank_to_0'] = int((df_contract['TotalCharges'] == ' ').sum())
+    for col in ('BeginDate', 'EndDate'):
+        if col in df_contract.columns:
+            # Se revisan solo los valores distintos (pocas fechas por mes), no cada fila
+            codes, uniques = pd.factorize(df_contract[col])
+            # EndDate = 'No' es un cliente activo, no un error
+            dates = uniques != 'No' if col == 'EndDate' else np.ones(len(uniques), dtype=bool)
+            coerced = np.zeros(len(uniques), dtype=bool)
+            coerced[dates] = pd.isna(pd.to_datetime(pd.Series(uniques[dates], dtype=object), errors='coerce')).to_numpy()
+            counters[f'{col}_coerced_to_null'] = int(np.bincount(codes[codes >= 0], minlength=len(uniques))[coerced].sum())
+    # merge_datasets rellena con False las columnas de los clientes sin fila en una tabla
+    # La tabla hash de los customerID del contrato se arma una vez y se reutiliza con las 3 tablas
+    contract_ids = pd.Index(df_contract[id_col])
+    for name, df in (('internet', df_internet), ('personal', df_personal), ('phone', df_phone)):
+        if contract_ids.is_unique:
+            positions = contract_ids.get_indexer(df[id_col])
+            matched = np.zeros(len(contract_ids), dtype=bool)
+            matched[positions[positions >= 0]] = True
+            counters[f'merge_filled.{name}'] = int(len(contract_ids) - matched.sum())
+            counters[f'without_contract.{name}'] = int((positions < 0).sum())
+        else:
+            counters[f'merge_filled.{name}'] = int((~contract_ids.isin(df[id_col])).sum())
+            counters[f'without_contract.{name}'] = int((~df[id_col].isin(contract_ids)).sum())
+    for name, df in (('contract', df_contract), ('internet', df_internet), ('personal', df_personal), ('phone', df_phone)):
+        # clean_table convierte en nulos los valores fuera de CSV_CATEGORIES: se cuentan aparte de los nulos del archivo
+        for col, values in unknown_categories(name, df).items():
+            counters[f'unknown_category.{name}.{col}'] = int(sum(values.values()))
+        for col, n_null in df.isna().sum().items():
+            counters[f'null.{name}.{col}'] = int(n_null)
+    return counters
+
+class DriftMonitor:
+    ''' Compara cada lote con el perfil de entrenamiento y acumula el perfil de todos los lotes.
+    Solo guarda los histogramas y el resumen de los últimos max_batches lotes, así que la memoria no
+    crece con el número de filas. '''
+
+    def __init__(self, training_profile, psi_alert=PSI_ALERT, null_alert=NULL_ALERT, max_batches=1000, verbose=True):
+        self.training = training_profile
+        self.total = training_profile.empty_like()
+        self.psi_alert = psi_alert
+        self.null_alert = null_alert
+        self.batches = deque(maxlen=max_batches)
+        self.n_batches = 0
+        self.verbose = verbose
+
+    @classmethod
+    def load(cls, profile_path, **kwargs):
+        return cls(FeatureProfile.load(profile_path), **kwargs)
+
+    def alerts(self, report, profile=None):
+        ''' Columnas con PSI o aumento de nulos por encima de los umbrales y columnas con categorías nuevas.
+        profile: perfil del lote; sus contadores unknown_category.<tabla>.<columna> (quality_counts) también son
+        categorías nuevas, que en el reporte solo aparecen como nulos porque clean_table ya las convirtió. '''
+        drifted = report.index[report['psi'] >= self.psi_alert]
+        nulls = report.index[report['null_rate'] - report['null_rate_train'] > self.null_alert]
+        new_categories = {col: round(float(report.at[col, 'new_category_rate']), 4)
+                          for col in report.index[report['new_category_rate'] > 0]}
+        if profile is not None and profile.rows:
+            for name, value in profile.counters.items():
+                if name.startswith('unknown_category.') and value:
+                    new_categories[name[len('unknown_category.'):]] = round(value / profile.rows, 4)
+        return {'psi': {col: round(float(report.at[col, 'psi']), 4) for col in drifted},
+                'nulls': {col: round(float(report.at[col, 'null_rate']), 4) for col in nulls},
+                'new_categories': new_categories}
+
+    def observe(self, df, counters=None):
+        ''' Agrega un lote (columnas de preprocessing_data) y regresa su reporte de deriva. '''
+        batch = self.training.empty_like().update(df)
+        if counters:
+            batch.add_counters(counters)
+        report = drift_report(self.training, batch)
+        self.total.merge(batch)
+        self.n_batches += 1
+
+        alerts = self.alerts(report, batch)
+        summary = {'batch': self.n_batches, 'rows': batch.rows, 'max_psi': float(report['psi'].max()), **alerts,
+                   'counters': {name: value for name, value in batch.counters.items() if value}}
+        self.batches.append(summary)
+        if self.verbose and any(alerts.values()):
+            print(f"Lote {self.n_batches}: deriva {alerts['psi'] or '-'}, nulos {alerts['nulls'] or '-'}, "
+                  f"categorías nuevas {alerts['new_categories'] or '-'}")
+        return report
+
+    def report(self):
+        ''' Reporte de deriva de todos los lotes observados contra el entrenamiento. '''
+        return drift_report(self.training, self.total)
+
+    def summary(self):
+        report = self.report()
+        return {'batches': self.n_batches, 'rows': self.total.rows, **self.alerts(report, self.total),
+                'batches_with_alerts': sum(1 for batch in self.batches if batch['psi'] or batch['nulls'] or batch['new_categories']),
+                'counters': {name: value for name, value in self.total.counters.items() if value}}
@@ -0,0 +1,209 @@
+''' Escritura de predicciones por lotes en un hilo en segundo plano.
+
+PredictionWriter recibe lotes de (customer_id, probabilidad) y los escribe con pyarrow en Parquet o en CSV
+(comprimido según la extensión: .csv.gz, .csv.bz2, .csv.zst) desde un hilo propio. Quien puntúa solo deja
+el lote en una cola acotada y sigue con el siguiente; únicamente espera si el disco va más lento que el
+modelo y ya hay max_pending lotes pendientes, así que la memoria queda acotada.
+Cada fila lleva customer_id, churn_proba, churn_pred (probabilidad > 0.5), model y model_version.
+El archivo se escribe en <ruta>.tmp y se publica con os.replace solo al cerrar sin errores; si algo falla
+(en el hilo de escritura o en quien puntúa) el temporal se borra y no queda un archivo incompleto. '''
+import os
+import queue
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+OUTPUT_DIR = './files/datasets/output/'
+DECISION_THRESHOLD = 0.5
+# Compresión del CSV según la extensión del archivo
+CSV_COMPRESSION = {'.gz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd'}
+
+def churn_probability(model, features):
+    ''' Probabilidad de abandono de cada fila. Los modelos se entrenan con is_active como objetivo, así que
+    la columna 1 de predict_proba es la probabilidad de que el cliente siga activo; el abandono es 1 - P(is_active). '''
+    return 1 - model.predict_proba(features)[:, 1]
+
+def output_format(path):
+    ''' Formato y compresión de un archivo de predicciones a partir de su extensión. '''
+    name = path.lower()
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet', None
+    stem, extension = os.path.splitext(name)
+    compression = CSV_COMPRESSION.get(extension)
+    if compression is not None:
+        stem, extension = os.path.splitext(stem)
+    if extension != '.csv':
+        raise ValueError(f'Formato de salida no soportado: {path} (.parquet, .csv o .csv comprimido)')
+    return 'csv', compression
+
+class PredictionWriter:
+    ''' Escritor de predicciones en segundo plano. Uso:
+
+        with PredictionWriter('predicciones.parquet', 'catboost', version) as writer:
+            for ids, probas in lotes:
+                writer.write(ids, probas)
+
+    Al salir del bloque sin errores se publica el archivo; con una excepción se descarta.
+    Los arreglos de write no se copian: no se deben modificar después de pasarlos. '''
+
+    _DONE = object()
+
+    def __init__(self, output_path, model_name, model_version, id_column='customer_id', max_pending=4,
+                 parquet_compression='snappy'):
+        self.output_path = output_path
+        self.tmp_path = output_path + '.tmp'
+        self.format, self.compression = output_format(output_path)
+        self.model_name = model_name
+        self.model_version = str(model_version)
+        self.id_column = id_column
+        self.parquet_compression = parquet_compression
+        self.rows = 0
+        self._queued_rows = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._writer = None
+        self._sink = None
+        self._schema = None
+        self._closed = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f'prediction-writer-{model_name}', daemon=True)
+        self._thread.start()
+
+    def write(self, customer_ids, probabilities):
+        ''' Agrega un lote a la cola de escritura. customer_ids=None numera las filas desde 0.
+        Si el hilo de escritura falló, la excepción se lanza aquí. '''
+        if self._closed:
+            raise ValueError('El escritor de predicciones ya está cerrado')
+        self._raise_error()
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if customer_ids is None:
+            customer_ids = np.arange(self._queued_rows, self._queued_rows + len(probabilities))
+        elif len(customer_ids) != len(probabilities):
+            raise ValueError(f'{len(customer_ids)} clientes y {len(probabilities)} probabilidades')
+        self._queued_rows += len(probabilities)
+        # Con la cola llena se espera al hilo, revisando que no haya fallado mientras tanto
+        while True:
+            try:
+                self._queue.put((customer_ids, probabilities), timeout=0.1)
+                return
+            except queue.Full:
+                self._raise_error()
+
+    def close(self):
+        ''' Espera a que se escriban los lotes pendientes y publica el archivo. Regresa el número de filas. '''
+        if self._closed:
+            return self.rows
+        self._stop()
+        try:
+            self._raise_error()
+            if self._writer is None:
+                # Sin lotes: se publica un archivo vacío con las columnas
+                self._write_table(self._table(np.array([], dtype=str), np.array([], dtype=np.float64)))
+            self._close_writer()
+            os.replace(self.tmp_path, self.output_path)
+        except BaseException:
+            self._discard()
+            raise
+        return self.rows
+
+    def abort(self):
+        ''' Descarta las predicciones escritas hasta ahora sin publicar el archivo. '''
+        if not self._closed:
+            self._stop()
+        self._discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _stop(self):
+        self._closed = True
+        self._queue.put(self._DONE)
+        self._thread.join()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f'Falló la escritura de {self.output_path}') from self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            # Después de un error se siguen sacando los lotes para que write no se quede esperando
+            if self._error is not None:
+                continue
+            try:
+                self._write_table(self._table(*item))
+            except BaseException as error:
+                self._error = error
+
+    def _table(self, customer_ids, probabilities):
+        n_rows = len(probabilities)
+        # model y model_version como diccionario: un solo valor por archivo, casi sin costo por fila
+        constant = pa.array(np.zeros(n_rows, dtype=np.int8))
+        return pa.table({
+            self.id_column: pa.array(np.asarray(customer_ids)),
+            'churn_proba': probabilities,
+            'churn_pred': (probabilities > DECISION_THRESHOLD).astype(np.int8),
+            'model': pa.DictionaryArray.from_arrays(constant, pa.array([self.model_name])),
+            'model_version': pa.DictionaryArray.from_arrays(constant, pa.array([self.model_version])),
+        })
+
+    def _write_table(self, table):
+        if self._writer is None:
+            self._open_writer(table.schema)
+        elif not table.schema.equals(self._schema):
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def _open_writer(self, schema):
+        # Las columnas del primer lote fijan las del archivo
+        self._schema = schema
+        if self.format == 'parquet':
+            schema = schema.with_metadata({'model': self.model_name, 'model_version': self.model_version})
+            self._writer = pq.ParquetWriter(self.tmp_path, schema, compression=self.parquet_compression)
+        else:
+            self._sink = (pa.CompressedOutputStream(self.tmp_path, self.compression) if self.compression
+                          else pa.OSFile(self.tmp_path, 'wb'))
+            self._writer = pa_csv.CSVWriter(self._sink, schema)
+
+    def _close_writer(self):
+        writer, sink = self._writer, self._sink
+        self._writer = self._sink = None
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+
+    def _discard(self):
+        try:
+            self._close_writer()
+        except Exception:
+            pass
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+def write_predictions(model, model_name, model_version, features, output_dir=OUTPUT_DIR, file_format='parquet',
+                      batch_size=100000):
+    ''' Puntúa features por lotes con la probabilidad de abandono (churn_probability) y escribe las predicciones
+    en output_dir/<model_name>_predicts.<file_format> (por ejemplo 'parquet' o 'csv.gz').
+    customer_id es el índice de features. Regresa la ruta del archivo. '''
+    output_path = os.path.join(output_dir, f'{model_name}_predicts.{file_format}')
+    customer_ids = features.index.to_numpy()
+    with PredictionWriter(output_path, model_name, model_version) as writer:
+        for start in range(0, len(features), batch_size):
+            # El siguiente lote se puntúa mientras el hilo escribe el anterior
+            batch = features.iloc[start:start + batch_size]
+            writer.write(customer_ids[start:start + batch_size], churn_probability(model, batch))
+    return output_path
@@ -0,0 +1,225 @@
+''' Instrumentación por etapas del pipeline.
+
+Cada etapa registra tiempo de reloj, tiempo de CPU, RSS inicial/final y máximo, y filas/columnas de su
+resultado. Opcionalmente, para las etapas indicadas, se captura un perfil de cProfile y las mayores
+asignaciones de memoria con tracemalloc. El reporte se guarda en JSON para comparar ejecuciones.
+
+Las funciones decoradas con @profiled solo se miden cuando hay un RunProfiler activo; sin él,
+el decorador llama a la función directamente. '''
+import cProfile
+import functools
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profiler activo del proceso (uno a la vez)
+_ACTIVE = None
+
+def max_rss():
+    ''' RSS máximo del proceso desde que inició (en bytes), o None si el sistema no lo reporta. '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta kilobytes y macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def frame_shape(value):
+    ''' Filas y columnas del primer DataFrame/arreglo de un resultado (o de una tupla de resultados). '''
+    values = value if isinstance(value, (tuple, list)) else [value]
+    for item in values:
+        shape = getattr(item, 'shape', None)
+        if shape is not None and len(shape) > 0:
+            return int(shape[0]), int(shape[1]) if len(shape) > 1 else 1
+    return None, None
+
+class RunProfiler:
+    ''' Registra las etapas de una ejecución.
+    profile_stages: nombres de etapas en las que se captura cProfile.
+    trace_stages: nombres de etapas en las que se captura tracemalloc.
+    sample_interval: segundos entre lecturas de RSS para estimar el máximo de cada etapa. '''
+
+    def __init__(self, profile_stages=(), trace_stages=(), sample_interval=0.01, top=20):
+        self.profile_stages = set(profile_stages)
+        self.trace_stages = set(trace_stages)
+        self.sample_interval = sample_interval
+        self.top = top
+        self.stages = []
+        self.process = psutil.Process()
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+        self._open = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        global _ACTIVE
+        self._previous, _ACTIVE = _ACTIVE, self
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIVE
+        self._stop.set()
+        self._sampler.join()
+        _ACTIVE = self._previous
+        return False
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.sample_interval):
+            rss = self.process.memory_info().rss
+            with self._lock:
+                for record in self._open:
+                    record['peak_rss_bytes'] = max(record['peak_rss_bytes'], rss)
+
+    def current_stage(self):
+        ''' Nombre de la etapa abierta más interna, o None. '''
+        return self._open[-1]['stage'] if self._open else None
+
+    @contextmanager
+    def stage(self, name, **info):
+        ''' Mide una etapa. El registro que se entrega puede completarse (por ejemplo rows/cols). '''
+        rss = self.process.memory_info().rss
+        record = {'stage': name, 'parent': self.current_stage(),
+                  'rows': None, 'cols': None, 'rss_start_bytes': rss, 'peak_rss_bytes': rss, **info}
+        with self._lock:
+            self._open.append(record)
+
+        profiler = cProfile.Profile() if name in self.profile_stages else None
+        trace = name in self.trace_stages and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start()
+        max_rss_before = max_rss()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record['wall_s'] = time.perf_counter() - wall_start
+            record['cpu_s'] = time.process_time() - cpu_start
+            rss = self.process.memory_info().rss
+            with self._lock:
+                self._open.remove(record)
+            record['rss_end_bytes'] = rss
+            record['peak_rss_bytes'] = max(record['peak_rss_bytes'], rss)
+            # Si el máximo del proceso subió durante la etapa, ese es el máximo exacto de la etapa
+            max_rss_after = max_rss()
+            if max_rss_after is not None and max_rss_after > max_rss_before:
+                record['peak_rss_bytes'] = max(record['peak_rss_bytes'], max_rss_after)
+            if trace:
+                record['tracemalloc'] = self._tracemalloc_summary()
+                tracemalloc.stop()
+            if profiler is not None:
+                record['cprofile'] = self._cprofile_summary(profiler)
+            self.stages.append(record)
+
+    def _tracemalloc_summary(self):
+        _, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics('lineno')[:self.top]
+        return {'peak_bytes': peak,
+                'top': [{'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count} for stat in stats]}
+
+    def _cprofile_summary(self, profiler):
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative')
+        rows = []
+        for (file_name, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({'function': f'{os.path.basename(file_name)}:{line}({function})', 'calls': calls,
+                         'tottime_s': tottime, 'cumtime_s': cumtime})
+        rows.sort(key=lambda row: row['cumtime_s'], reverse=True)
+        return rows[:self.top]
+
+    def extend(self, records, parent=None):
+        ''' Agrega registros medidos en otro proceso (por ejemplo los modelos del zoo). '''
+        for record in records:
+            self.stages.append(dict(record, parent=record.get('parent') or parent))
+
+    def report(self):
+        return {
+            'started_at': self.started_at,
+            'total_wall_s': time.perf_counter() - self.start,
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'stages': self.stages,
+        }
+
+    def write_report(self, path):
+        ''' Guarda el reporte en JSON. Si path es una carpeta, el archivo se nombra con la fecha de inicio. '''
+        if os.path.isdir(path) or path.endswith(os.sep) or path.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+            path = os.path.join(path, f"run_{self.started_at.replace(':', '').replace('-', '')}.json")
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        ''' Tabla corta de las etapas para imprimir al final de una ejecución. '''
+        lines = [f"{'etapa':<32}{'reloj s':>10}{'cpu s':>10}{'rss máx MB':>12}{'filas':>10}{'cols':>6}"]
+        parents = {record['stage']: record['parent'] for record in self.stages}
+        for record in self.stages:
+            depth, parent = 0, record['parent']
+            while parent is not None and depth < 10:
+                depth, parent = depth + 1, parents.get(parent)
+            name = '  ' * depth + record['stage']
+            rows = '' if record['rows'] is None else record['rows']
+            cols = '' if record['cols'] is None else record['cols']
+            lines.append(f"{name:<32}{record['wall_s']:>10.2f}{record['cpu_s']:>10.2f}"
+                         f"{record['peak_rss_bytes'] / 2**20:>12.1f}{rows:>10}{cols:>6}")
+        return '\n'.join(lines)
+
+def active_profiler():
+    return _ACTIVE
+
+@contextmanager
+def stage(name, **info):
+    ''' Etapa del profiler activo; sin profiler activo no mide nada. '''
+    if _ACTIVE is None:
+        yield {}
+    else:
+        with _ACTIVE.stage(name, **info) as record:
+            yield record
+
+def profiled(name=None):
+    ''' Decorador: mide la función como una etapa y registra filas/columnas de su resultado
+    (o, si el resultado no es tabular, de su primer argumento tabular). '''
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE is None:
+                return function(*args, **kwargs)
+            with _ACTIVE.stage(stage_name) as record:
+                result = function(*args, **kwargs)
+                rows, cols = frame_shape(result)
+                if rows is None:
+                    rows, cols = frame_shape([arg for arg in args if hasattr(arg, 'shape')])
+                record['rows'], record['cols'] = rows, cols
+            return result
+        return wrapper
+    return decorator